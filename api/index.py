@@ -1,19 +1,34 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+import asyncio
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from pydantic import BaseModel
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import HumanMessage, AIMessage
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
 import os
-import requests
-import json
+import tempfile
 import time
 import traceback
-import posthog
+from typing import Optional
+
+from .utils.admission import AdmissionController, AdmissionLimits, AdmissionRejected, client_keys
+from .utils.answer_cache import AnswerCache
+from .utils.cancellation import Cancellation, ClosingStreamingResponse
+from .utils.chat_engine import DirectChatEngine
+from .utils.chat_prompt import RETRIEVED_HEADER, build_messages, langchain_prompts, render_system_prompt
+from .utils.context import ContextCache
+from .utils.events import EventPipeline, posthog_api_key
+from .utils.forwarder import CircuitBreaker, FormForwarder
+from .utils.hedge import HedgePolicy, Hedger
+from .utils.history import HistoryWindow, message_tokens, summary_message
+from .utils.log import ANALYTICS, RequestIdMiddleware, configure_logging, current_request_id, get_logger, log_stats
+from .utils.metrics import RequestTimings, metrics
+from .utils.retrieval import SectionIndex, build_query
+from .utils.segment import SentenceSegmenter, segment_stream
+from .utils.session_store import conversation_with_answer, create_session_store, new_version
+from .utils.single_flight import SingleFlight
+from .utils.tool_http import tool_cache_stats
 
 # --- SETUP ---
 script_dir = Path(__file__).parent
@@ -22,14 +37,76 @@ env_path = root_dir / '.env.local'
 load_dotenv(dotenv_path=env_path)
 api_key = os.getenv("OPENAI_API_KEY")
 
-# PostHog Initialization
-posthog.api_key = os.getenv("POSTHOG_API_KEY") or os.getenv("NEXT_PUBLIC_POSTHOG_KEY")
-posthog.host = os.getenv("POSTHOG_HOST") or os.getenv("NEXT_PUBLIC_POSTHOG_HOST") or "https://us.i.posthog.com"
+# JSON log lines are formatted and written by a background thread, never on the event loop
+configure_logging()
+logger = get_logger(__name__)
+
+# Heavy clients (LangChain, OpenAI, PostHog, requests) are imported on first use
+# so cold starts of routes that don't need them, like /api/track, stay cheap.
+if not posthog_api_key():
+    logger.warning("PostHog API key not set; inference events will be dropped")
 
 if not api_key:
-    print("WARNING: OPENAI_API_KEY not found in environment variables.")
+    logger.warning("OPENAI_API_KEY not found in environment variables")
+
+# On Vercel the container can be frozen as soon as the response is sent, so
+# background work has to finish inside the invocation that created it.
+SERVERLESS = bool(os.getenv("VERCEL"))
+
+GOOGLE_FORM_URL = os.getenv(
+    "ANALYTICS_FORM_URL",
+    "https://docs.google.com/forms/d/e/1FAIpQLSfWNF-ginw7-prB-bNCzZvYOLZWsrCMgaY-iRZo94we2g2R6w/formResponse",
+)
+
+# /api/track only enqueues; rows are posted to Google Forms by a background worker
+analytics_forwarder = FormForwarder(
+    GOOGLE_FORM_URL,
+    max_queue=int(os.getenv("ANALYTICS_QUEUE_SIZE", "1000")),
+    batch_size=int(os.getenv("ANALYTICS_BATCH_SIZE", "10")),
+    timeout=float(os.getenv("ANALYTICS_TIMEOUT", "5")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("ANALYTICS_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("ANALYTICS_BREAKER_RESET", "30")),
+    ),
+)
+
+# Inference events are buffered and sent to PostHog in batches
+posthog_events = EventPipeline(
+    batch_size=int(os.getenv("POSTHOG_BATCH_SIZE", "20")),
+    flush_interval=float(os.getenv("POSTHOG_FLUSH_INTERVAL", "10")),
+    max_buffer=int(os.getenv("POSTHOG_MAX_BUFFER", "1000")),
+    serverless=SERVERLESS,
+)
 
-app = FastAPI()
+async def flush_posthog_periodically():
+    while True:
+        await asyncio.sleep(posthog_events.flush_interval)
+        await asyncio.to_thread(posthog_events.flush_if_due)
+
+def warm_chat_path():
+    """Import LangChain, build the chat model and compile the prompt ahead of the first /api/chat."""
+    get_llm()
+    context_cache.get()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    flusher = None
+    if not SERVERLESS:
+        # Long-running servers warm up at startup; serverless invocations pay on first use
+        await asyncio.to_thread(warm_chat_path)
+        flusher = asyncio.create_task(flush_posthog_periodically())
+    yield
+    # Shutdown: don't lose queued analytics rows or buffered PostHog events
+    if flusher is not None:
+        flusher.cancel()
+    await analytics_forwarder.close()
+    logger.debug("Analytics forwarder closed", extra={"stats": analytics_forwarder.stats()})
+    await asyncio.to_thread(posthog_events.flush)
+    logger.debug("PostHog pipeline closed", extra={"stats": posthog_events.stats()})
+    if session_store is not None:
+        session_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,145 +114,444 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Conversation-Version", "X-Request-ID"],
 )
+# Outermost, so every log line of a request (and its PostHog events) carry the same id
+app.add_middleware(RequestIdMiddleware)
 
-llm = ChatOpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    model="gpt-4o-mini",
-    streaming=True,
-    temperature=0.7,
-    model_kwargs={"stream_options": {"include_usage": True}}
-)
+# Chat engine: "langchain" streams through ChatPromptTemplate | ChatOpenAI,
+# "openai" sends the same messages with the openai client directly.
+CHAT_ENGINE = os.getenv("CHAT_ENGINE", "langchain").lower()
+
+llm = None
+
+def get_llm():
+    """Create the chat model on first use; importing langchain_openai costs about a second."""
+    global llm
+    if llm is None and CHAT_ENGINE == "openai":
+        llm = DirectChatEngine(model="gpt-4o-mini", temperature=0.7, api_key=os.getenv("OPENAI_API_KEY"))
+    elif llm is None:
+        from langchain_openai import ChatOpenAI
+
+        llm = ChatOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            model="gpt-4o-mini",
+            streaming=True,
+            temperature=0.7,
+            model_kwargs={"stream_options": {"include_usage": True}}
+        )
+    return llm
 
 class ChatRequest(BaseModel):
     messages: list
     session_id: str = "unknown"
+    # Version from the last X-Conversation-Version header: `messages` then holds
+    # only the new turn and the rest is read from the session store.
+    conversation_version: Optional[str] = None
+    # "text" (default) or "segments"; the X-Stream-Format header works too
+    stream_format: Optional[str] = None
+    segment_min_chars: Optional[int] = None
+
+# Stream formats: "text" streams raw token text; "segments" streams NDJSON lines
+# with one complete sentence each, so a TTS client can start speaking on the first.
+STREAM_FORMATS = ("text", "segments")
+SEGMENT_MIN_CHARS = int(os.getenv("SEGMENT_MIN_CHARS", "0"))
+SEGMENT_CLAUSE_CHARS = int(os.getenv("SEGMENT_CLAUSE_CHARS", "120"))
+
+# Context mode: "full" pastes all of data.txt, "retrieval" sends the core sections
+# plus the top-k [SECTION]s that match the question.
+CONTEXT_MODE = os.getenv("CONTEXT_MODE", "full").lower()
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_CORE_SECTIONS = [
+    name.strip()
+    for name in os.getenv(
+        "RETRIEVAL_CORE_SECTIONS", "SYSTEM_INSTRUCTION,PROFILE_SUMMARY,CONTACT INFORMATION"
+    ).split(",")
+    if name.strip()
+]
+
+# Prompt layout: "classic" interpolates the context in the middle of the system
+# message; "prefix" puts instructions and portfolio data first so every request
+# shares a byte-identical prefix that OpenAI's automatic prompt caching can reuse.
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "classic").lower()
+
+def compile_chat_prompt(context_text: str):
+    """Bind the portfolio data into the prompt once per data.txt version.
+
+    Returns a LangChain template, or the formatted system message for the
+    direct engine.
+    """
+    if PROMPT_LAYOUT == "prefix" and CONTEXT_MODE == "retrieval":
+        # Only the always-included core is static; matches are appended per request
+        core = SectionIndex.build(context_text, core_sections=RETRIEVAL_CORE_SECTIONS).core
+        context_text = SectionIndex.render(core)
+
+    if CHAT_ENGINE == "openai":
+        return render_system_prompt(PROMPT_LAYOUT, context_text)
+    chat_prompt, prefix_chat_prompt = langchain_prompts()
+    template = prefix_chat_prompt if PROMPT_LAYOUT == "prefix" else chat_prompt
+    return template.partial(context=context_text)
+
+def build_section_index(context_text: str) -> SectionIndex:
+    return SectionIndex.build(context_text, core_sections=RETRIEVAL_CORE_SECTIONS)
+
+# Portfolio context is loaded once and only re-read when data.txt changes on disk
+context_cache = ContextCache(
+    root_dir / 'data.txt',
+    compile_prompt=compile_chat_prompt,
+    build_index=build_section_index,
+    check_interval=float(os.getenv("CONTEXT_CHECK_INTERVAL", "2.0")),
+)
+
+# Completed answers keyed on (normalized question, history, data.txt hash);
+# set ANSWER_CACHE_TTL=0 to disable.
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("ANSWER_CACHE_MAX_BYTES", "2000000")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+)
+
+# Identical chat requests that arrive while the same answer is still streaming
+# share one upstream stream instead of each paying for its own; SINGLE_FLIGHT=0 disables.
+single_flight = SingleFlight(enabled=os.getenv("SINGLE_FLIGHT", "1") != "0")
+
+# Hedged upstream requests: when the first token has not arrived within
+# HEDGE_TTFT_MS (milliseconds, or a percentile of the observed TTFT such as
+# "p95"), the same request is sent again and the faster stream wins. 0 disables.
+hedger = Hedger(HedgePolicy.parse(
+    os.getenv("HEDGE_TTFT_MS", "0"),
+    histogram=lambda: metrics.histogram("ttft_seconds", {"path": "/api/chat", "answer_cache": "miss"}),
+    min_ms=float(os.getenv("HEDGE_MIN_MS", "1000")),
+    max_ms=float(os.getenv("HEDGE_MAX_MS", "10000")),
+    min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "50")),
+))
+
+# Admission control: per session and per client IP, a cap on concurrent streams,
+# a request rate (token bucket) and a rolling LLM token budget, plus a global cap
+# on in-flight streams. Over-limit requests get a fast 429; 0 disables a limit.
+admission = AdmissionController(AdmissionLimits(
+    max_concurrent=int(os.getenv("CHAT_MAX_CONCURRENT", "3")),
+    requests_per_minute=float(os.getenv("CHAT_RATE_PER_MINUTE", "20")),
+    burst=int(os.getenv("CHAT_RATE_BURST", "10")),
+    token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", "150000")),
+    budget_window_seconds=float(os.getenv("CHAT_TOKEN_BUDGET_WINDOW", "3600")),
+    max_in_flight=int(os.getenv("CHAT_MAX_IN_FLIGHT", "100")),
+))
+
+# Conversations are kept server-side per session id, so after the first turn the
+# client sends only its new message plus the version it was given.
+# SESSION_STORE is "memory" (LRU + TTL), "sqlite" (file at SESSION_STORE_PATH) or "off".
+session_store = create_session_store(
+    os.getenv("SESSION_STORE", "memory"),
+    path=os.getenv("SESSION_STORE_PATH", os.path.join(tempfile.gettempdir(), "portfolio-sessions.db")),
+    max_sessions=int(os.getenv("SESSION_STORE_MAX_SESSIONS", "1000")),
+    ttl_seconds=float(os.getenv("SESSION_STORE_TTL", "3600")),
+    max_messages=int(os.getenv("SESSION_STORE_MAX_MESSAGES", "100")),
+)
+
+# Long conversations keep the newest turns verbatim within a token budget and
+# fold older turns into a rolling summary; HISTORY_TOKEN_BUDGET=0 sends everything.
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+history_window = HistoryWindow(
+    max_turns=int(os.getenv("HISTORY_MAX_TURNS", "6")),
+    token_budget=HISTORY_TOKEN_BUDGET,
+    summary_token_budget=int(os.getenv("HISTORY_SUMMARY_TOKENS", "250")),
+)
+
+# Component counters exposed as gauges on /api/metrics
+metrics.register_gauges("analytics_forwarder", analytics_forwarder.stats)
+metrics.register_gauges("posthog", posthog_events.stats)
+metrics.register_gauges("answer_cache", answer_cache.stats)
+metrics.register_gauges("context_cache", context_cache.stats)
+metrics.register_gauges("history_window", history_window.stats)
+metrics.register_gauges("single_flight", single_flight.stats)
+metrics.register_gauges("admission", admission.stats)
+metrics.register_gauges("hedge", hedger.stats)
+if session_store is not None:
+    metrics.register_gauges("session_store", session_store.stats)
+metrics.register_gauges("tool_cache", tool_cache_stats)
+metrics.register_gauges("log", log_stats)
 
 def get_portfolio_data():
-    try:
-        data_path = root_dir / 'data.txt'
-        with open(data_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except Exception:
-        return "Error loading data."
+    snapshot, _ = context_cache.get()
+    return snapshot.text
 
-def send_posthog_event(event_name: str, properties: dict):
+def send_posthog_event(background_tasks: BackgroundTasks, event_name: str, properties: dict):
     """
-    Background task to send PostHog event and flush the queue.
-    Crucial for Vercel Serverless to ensure event is sent before container freeze.
+    Buffer a PostHog event and schedule a flush after the response is sent.
+    On Vercel every invocation flushes what it buffered before the container freezes;
+    elsewhere events are batched until the size or time threshold is reached.
     """
-    # Ensure keys are set (sometimes needed in serverless global context)
-    if not posthog.api_key:
-        posthog.api_key = os.getenv("POSTHOG_API_KEY") or os.getenv("NEXT_PUBLIC_POSTHOG_KEY")
-        posthog.host = os.getenv("POSTHOG_HOST") or os.getenv("NEXT_PUBLIC_POSTHOG_HOST") or "https://us.i.posthog.com"
+    request_id = current_request_id()
+    if request_id is not None:
+        properties.setdefault("request_id", request_id)
+    posthog_events.record(event_name, properties)
+    flush = posthog_events.flush if posthog_events.serverless else posthog_events.flush_if_due
+    if not any(task.func == flush for task in background_tasks.tasks):
+        background_tasks.add_task(flush)
 
-    if not posthog.api_key:
-        print("WARNING: PostHog API key not set. Skipping event capture.")
-        return
-
-    try:
-        print(f"DEBUG: Sending {event_name} to PostHog for session {properties.get('session_id', 'unknown')}...")
-        posthog.capture(
-            distinct_id=properties.get("distinct_id", "backend_user"), 
-            event=event_name, 
-            properties=properties
-        )
-        posthog.flush()
-        print(f"DEBUG: PostHog event {event_name} flushed successfully.")
-    except Exception as e:
-        print(f"PostHog Error: {e}")
+def client_ip(http_request: Request) -> str:
+    """The caller's address; behind Vercel's proxy it is the first X-Forwarded-For hop."""
+    forwarded = http_request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return http_request.client.host if http_request.client else ""
 
 @app.post("/api/chat")
-async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks, http_request: Request):
     start_time = time.time()
     session_id = request.session_id
-    model_version = llm.model_name
+
+    # Rebuild the conversation from the store when the client sent only its new turn
+    stored = None
+    store_enabled = session_store is not None and session_id != "unknown"
+    if request.conversation_version is not None:
+        stored = session_store.get(session_id, request.conversation_version) if store_enabled else None
+        if stored is None:
+            # Unknown, expired or stale version: the client retries with the full history
+            raise HTTPException(status_code=409, detail="conversation_version_unknown")
+    messages = stored.messages + request.messages if stored is not None else request.messages
+    stream_format = (request.stream_format or http_request.headers.get("x-stream-format") or "text").lower()
+    if stream_format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"stream_format must be one of {', '.join(STREAM_FORMATS)}")
+    if store_enabled:
+        turn = (stored.turn if stored is not None else 0) + 1
+        conversation_version = new_version(turn)
+
+    try:
+        ticket = admission.admit(client_keys(session_id, client_ip(http_request)))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after + 0.999))})
+    flight = None
+    held = True
+
+    def release():
+        # Give back the admission slot and the single-flight hold exactly once, however the request ends
+        nonlocal held
+        if held:
+            held = False
+            if flight is not None:
+                single_flight.leave(flight)
+            ticket.release()
 
     try:
-        print("--- DEBUG: Chat started ---")
-        context_data = get_portfolio_data()
+        llm = get_llm()
+        model_version = llm.model_name
+        timings = RequestTimings(metrics, {"path": "/api/chat"})
+        logger.debug("Chat started", extra={"session_id": session_id, "stream_format": stream_format})
+        with timings.span("context"):
+            context_snapshot, context_cache_hit = context_cache.get()
         
-        # Parse conversation history
-        history = []
-        for msg in request.messages[:-1]: # Exclude the last message which is the current question
-            if msg.get('role') == 'user':
-                history.append(HumanMessage(content=msg.get('content', '')))
-            elif msg.get('role') == 'assistant':
-                history.append(AIMessage(content=msg.get('content', '')))
+        # Parse conversation history (newest turns within budget, older ones summarized)
+        with timings.span("history"):
+            history_plan = history_window.fit(messages[:-1]) # Exclude the last message which is the current question
+            history = []
+            if history_plan.summary:
+                history.append({"role": "system", "content": summary_message(history_plan.summary)})
+            for msg in history_plan.messages:
+                if msg.get('role') in ('user', 'assistant'):
+                    history.append({"role": msg['role'], "content": msg.get('content', '')})
         
-        last_message = request.messages[-1]
+        prompt_started = time.perf_counter()
+        last_message = messages[-1]
         user_question = ""
         if isinstance(last_message, dict):
             user_question = last_message.get('content', '')
         
-        # Enhanced System Prompt
-        system_template = """You are an AI assistant for Fran Chaves's professional portfolio. 
-        Your goal is to represent Fran professionally based strictly on the provided context.
-        
-        Context about Fran:
-        {context}
-        
-        Instructions:
-        1.  **Be Professional yet Personable:** Use a confident and approachable tone.
-        2.  **Strict Adherence to Context:** Answer ONLY from the context. If not in context, say you don't have that info. No hallucinations.
-        3.  **ULTRA CONCISE:** Maximum 2-3 sentences. Get straight to the key point. This is voice-first - every word costs TTS credits.
-        4.  **Simple Language:** Conversational, clear. No complex sentences.
-        5.  **Third Person:** Refer to Fran in third person (e.g., "Fran has experience in...").
-        """
-
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_template),
-            MessagesPlaceholder(variable_name="history"),
-            ("human", "{question}")
-        ])
-        
-        # Note: We use the raw LLM for streaming to access message chunks with usage data
-        # instead of StrOutputParser which only returns strings.
-        chain = prompt | llm
+        context_sections = None
+        # Per-request context for the classic layout in retrieval mode; otherwise it is compiled in
+        request_context = None
+        retrieved = []
+
+        if CONTEXT_MODE == "retrieval" and context_snapshot.index is not None:
+            previous_user_message = next(
+                (m["content"] for m in reversed(history) if m["role"] == "user"),
+                None
+            )
+            query = build_query(user_question, previous_user_message)
+            if PROMPT_LAYOUT == "prefix":
+                # Core sections are already in the cached prefix; matches go after the history
+                matches = context_snapshot.index.retrieve_matches(query, top_k=RETRIEVAL_TOP_K)
+                selected = context_snapshot.index.core + matches
+                if matches:
+                    retrieved.append({"role": "system", "content": RETRIEVED_HEADER + SectionIndex.render(matches)})
+            else:
+                selected = context_snapshot.index.retrieve(query, top_k=RETRIEVAL_TOP_K)
+                request_context = SectionIndex.render(selected)
+            context_sections = [section.name for section in selected]
+            context_chars = sum(len(section.text) for section in selected)
+        else:
+            context_chars = context_snapshot.size_chars
+
+        if CHAT_ENGINE == "openai":
+            system_prompt = (
+                render_system_prompt(PROMPT_LAYOUT, request_context)
+                if request_context is not None else context_snapshot.prompt
+            )
+            # `messages` stays the client's conversation: it keys the caches and is what gets stored
+            openai_messages = build_messages(system_prompt, history, user_question, retrieved)
+            open_stream = hedger.wrap(lambda: llm.astream(openai_messages))
+        else:
+            from langchain_core.messages import convert_to_messages
+
+            prompt_inputs = {
+                "history": convert_to_messages(history),
+                "question": user_question
+            }
+            if retrieved:
+                prompt_inputs["retrieved"] = convert_to_messages(retrieved)
+            if request_context is not None:
+                prompt_inputs["context"] = request_context
+                prompt = langchain_prompts()[0]
+            else:
+                prompt = context_snapshot.prompt
+
+            # Note: We use the raw LLM for streaming to access message chunks with usage data
+            # instead of StrOutputParser which only returns strings.
+            chain = prompt | llm
+            open_stream = hedger.wrap(lambda: chain.astream(prompt_inputs))
+
+        cache_key = AnswerCache.make_key(
+            user_question,
+            messages[:-1],
+            context_snapshot.content_hash,
+            variant=f"{model_version}:{CONTEXT_MODE}:{RETRIEVAL_TOP_K}:{PROMPT_LAYOUT}"
+        )
+        cached_answer = answer_cache.get(cache_key)
+        flight, flight_role, leader = None, None, False
+        if cached_answer is None:
+            flight, leader = single_flight.join(cache_key, open_stream)
+            if single_flight.enabled:
+                flight_role = "leader" if leader else "follower"
+        timings.add_stage("prompt", time.perf_counter() - prompt_started)
+        timings.labels["answer_cache"] = "hit" if cached_answer is not None else "miss"
+        cancellation = Cancellation()
+
+        def report_cancelled():
+            # The upstream stops only if no other session still shares it; then this session pays for it
+            upstream_cancelled = flight is not None and not flight.done and flight.subscribers == 0
+            prompt_tokens = completion_tokens = 0
+            if upstream_cancelled:
+                prompt_tokens = (context_chars + 3) // 4 + sum(message_tokens(m) for m in history + retrieved)
+                prompt_tokens += message_tokens({"role": "user", "content": user_question})
+                # OpenAI streams about one token per chunk; usage never arrives for an aborted stream
+                completion_tokens = len(flight.chunks)
+                ticket.record_tokens(prompt_tokens + completion_tokens)
+            send_posthog_event(
+                background_tasks,
+                "ai_inference_cancelled",
+                {
+                    "distinct_id": session_id,
+                    "session_id": session_id,
+                    "latency_ms": int((time.time() - start_time) * 1000),
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "tokens_estimated": True,
+                    "delivered_chunks": timings.chunks,
+                    "upstream_cancelled": upstream_cancelled,
+                    "model_version": model_version,
+                    "answer_cache_hit": cached_answer is not None,
+                    "single_flight": flight_role,
+                    **timings.telemetry()
+                }
+            )
 
         async def generate():
             prompt_tokens = 0
             completion_tokens = 0
             total_tokens = 0
-            
+            cached_tokens = 0
+            shared_completion_tokens = 0
+            finished = False
+            # A disconnect ends the subscription below at once, whichever way the server reports it
+            cancellation.watch(http_request)
+            subscription = single_flight.subscribe(flight, cancellation) if flight is not None else None
+
             try:
-                async for chunk in chain.astream({
-                    "context": context_data,
-                    "history": history,
-                    "question": user_question
-                }):
-                    # Extract usage metadata if present (usually in the last chunk with stream_options)
-                    if hasattr(chunk, 'usage_metadata') and chunk.usage_metadata:
-                        usage = chunk.usage_metadata
+                timings.upstream_start()
+                if cached_answer is not None:
+                    # Replay the stored chunks so the client sees the same stream
+                    for content in cached_answer.chunks:
+                        if cancellation.cancelled:
+                            break
+                        timings.token()
+                        yield content
+                else:
+                    # Leaders and followers read the same upstream stream, followers from its start
+                    async for content in subscription:
+                        timings.token()
+                        yield content
+                if cancellation.cancelled:
+                    return
+                cancellation.finish()
+                finished = True
+
+                if cached_answer is None:
+                    # The tokens were billed once; only one of the sessions reports them
+                    usage = flight.claim_usage()
+                    if usage is not None:
                         prompt_tokens = usage.get("input_tokens", 0)
                         completion_tokens = usage.get("output_tokens", 0)
                         total_tokens = usage.get("total_tokens", 0)
-                    
-                    # Yield the content
-                    if chunk.content:
-                        yield chunk.content
+                        # Prompt tokens served from OpenAI's prompt cache
+                        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+                        answer_cache.put(cache_key, flight.chunks)
+                        ticket.record_tokens(total_tokens or prompt_tokens + completion_tokens)
+                    else:
+                        shared_completion_tokens = flight.usage.get("output_tokens", 0)
+
+                if store_enabled:
+                    answer = cached_answer.text if cached_answer is not None else "".join(flight.chunks)
+                    session_store.put(session_id, conversation_with_answer(messages, answer), conversation_version, turn)
 
                 # Calculate latency after stream finishes
                 latency_ms = int((time.time() - start_time) * 1000)
-                
-                background_tasks.add_task(
-                    send_posthog_event,
-                    "ai_inference_success",
-                    {
-                        "distinct_id": session_id,
-                        "session_id": session_id,
-                        "latency_ms": latency_ms,
-                        "prompt_tokens": prompt_tokens,
-                        "completion_tokens": completion_tokens,
-                        "total_tokens": total_tokens,
-                        "model_version": model_version
-                    }
-                )
+                if timings.first_token_at is not None:
+                    timings.add_stage("stream", time.perf_counter() - timings.first_token_at)
+                timings.completion_tokens = completion_tokens
+                if leader:
+                    # Followers and cache replays would feed near-zero TTFTs into the hedging percentile
+                    timings.upstream_ttft = flight.ttft
+                timings.record(time.time() - start_time)
+
+                with timings.span("telemetry"):
+                    send_posthog_event(
+                        background_tasks,
+                        "ai_inference_success",
+                        {
+                            "distinct_id": session_id,
+                            "session_id": session_id,
+                            "latency_ms": latency_ms,
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": total_tokens,
+                            "cached_tokens": cached_tokens,
+                            "model_version": model_version,
+                            "context_cache_hit": context_cache_hit,
+                            "context_chars": context_chars,
+                            "context_hash": context_snapshot.content_hash[:12],
+                            "context_mode": CONTEXT_MODE,
+                            "prompt_layout": PROMPT_LAYOUT,
+                            "context_sections": context_sections,
+                            "answer_cache_hit": cached_answer is not None,
+                            "single_flight": flight_role,
+                            "stream_format": stream_format,
+                            "shared_completion_tokens": shared_completion_tokens,
+                            "history_token_budget": HISTORY_TOKEN_BUDGET,
+                            "conversation_store": "hit" if stored is not None else ("full" if store_enabled else "off"),
+                            "history_messages_from_store": len(stored.messages) if stored is not None else 0,
+                            "request_bytes": int(http_request.headers.get("content-length") or 0),
+                            **history_plan.telemetry(),
+                            **timings.telemetry()
+                        }
+                    )
+                metrics.observe("stage_seconds", timings.stages["telemetry"], {**timings.labels, "stage": "telemetry"})
 
             except Exception as e:
+                finished = True
                 error_trace = traceback.format_exc()
-                background_tasks.add_task(
-                    send_posthog_event,
+                send_posthog_event(
+                    background_tasks,
                     "ai_inference_failed",
                     {
                         "distinct_id": session_id,
@@ -186,13 +562,37 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
                     }
                 )
                 raise e
+            finally:
+                if subscription is not None:
+                    await subscription.aclose()
+                # Leave the flight now (not when garbage-collected) so a sole upstream is aborted
+                release()
+                if not finished:
+                    # The client went away mid-stream
+                    report_cancelled()
 
-        return StreamingResponse(generate(), media_type="text/plain")
+        headers = {
+            "X-Context-Cache": "hit" if context_cache_hit else "miss",
+            "X-Context-Size": str(context_chars),
+            "X-Single-Flight": flight_role or "none",
+        }
+        if store_enabled:
+            # Saved once the answer is complete; the next turn can send just its message with this
+            headers["X-Conversation-Version"] = conversation_version
+        if stream_format == "segments":
+            min_chars = request.segment_min_chars if request.segment_min_chars is not None else SEGMENT_MIN_CHARS
+            segmenter = SentenceSegmenter(min_chars=min_chars, clause_chars=SEGMENT_CLAUSE_CHARS)
+            body, media_type = segment_stream(generate(), segmenter), "application/x-ndjson"
+        else:
+            body, media_type = generate(), "text/plain"
+        # The body's own finally never runs if it is not iterated, e.g. when the client leaves first
+        return ClosingStreamingResponse(body, on_close=release, media_type=media_type, headers=headers)
 
     except Exception as e:
+        release()
         error_trace = traceback.format_exc()
-        background_tasks.add_task(
-            send_posthog_event,
+        send_posthog_event(
+            background_tasks,
             "ai_inference_failed",
             {
                 "distinct_id": session_id,
@@ -202,15 +602,20 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
                 "stack_trace": error_trace
             }
         )
-        print(f"ERROR: {e}")
+        logger.error("Chat failed", extra={"session_id": session_id, "error_type": type(e).__name__, "error_message": str(e), "stack_trace": error_trace})
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Latency summaries (p50/p95/p99) and component counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/track")
-async def track(data: dict):
+async def track(data: dict, background_tasks: BackgroundTasks):
     """Log analytics events to Vercel console and persist to Google Sheets via Google Forms"""
     try:
-        # 1. Existing debug print
-        print(f"ANALYTICS_EVENT: {json.dumps(data)}")
+        # 1. Log the raw payload; serialized on the log thread, and sampled by LOG_SAMPLE_RATES
+        logger.log(ANALYTICS, "Analytics event", extra={"event": data})
 
         # 2. Extract fields (Robustly)
         # Event: 'event' or default to 'page_view'
@@ -243,20 +648,16 @@ async def track(data: dict):
             "entry.1004098287": screen
         }
 
-        # 4. Target URL
-        form_url = "https://docs.google.com/forms/d/e/1FAIpQLSfWNF-ginw7-prB-bNCzZvYOLZWsrCMgaY-iRZo94we2g2R6w/formResponse"
-
-        # 5. Send POST request (wrapped in try/except)
-        try:
-            response = requests.post(form_url, data=form_data, timeout=5)
-            if response.status_code != 200:
-                print(f"WARNING: Google Form returned status {response.status_code}")
-        except Exception as google_err:
-            print(f"WARNING: Failed to send data to Google Forms: {google_err}")
+        # 4. Hand off to the background forwarder (never blocks the event loop)
+        if not analytics_forwarder.enqueue(form_data):
+            logger.warning("Analytics queue full, dropping event")
+        elif SERVERLESS:
+            # Send before the container is frozen, after the response is returned
+            background_tasks.add_task(analytics_forwarder.drain)
 
         return {"status": "ok"}
     except Exception as e:
-        print(f"ERROR in tracking: {e}")
+        logger.error("Tracking failed", extra={"error_type": type(e).__name__, "error_message": str(e)})
         return {"status": "error", "message": str(e)}
 
 
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass
+class AdmissionLimits:
+    """Per-client and global limits for /api/chat; 0 disables a limit."""
+
+    max_concurrent: int = 3
+    requests_per_minute: float = 20.0
+    burst: int = 10
+    token_budget: int = 150_000
+    budget_window_seconds: float = 3600.0
+    max_in_flight: int = 100
+    max_clients: int = 10_000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Too many requests ({reason}); retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ClientState:
+    """Concurrency, token bucket and rolling token usage of one session or IP."""
+
+    __slots__ = ("in_flight", "tokens", "refilled_at", "usage", "usage_total")
+
+    def __init__(self, burst: int, now: float):
+        self.in_flight = 0
+        self.tokens = float(burst)
+        self.refilled_at = now
+        # (timestamp, tokens) of completed requests inside the budget window
+        self.usage: Deque[Tuple[float, int]] = deque()
+        self.usage_total = 0
+
+    def refill(self, limits: AdmissionLimits, now: float) -> None:
+        rate = limits.requests_per_minute / 60
+        self.tokens = min(float(limits.burst), self.tokens + (now - self.refilled_at) * rate)
+        self.refilled_at = now
+
+    def expire_usage(self, window: float, now: float) -> None:
+        while self.usage and now - self.usage[0][0] > window:
+            self.usage_total -= self.usage.popleft()[1]
+
+    def idle(self) -> bool:
+        return self.in_flight == 0 and not self.usage
+
+
+class Ticket:
+    """An admitted request; `release()` must be called once its stream ends."""
+
+    def __init__(self, controller: "AdmissionController", keys: List[str]):
+        self.controller = controller
+        self.keys = keys
+        self.released = False
+
+    def record_tokens(self, tokens: int) -> None:
+        self.controller.record_tokens(self.keys, tokens)
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller.release(self.keys)
+
+
+class AdmissionController:
+    """Admit or shed /api/chat requests before any upstream work is done.
+
+    Every request is checked against the limits of each of its keys (session
+    id and client IP): concurrent streams, a token-bucket request rate and a
+    rolling budget of LLM tokens, fed from the usage each stream reports when
+    it ends. A global cap on in-flight streams sheds load for everyone. A
+    rejected request raises `AdmissionRejected` with a Retry-After hint and
+    costs nothing. Beyond `max_clients`, idle client states are evicted
+    first, then the least recently seen ones with no stream in flight.
+    """
+
+    def __init__(self, limits: AdmissionLimits, clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self.clock = clock
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"global": 0, "concurrency": 0, "rate": 0, "token_budget": 0}
+        self.tokens_recorded = 0
+        self._clients: "OrderedDict[str, ClientState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def admit(self, keys: Sequence[str]) -> Ticket:
+        limits = self.limits
+        with self._lock:
+            now = self.clock()
+            if limits.max_in_flight and self.in_flight >= limits.max_in_flight:
+                self._reject("global", 1.0)
+
+            states = [self._client(key, now) for key in keys]
+            for state in states:
+                state.refill(limits, now)
+                state.expire_usage(limits.budget_window_seconds, now)
+                if limits.max_concurrent and state.in_flight >= limits.max_concurrent:
+                    self._reject("concurrency", 1.0)
+                if limits.requests_per_minute and state.tokens < 1:
+                    self._reject("rate", (1 - state.tokens) * 60 / limits.requests_per_minute)
+                if limits.token_budget and state.usage_total >= limits.token_budget:
+                    oldest = state.usage[0][0] if state.usage else now
+                    self._reject("token_budget", max(1.0, oldest + limits.budget_window_seconds - now))
+
+            for state in states:
+                state.in_flight += 1
+                if limits.requests_per_minute:
+                    state.tokens -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            self._evict_idle(now)
+        return Ticket(self, list(keys))
+
+    def record_tokens(self, keys: Sequence[str], tokens: int) -> None:
+        if tokens <= 0:
+            return
+        with self._lock:
+            now = self.clock()
+            self.tokens_recorded += tokens
+            for key in keys:
+                state = self._client(key, now)
+                state.usage.append((now, tokens))
+                state.usage_total += tokens
+
+    def release(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            for key in keys:
+                state = self._clients.get(key)
+                if state is not None:
+                    state.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "clients": len(self._clients),
+            "admitted": self.admitted,
+            "tokens_recorded": self.tokens_recorded,
+            **{f"rejected_{reason}": count for reason, count in self.rejected.items()},
+        }
+
+    def _client(self, key: str, now: float) -> ClientState:
+        state = self._clients.get(key)
+        if state is None:
+            state = self._clients[key] = ClientState(self.limits.burst, now)
+        else:
+            self._clients.move_to_end(key)
+        return state
+
+    def _reject(self, reason: str, retry_after: float) -> None:
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, retry_after)
+
+    def _evict_idle(self, now: float) -> None:
+        limits = self.limits
+        if len(self._clients) <= limits.max_clients:
+            return
+        # Usage only expires on a client's next admit(), and one-shot clients never
+        # come back, so expire it here before deciding who is idle
+        for state in self._clients.values():
+            state.expire_usage(limits.budget_window_seconds, now)
+        for key in [k for k, state in self._clients.items() if state.idle()]:
+            del self._clients[key]
+            if len(self._clients) <= limits.max_clients:
+                return
+        # Still over: drop the least recently seen clients, budget history and all
+        for key in [k for k, state in self._clients.items() if state.in_flight == 0]:
+            del self._clients[key]
+            if len(self._clients) <= limits.max_clients:
+                return
+
+
+def client_keys(session_id: Optional[str], client_ip: Optional[str]) -> List[str]:
+    """Admission keys of a request; the frontend's placeholder session id is not a client."""
+    keys = []
+    if session_id and session_id != "unknown":
+        keys.append(f"session:{session_id}")
+    if client_ip:
+        keys.append(f"ip:{client_ip}")
+    return keys
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, punctuation and spacing so "What tools does Fran use?" == "what tools does fran use"."""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", question.lower())).strip()
+
+
+def hash_history(messages: Iterable[Any]) -> str:
+    """Hash the role/content pairs of the prior turns, ignoring ids and whitespace."""
+    trimmed = []
+    for message in messages:
+        if isinstance(message, dict):
+            role, content = message.get("role"), message.get("content")
+        else:
+            role, content = getattr(message, "role", None), getattr(message, "content", None)
+        if isinstance(content, str):
+            content = content.strip()
+        trimmed.append([role, content])
+    encoded = json.dumps(trimmed, separators=(",", ":"), sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    chunks: List[str]
+    created_at: float
+    size_bytes: int
+    hits: int = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+
+class AnswerCache:
+    """LRU + TTL cache of completed answers, bounded by entry count and bytes.
+
+    Answers are stored as the list of chunks the model streamed, so a hit can
+    be replayed through the same `StreamingResponse` with the same framing.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 2_000_000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_key(question: str, history: Iterable[Any], context_hash: str, variant: str = "") -> str:
+        parts = [normalize_question(question), hash_history(history), context_hash, variant]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if time.monotonic() - entry.created_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        if not self.enabled or not chunks:
+            return
+
+        size = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = CachedAnswer(chunks=list(chunks), created_at=time.monotonic(), size_bytes=size)
+            self.size_bytes += size
+
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.size_bytes -= entry.size_bytes
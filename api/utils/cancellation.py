@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+class Cancellation:
+    """A one-shot signal that the client of a streaming response went away.
+
+    Callbacks registered with `on_cancel` run when `cancel` is called, so work
+    that is blocked (an upstream read in a threadpool thread, a wait for the
+    next shared chunk) is aborted at once instead of at its next chunk. Once
+    the stream has `finish`ed, a late disconnect no longer counts. The
+    streaming code leaves what it had produced so far in `usage` for the
+    caller to report.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self.finished = False
+        self.usage: Dict[str, Any] = {}
+        self._callbacks: List[Callable[[], Any]] = []
+        self._lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def on_cancel(self, callback: Callable[[], Any]) -> None:
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> bool:
+        """Cancel and run the callbacks; False if already cancelled or finished."""
+        with self._lock:
+            if self.cancelled or self.finished:
+                return False
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Cancellation callback failed", extra={"error_message": str(e)})
+        return True
+
+    def finish(self) -> None:
+        with self._lock:
+            self.finished = True
+            self._callbacks = []
+
+    def watch(self, request: Request) -> asyncio.Task:
+        """Start watching `request` for a disconnect; the task ends with the response."""
+        # Held here: the loop keeps only a weak reference to running tasks
+        self._watcher = asyncio.ensure_future(watch_disconnect(request, self))
+        return self._watcher
+
+
+async def watch_disconnect(request: Request, cancellation: Cancellation) -> None:
+    """Cancel `cancellation` when the client of `request` disconnects.
+
+    Starlette only listens for `http.disconnect` on servers older than ASGI
+    spec 2.4, and never while a sync generator is blocked in the threadpool,
+    so the stream watches for it itself. Call this only after the request
+    body has been read.
+    """
+    while not cancellation.finished:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            cancellation.cancel()
+            return
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """A StreamingResponse that calls `on_close` once it has been sent, abandoned or failed.
+
+    A body generator that is never iterated (the client went away before the
+    first chunk, or sending the headers failed) never runs its `finally`, so
+    whatever it would release must be released here as well; `on_close`
+    must tolerate being called after the body has already done so.
+    """
+
+    def __init__(self, content: Any, on_close: Callable[[], Any], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
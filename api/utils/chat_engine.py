@@ -0,0 +1,65 @@
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+
+
+class DirectChunk:
+    """The two fields `chat()` reads from a LangChain `AIMessageChunk`, without the pydantic model."""
+
+    __slots__ = ("content", "usage_metadata")
+
+    def __init__(self, content: str, usage_metadata: Optional[Dict[str, Any]] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+def usage_metadata(usage) -> Dict[str, Any]:
+    """OpenAI `usage` in LangChain's `usage_metadata` shape."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "input_tokens": usage.prompt_tokens,
+        "output_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        "input_token_details": {"cache_read": getattr(details, "cached_tokens", None) or 0},
+    }
+
+
+class DirectChatEngine:
+    """Stream chat completions straight from the `openai` client.
+
+    Sends the same request body as `ChatOpenAI(streaming=True)` with usage
+    reporting, and yields `DirectChunk`s so `chat()` consumes both engines the
+    same way. Skips LangChain's runnable callbacks and per-chunk message objects.
+    """
+
+    def __init__(self, model: str, temperature: float, api_key: Optional[str] = None, client=None):
+        self.model_name = model
+        self.temperature = temperature
+        self.api_key = api_key
+        self._client = client
+
+    def get_client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=self.api_key or os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    async def astream(self, messages: Sequence[Dict[str, Any]]) -> AsyncIterator[DirectChunk]:
+        stream = await self.get_client().chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        try:
+            async for chunk in stream:
+                for choice in chunk.choices:
+                    content = choice.delta.content if choice.delta is not None else None
+                    if content:
+                        yield DirectChunk(content)
+                if chunk.usage is not None:
+                    yield DirectChunk("", usage_metadata(chunk.usage))
+        finally:
+            # Release the connection at once when the caller stops reading early
+            await stream.close()
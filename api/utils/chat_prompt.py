@@ -0,0 +1,71 @@
+# Prompt templates for /api/chat. Plain strings here; the LangChain versions are
+# built on first use so neither engine pays for LangChain at import time.
+import functools
+from typing import Any, Dict, List, Optional, Sequence
+
+# Enhanced System Prompt
+SYSTEM_TEMPLATE = """You are an AI assistant for Fran Chaves's professional portfolio. 
+        Your goal is to represent Fran professionally based strictly on the provided context.
+        
+        Context about Fran:
+        {context}
+        
+        Instructions:
+        1.  **Be Professional yet Personable:** Use a confident and approachable tone.
+        2.  **Strict Adherence to Context:** Answer ONLY from the context. If not in context, say you don't have that info. No hallucinations.
+        3.  **ULTRA CONCISE:** Maximum 2-3 sentences. Get straight to the key point. This is voice-first - every word costs TTS credits.
+        4.  **Simple Language:** Conversational, clear. No complex sentences.
+        5.  **Third Person:** Refer to Fran in third person (e.g., "Fran has experience in...").
+        """
+
+PREFIX_SYSTEM_TEMPLATE = """You are an AI assistant for Fran Chaves's professional portfolio.
+Your goal is to represent Fran professionally based strictly on the provided context.
+
+Instructions:
+1.  **Be Professional yet Personable:** Use a confident and approachable tone.
+2.  **Strict Adherence to Context:** Answer ONLY from the context. If not in context, say you don't have that info. No hallucinations.
+3.  **ULTRA CONCISE:** Maximum 2-3 sentences. Get straight to the key point. This is voice-first - every word costs TTS credits.
+4.  **Simple Language:** Conversational, clear. No complex sentences.
+5.  **Third Person:** Refer to Fran in third person (e.g., "Fran has experience in...").
+
+Context about Fran:
+{context}"""
+
+RETRIEVED_HEADER = "More context about Fran:\n"
+
+
+def render_system_prompt(layout: str, context: str) -> str:
+    """The system message exactly as the LangChain template would format it."""
+    template = PREFIX_SYSTEM_TEMPLATE if layout == "prefix" else SYSTEM_TEMPLATE
+    return template.format(context=context)
+
+
+def build_messages(
+    system_prompt: str,
+    history: Sequence[Dict[str, Any]],
+    question: str,
+    retrieved: Optional[Sequence[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """OpenAI chat messages in the same order the templates produce: system, history, retrieved, question."""
+    return [{"role": "system", "content": system_prompt}, *history, *(retrieved or ()), {"role": "user", "content": question}]
+
+
+@functools.lru_cache(maxsize=None)
+def langchain_prompts():
+    """(CHAT_PROMPT, PREFIX_CHAT_PROMPT) as LangChain templates."""
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    chat_prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_TEMPLATE),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{question}")
+    ])
+    # Static system prefix first; everything that varies per request (history,
+    # retrieved sections, the question) comes after it.
+    prefix_chat_prompt = ChatPromptTemplate.from_messages([
+        ("system", PREFIX_SYSTEM_TEMPLATE),
+        MessagesPlaceholder(variable_name="history"),
+        MessagesPlaceholder(variable_name="retrieved", optional=True),
+        ("human", "{question}")
+    ])
+    return chat_prompt, prefix_chat_prompt
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, List, Optional
+
+# A delta that ends a sentence or a line: flushing here keeps TTS and
+# typewriter rendering on natural breaks.
+SENTENCE_BOUNDARY = re.compile(r"[.!?…][\"')\]]*\s*$|\n")
+
+
+@dataclass
+class CoalesceConfig:
+    """When buffered `text-delta`s are flushed as one frame; whichever limit is hit first wins."""
+
+    window_ms: float = 30.0
+    max_bytes: int = 256
+    sentence_boundary: bool = True
+
+    @classmethod
+    def from_env(cls) -> Optional["CoalesceConfig"]:
+        """`SSE_COALESCE_MS` > 0 turns coalescing on for `stream_text` by default."""
+        window_ms = float(os.getenv("SSE_COALESCE_MS", "0"))
+        if window_ms <= 0:
+            return None
+        return cls(
+            window_ms=window_ms,
+            max_bytes=int(os.getenv("SSE_COALESCE_BYTES", "256")),
+            sentence_boundary=os.getenv("SSE_COALESCE_SENTENCES", "1") != "0",
+        )
+
+
+class TextDeltaCoalescer:
+    """Merge consecutive `text-delta` events into fewer, larger ones.
+
+    The first delta of a stream is always sent at once so time to first
+    token is unchanged. Any other event type flushes the buffer before it is
+    passed through, so the event order the AI SDK sees is preserved.
+    """
+
+    def __init__(self, config: CoalesceConfig, clock: Callable[[], float] = time.monotonic):
+        self.config = config
+        self.clock = clock
+        self.frames_in = 0
+        self.frames_out = 0
+        self._parts: List[str] = []
+        self._size = 0
+        self._text_id: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self._sent_first = False
+
+    def push(self, payload: dict) -> Iterator[dict]:
+        if payload.get("type") != "text-delta":
+            yield from self.flush()
+            yield payload
+            return
+
+        self.frames_in += 1
+        if self._text_id is not None and payload["id"] != self._text_id:
+            yield from self.flush()
+        delta = payload["delta"]
+        now = self.clock()
+        if not self._parts:
+            self._started_at = now
+        self._text_id = payload["id"]
+        self._parts.append(delta)
+        self._size += len(delta.encode("utf-8"))
+
+        if (
+            not self._sent_first
+            or self._size >= self.config.max_bytes
+            or (now - self._started_at) * 1000 >= self.config.window_ms
+            or (self.config.sentence_boundary and SENTENCE_BOUNDARY.search(delta))
+        ):
+            yield from self.flush()
+
+    def flush(self) -> Iterator[dict]:
+        if not self._parts:
+            return
+        self.frames_out += 1
+        self._sent_first = True
+        yield {"type": "text-delta", "id": self._text_id, "delta": "".join(self._parts)}
+        self._parts = []
+        self._size = 0
+        self._started_at = None
+
+    def due_in(self) -> Optional[float]:
+        """Seconds until the buffered text must go out, or None if nothing is buffered."""
+        if not self._parts:
+            return None
+        return max(0.0, self._started_at + self.config.window_ms / 1000 - self.clock())
+
+
+def coalesced(payloads: Iterable[dict], coalescer: Optional[TextDeltaCoalescer]) -> Iterator[dict]:
+    if coalescer is None:
+        yield from payloads
+        return
+    for payload in payloads:
+        yield from coalescer.push(payload)
+
+
+async def with_deadlines(
+    stream: AsyncIterator[Any], due_in: Callable[[], Optional[float]]
+) -> AsyncIterator[Any]:
+    """Yield items from `stream`, plus `None` whenever `due_in()` elapses before the next item arrives.
+
+    The pending read is never cancelled, so the upstream iterator is not
+    left in a half-read state.
+    """
+    iterator = stream.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            timeout = due_in()
+            try:
+                if pending is None and timeout is None:
+                    # Nothing buffered: read directly, without a task per chunk
+                    item = await iterator.__anext__()
+                else:
+                    if pending is None:
+                        pending = asyncio.ensure_future(iterator.__anext__())
+                    if timeout is not None:
+                        done, _ = await asyncio.wait({pending}, timeout=timeout)
+                        if not done:
+                            yield None
+                            continue
+                    item = await pending
+                    pending = None
+            except StopAsyncIteration:
+                pending = None
+                return
+            yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ContextSnapshot:
+    """An immutable view of the portfolio data as it was last loaded."""
+
+    text: str
+    content_hash: str
+    mtime: float
+    loaded_at: float
+    prompt: Any = None
+    index: Any = None
+
+    @property
+    def size_chars(self) -> int:
+        return len(self.text)
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.text.encode("utf-8"))
+
+
+class ContextCache:
+    """Keep `data.txt` in memory and reload it only when the file changes.
+
+    Anything derived from the text (the compiled prompt, the retrieval index)
+    is rebuilt together with it, so callers never see a mismatched pair.
+
+    The file is `stat()`-ed at most once every `check_interval` seconds. A
+    changed mtime triggers a re-read, but the snapshot (and everything compiled
+    from it) is only replaced when the content hash actually differs, so a
+    `touch` does not throw away the compiled artifacts.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        compile_prompt: Optional[Callable[[str], Any]] = None,
+        build_index: Optional[Callable[[str], Any]] = None,
+        check_interval: float = 2.0,
+        fallback_text: str = "Error loading data.",
+    ):
+        self.path = Path(path)
+        self.compile_prompt = compile_prompt
+        self.build_index = build_index
+        self.check_interval = check_interval
+        self.fallback_text = fallback_text
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+        self._snapshot: Optional[ContextSnapshot] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[ContextSnapshot, bool]:
+        """Return the current snapshot and whether it was served from memory."""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._last_check < self.check_interval:
+            self.hits += 1
+            return snapshot, True
+
+        with self._lock:
+            snapshot = self._snapshot
+            self._last_check = now
+
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+
+            if snapshot is not None and (mtime is None or mtime == snapshot.mtime):
+                self.hits += 1
+                return snapshot, True
+
+            self.misses += 1
+            self._snapshot = self._load(mtime, snapshot)
+            return self._snapshot, False
+
+    def invalidate(self) -> None:
+        """Force the next `get()` to re-check the file."""
+        self._last_check = 0.0
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "content_hash": snapshot.content_hash if snapshot else None,
+            "size_chars": snapshot.size_chars if snapshot else 0,
+        }
+
+    def _load(self, mtime: Optional[float], previous: Optional[ContextSnapshot]) -> ContextSnapshot:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                text = file.read()
+        except Exception:
+            if previous is not None:
+                # Keep serving the last good copy rather than the error string.
+                return previous
+            text = self.fallback_text
+            mtime = None
+
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if previous is not None and previous.content_hash == content_hash:
+            return ContextSnapshot(
+                text=previous.text,
+                content_hash=content_hash,
+                mtime=mtime if mtime is not None else previous.mtime,
+                loaded_at=previous.loaded_at,
+                prompt=previous.prompt,
+                index=previous.index,
+            )
+
+        self.reloads += 1
+        prompt = self.compile_prompt(text) if self.compile_prompt else None
+        index = self.build_index(text) if self.build_index else None
+        logger.debug("Loaded portfolio context", extra={"chars": len(text), "sha256": content_hash[:12]})
+        return ContextSnapshot(
+            text=text,
+            content_hash=content_hash,
+            mtime=mtime if mtime is not None else 0.0,
+            loaded_at=time.time(),
+            prompt=prompt,
+            index=index,
+        )
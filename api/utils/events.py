@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_POSTHOG_HOST = "https://us.i.posthog.com"
+
+
+def posthog_api_key() -> Optional[str]:
+    return os.getenv("POSTHOG_API_KEY") or os.getenv("NEXT_PUBLIC_POSTHOG_KEY")
+
+
+def configure_posthog() -> bool:
+    """Import PostHog and set its credentials from the environment if they are not set yet.
+
+    Deferred until the first flush so processes that never send an event
+    don't pay for importing the SDK.
+    """
+    import posthog
+
+    if not posthog.api_key:
+        posthog.api_key = posthog_api_key()
+        posthog.host = os.getenv("POSTHOG_HOST") or os.getenv("NEXT_PUBLIC_POSTHOG_HOST") or DEFAULT_POSTHOG_HOST
+    return bool(posthog.api_key)
+
+
+class EventPipeline:
+    """Buffer PostHog events in memory and send them in batches.
+
+    `record()` is cheap and safe to call from the event loop; it never touches
+    the network. `flush()` captures every buffered event and then calls
+    `posthog.flush()` once for the whole batch, so it belongs in a background
+    task or thread.
+
+    In long-running mode `flush_if_due()` only sends once `batch_size` events
+    are buffered or the oldest one is `flush_interval` seconds old. In
+    serverless mode the container may be frozen after the response, so callers
+    flush once at the end of every invocation instead.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 20,
+        flush_interval: float = 10.0,
+        max_buffer: int = 1000,
+        serverless: bool = False,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.serverless = serverless
+
+        self.counters: Dict[str, int] = {
+            "queued": 0,
+            "sent": 0,
+            "dropped": 0,
+            "flushes": 0,
+        }
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._oldest_at: Optional[float] = None
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def record(self, event_name: str, properties: Dict[str, Any]) -> bool:
+        if len(self._buffer) >= self.max_buffer:
+            self.counters["dropped"] += 1
+            return False
+
+        with self._buffer_lock:
+            if not self._buffer:
+                self._oldest_at = time.monotonic()
+            self._buffer.append({
+                "distinct_id": properties.get("distinct_id", "backend_user"),
+                "event": event_name,
+                "properties": properties,
+            })
+        self.counters["queued"] += 1
+        return True
+
+    def is_due(self) -> bool:
+        if not self._buffer:
+            return False
+        if self.serverless or len(self._buffer) >= self.batch_size:
+            return True
+        return self._oldest_at is not None and time.monotonic() - self._oldest_at >= self.flush_interval
+
+    def flush_if_due(self) -> int:
+        return self.flush() if self.is_due() else 0
+
+    def flush(self) -> int:
+        """Send everything buffered so far. Returns the number of events sent."""
+        with self._flush_lock:
+            with self._buffer_lock:
+                batch, self._buffer = self._buffer, []
+                self._oldest_at = None
+
+            if not batch:
+                return 0
+
+            if not configure_posthog():
+                logger.warning("PostHog API key not set; dropping events", extra={"events": len(batch)})
+                self.counters["dropped"] += len(batch)
+                return 0
+
+            import posthog
+
+            try:
+                for event in batch:
+                    posthog.capture(
+                        distinct_id=event["distinct_id"],
+                        event=event["event"],
+                        properties=event["properties"],
+                    )
+                posthog.flush()
+            except Exception as e:
+                logger.error("PostHog flush failed", extra={"events": len(batch), "error_message": str(e)})
+                self.counters["dropped"] += len(batch)
+                return 0
+
+            self.counters["sent"] += len(batch)
+            self.counters["flushes"] += 1
+            logger.debug("Flushed PostHog events", extra={"events": len(batch)})
+            return len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "buffered": len(self._buffer)}
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitBreaker:
+    """Stop calling a failing upstream for `reset_timeout` seconds.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `allow()` returns False. Once the timeout has passed a single trial call is
+    let through (half-open); its result closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            return True
+        # Open, or half-open with the trial call already in flight.
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class FormForwarder:
+    """Forward analytics rows to Google Forms from a background worker.
+
+    `enqueue()` never blocks the request: rows go into a bounded queue and a
+    single worker task drains it in batches over one pooled `httpx.AsyncClient`.
+    Rows are dropped (and counted) when the queue is full or the circuit is open.
+
+    The queue, worker and client belong to the event loop that created them.
+    Serverless invocations (and a TestClient without lifespan) can run each
+    request on a new loop, so they are rebuilt when the running loop changes,
+    carrying over rows that were still queued.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_queue: int = 1000,
+        batch_size: int = 10,
+        timeout: float = 5.0,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+
+        self.counters: Dict[str, int] = {
+            "enqueued": 0,
+            "sent": 0,
+            "failed": 0,
+            "dropped_overflow": 0,
+            "dropped_circuit_open": 0,
+            "loop_rebinds": 0,
+        }
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def enqueue(self, form_data: Dict[str, Any]) -> bool:
+        """Queue one form submission. Must be called from the event loop."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(form_data)
+        except asyncio.QueueFull:
+            self.counters["dropped_overflow"] += 1
+            return False
+        self.counters["enqueued"] += 1
+        return True
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Wait until everything queued so far has been sent (or given up on)."""
+        if self._queue is None:
+            return
+        self._ensure_worker()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Analytics drain timed out", extra={"pending": self._queue.qsize()})
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Drain the queue, stop the worker and release pooled connections."""
+        if self._queue is None:
+            return
+        await self.drain(timeout)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+        }
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._rebind(loop)
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run(self._queue, self._get_client()))
+
+    def _rebind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Move to `loop`: the old loop's worker and client can't be used (or closed) from here."""
+        pending = []
+        if self._queue is not None:
+            self.counters["loop_rebinds"] += 1
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        for row in pending:
+            self._queue.put_nowait(row)
+        self._worker = None
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self.transport,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 3.0)),
+                limits=httpx.Limits(max_connections=self.batch_size, max_keepalive_connections=self.batch_size),
+            )
+        return self._client
+
+    async def _run(self, queue: asyncio.Queue, client: httpx.AsyncClient) -> None:
+        # Bound to one loop's queue and client, so a worker left behind by a rebind never touches the new ones
+        while True:
+            batch: List[Dict[str, Any]] = [await queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                await asyncio.gather(*(self._send(client, row) for row in batch))
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _send(self, client: httpx.AsyncClient, form_data: Dict[str, Any]) -> None:
+        if not self.breaker.allow():
+            self.counters["dropped_circuit_open"] += 1
+            return
+        try:
+            response = await client.post(self.url, data=form_data)
+            if response.status_code != 200:
+                logger.warning("Google Form returned an error status", extra={"status_code": response.status_code})
+                self.breaker.record_failure()
+                self.counters["failed"] += 1
+                return
+        except Exception as google_err:
+            logger.warning("Failed to send data to Google Forms", extra={"error_message": str(google_err)})
+            self.breaker.record_failure()
+            self.counters["failed"] += 1
+            return
+        self.breaker.record_success()
+        self.counters["sent"] += 1
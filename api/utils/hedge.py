@@ -0,0 +1,175 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from .metrics import Histogram
+
+
+class HedgePolicy:
+    """How long to wait for the first token before sending a second, identical request.
+
+    The deadline is either fixed (`deadline_ms`) or a quantile of the observed
+    time to first token, e.g. 0.95 for p95, clamped to [min_ms, max_ms]. An
+    adaptive policy does not hedge until `min_samples` TTFTs have been seen.
+    """
+
+    def __init__(
+        self,
+        deadline_ms: float = 0,
+        quantile: Optional[float] = None,
+        histogram: Optional[Callable[[], Optional[Histogram]]] = None,
+        min_ms: float = 1000,
+        max_ms: float = 10000,
+        min_samples: int = 50,
+    ):
+        self.deadline_ms = deadline_ms
+        self.quantile = quantile
+        self.histogram = histogram
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.min_samples = min_samples
+
+    @classmethod
+    def parse(cls, value: str, histogram: Callable[[], Optional[Histogram]], **limits) -> "HedgePolicy":
+        """`0` (off), a deadline in ms such as `2500`, or a TTFT percentile such as `p95`."""
+        value = value.strip().lower()
+        if value.startswith("p"):
+            return cls(quantile=float(value[1:]) / 100, histogram=histogram, **limits)
+        return cls(deadline_ms=float(value), **limits)
+
+    @property
+    def enabled(self) -> bool:
+        return self.quantile is not None or self.deadline_ms > 0
+
+    def deadline(self) -> Optional[float]:
+        """Seconds to wait for the first token, or None to not hedge this request."""
+        if self.quantile is None:
+            return self.deadline_ms / 1000 if self.deadline_ms > 0 else None
+        histogram = self.histogram() if self.histogram is not None else None
+        if histogram is None or histogram.count < self.min_samples:
+            return None
+        observed_ms = histogram.quantiles((self.quantile,))[self.quantile] * 1000
+        return min(self.max_ms, max(self.min_ms, observed_ms)) / 1000
+
+
+class Attempt:
+    """One upstream stream, read ahead until its first content chunk."""
+
+    def __init__(self, stream: AsyncIterator[Any]):
+        self.iterator = stream.__aiter__()
+        self.buffered: List[Any] = []
+        self.content_chunks = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> "Attempt":
+        self.task = asyncio.ensure_future(self._first_token())
+        return self
+
+    async def _first_token(self) -> None:
+        async for chunk in self.iterator:
+            self.buffered.append(chunk)
+            if chunk.content:
+                self.content_chunks += 1
+                return
+
+    async def close(self) -> None:
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except BaseException:
+                pass
+        aclose = getattr(self.iterator, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                pass
+
+
+class Hedger:
+    """Send a second, identical upstream request when the first is slow to produce a token.
+
+    If the first content chunk has not arrived within the policy's deadline,
+    the same request is sent again; whichever stream yields content first is
+    streamed to the caller and the other is closed. Counters make the cost
+    visible: every hedge pays for a second prompt (estimated from the
+    winner's usage) and for whatever the loser generated before it was closed.
+    """
+
+    def __init__(self, policy: HedgePolicy):
+        self.policy = policy
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.extra_prompt_tokens = 0
+        self.extra_completion_chunks = 0
+
+    def wrap(self, open_stream: Callable[[], AsyncIterator[Any]]) -> Callable[[], AsyncIterator[Any]]:
+        if not self.policy.enabled:
+            return open_stream
+        return lambda: self.stream(open_stream)
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        self.requests += 1
+        deadline = self.policy.deadline()
+        if deadline is None:
+            async for chunk in open_stream():
+                yield chunk
+            return
+
+        attempts = [Attempt(open_stream()).start()]
+        winner: Optional[Attempt] = None
+        try:
+            done, _ = await asyncio.wait({attempts[0].task}, timeout=deadline)
+            if not done:
+                self.hedges += 1
+                attempts.append(Attempt(open_stream()).start())
+
+            winner = await self.race(attempts)
+            hedged = len(attempts) > 1
+            if hedged:
+                if winner is attempts[0]:
+                    self.primary_wins += 1
+                else:
+                    self.hedge_wins += 1
+                for loser in attempts:
+                    if loser is not winner:
+                        await loser.close()
+                        self.extra_completion_chunks += loser.content_chunks
+
+            for chunk in winner.buffered:
+                yield chunk
+            async for chunk in winner.iterator:
+                usage = getattr(chunk, "usage_metadata", None)
+                if hedged and usage:
+                    # The loser was sent the same prompt
+                    self.extra_prompt_tokens += usage.get("input_tokens", 0)
+                yield chunk
+        finally:
+            for attempt in attempts:
+                await attempt.close()
+
+    async def race(self, attempts: List[Attempt]) -> Attempt:
+        """The first attempt to produce content (or finish); raises only if every attempt failed."""
+        pending = {attempt.task: attempt for attempt in attempts}
+        errors: List[BaseException] = []
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = pending.pop(task)
+                if task.exception() is None:
+                    return attempt
+                errors.append(task.exception())
+        raise errors[0]
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "extra_prompt_tokens": self.extra_prompt_tokens,
+            "extra_completion_chunks": self.extra_completion_chunks,
+        }
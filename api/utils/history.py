@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Per-message framing overhead in chat-format prompts, plus a flat estimate
+# for image parts (a low-detail image costs 85 tokens).
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_PART_TOKENS = 85
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Estimate tokens. Uses tiktoken when `HISTORY_TOKENIZER=tiktoken`, otherwise ~4 chars per token.
+
+    The heuristic is the default because tiktoken fetches its vocabulary on
+    first use, which is a poor trade on a serverless cold start.
+    """
+    global _encoding
+    if not text:
+        return 0
+    if os.getenv("HISTORY_TOKENIZER") == "tiktoken":
+        if _encoding is None:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                _encoding = False
+        if _encoding:
+            return len(_encoding.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def message_role(message: Any) -> Optional[str]:
+    return message.get("role") if isinstance(message, dict) else getattr(message, "role", None)
+
+
+def message_text(message: Any) -> str:
+    """Plain text of a chat message whose content is a string or a list of parts."""
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text")
+    return ""
+
+
+def message_tokens(message: Any) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message_text(message))
+    if isinstance(message, dict):
+        content = message.get("content")
+        if isinstance(content, list):
+            tokens += IMAGE_PART_TOKENS * sum(1 for part in content if isinstance(part, dict) and part.get("type") == "image_url")
+        if message.get("tool_calls"):
+            tokens += count_tokens(json.dumps(message["tool_calls"], default=str))
+    return tokens
+
+
+def split_turns(messages: Sequence[Any]) -> List[List[Any]]:
+    """Group messages into turns; each user message starts a new turn.
+
+    Assistant replies, tool calls and tool results stay attached to the user
+    message that triggered them, so a window never splits a tool call from
+    its result.
+    """
+    turns: List[List[Any]] = []
+    for message in messages:
+        if message_role(message) == "user" or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _first_sentence(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    sentence = _SENTENCE_END.split(text, maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[: limit - 1].rstrip() + "…"
+
+
+def extractive_summary(previous: str, turn: Sequence[Any]) -> str:
+    """Fold one turn into the summary as a single line, without calling a model."""
+    parts = []
+    for message in turn:
+        role = message_role(message)
+        text = message_text(message)
+        if not text or role not in ("user", "assistant"):
+            continue
+        label = "User asked" if role == "user" else "Assistant said"
+        parts.append(f"{label}: {_first_sentence(text, 160 if role == 'assistant' else 120)}")
+    if not parts:
+        return previous
+    line = "- " + " / ".join(parts)
+    return f"{previous}\n{line}" if previous else line
+
+
+@dataclass
+class HistoryPlan:
+    """What the window decided for one request."""
+
+    messages: List[Any] = field(default_factory=list)
+    summary: Optional[str] = None
+    total_turns: int = 0
+    kept_turns: int = 0
+    summarized_turns: int = 0
+    original_tokens: int = 0
+    kept_tokens: int = 0
+    summary_tokens: int = 0
+
+    @property
+    def history_tokens(self) -> int:
+        return self.kept_tokens + self.summary_tokens
+
+    def telemetry(self) -> Dict[str, int]:
+        return {
+            "history_turns": self.total_turns,
+            "history_turns_kept": self.kept_turns,
+            "history_turns_summarized": self.summarized_turns,
+            "history_tokens_original": self.original_tokens,
+            "history_tokens": self.history_tokens,
+        }
+
+
+class HistoryWindow:
+    """Keep the newest turns verbatim within a token budget; fold older ones into a summary.
+
+    Summaries are rolling: each folded turn extends the summary of the turns
+    before it, and every intermediate summary is cached under a hash of the
+    prefix it covers. A conversation that grows by one turn therefore only
+    folds the one turn that just fell out of the window.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 6,
+        token_budget: int = 1200,
+        summary_token_budget: int = 250,
+        summarizer: Callable[[str, Sequence[Any]], str] = extractive_summary,
+        cache_size: int = 1024,
+    ):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.summarizer = summarizer
+        self.cache_size = cache_size
+        self.summary_cache_hits = 0
+        self.summary_cache_misses = 0
+
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.token_budget > 0
+
+    def fit(self, history: Sequence[Any]) -> HistoryPlan:
+        """Plan the prior turns of a conversation (everything before the current question)."""
+        turns = split_turns(history)
+        turn_tokens = [sum(message_tokens(m) for m in turn) for turn in turns]
+        plan = HistoryPlan(total_turns=len(turns), original_tokens=sum(turn_tokens))
+
+        if not self.enabled:
+            plan.messages = list(history)
+            plan.kept_turns = len(turns)
+            plan.kept_tokens = plan.original_tokens
+            return plan
+
+        keep_from = len(turns)
+        used = 0
+        while keep_from > 0 and len(turns) - keep_from < self.max_turns:
+            cost = turn_tokens[keep_from - 1]
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            keep_from -= 1
+
+        plan.messages = [message for turn in turns[keep_from:] for message in turn]
+        plan.kept_turns = len(turns) - keep_from
+        plan.kept_tokens = used
+        plan.summarized_turns = keep_from
+
+        if keep_from:
+            plan.summary = self._summarize(turns[:keep_from])
+            plan.summary_tokens = count_tokens(plan.summary) + MESSAGE_OVERHEAD_TOKENS
+        return plan
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "summaries_cached": len(self._summaries),
+            "summary_cache_hits": self.summary_cache_hits,
+            "summary_cache_misses": self.summary_cache_misses,
+        }
+
+    def _summarize(self, turns: Sequence[Sequence[Any]]) -> str:
+        prefix_hashes = []
+        digest = ""
+        for turn in turns:
+            encoded = json.dumps([[message_role(m), message_text(m)] for m in turn])
+            digest = hashlib.sha256((digest + encoded).encode("utf-8")).hexdigest()
+            prefix_hashes.append(digest)
+
+        with self._lock:
+            start, summary = 0, ""
+            for i in range(len(turns), 0, -1):
+                cached = self._summaries.get(prefix_hashes[i - 1])
+                if cached is not None:
+                    self._summaries.move_to_end(prefix_hashes[i - 1])
+                    start, summary = i, cached
+                    break
+
+            if start == len(turns):
+                self.summary_cache_hits += 1
+                return summary
+            self.summary_cache_misses += 1
+
+        for i in range(start, len(turns)):
+            summary = self._trim(self.summarizer(summary, turns[i]))
+            with self._lock:
+                self._summaries[prefix_hashes[i]] = summary
+                while len(self._summaries) > self.cache_size:
+                    self._summaries.popitem(last=False)
+        return summary
+
+    def _trim(self, summary: str) -> str:
+        """Drop the oldest summary lines until it fits its own budget."""
+        lines = summary.split("\n")
+        while len(lines) > 1 and count_tokens("\n".join(lines)) > self.summary_token_budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+
+def summary_message(summary: str) -> str:
+    return f"Summary of the earlier conversation:\n{summary}"
@@ -0,0 +1,224 @@
+import base64
+import hashlib
+import io
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+# Pillow is imported on first use: most requests carry no images, and the
+# import would otherwise land on every cold start.
+_pil = None
+
+DATA_URL = re.compile(r"^data:(image/[\w.+-]+);base64,", re.IGNORECASE)
+
+
+def _load_pil():
+    global _pil
+    if _pil is None:
+        try:
+            from PIL import Image
+
+            _pil = Image
+        except ImportError:  # pragma: no cover - Pillow is optional
+            _pil = False
+    return _pil or None
+
+
+def image_tokens(width: int, height: int, detail: str = "auto") -> int:
+    """OpenAI's vision token cost: fit in 2048x2048, shortest side to 768, 170 per 512px tile plus 85."""
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+@dataclass
+class ProcessedImage:
+    """The result for one image content hash; `url` is None when the original is sent unchanged."""
+
+    url: Optional[str]
+    original_bytes: int
+    processed_bytes: int
+    original_tokens: int
+    processed_tokens: int
+
+
+@dataclass
+class ImageReport:
+    """Totals of what downscaling saved over the conversions it was passed to (see `image_bench`)."""
+
+    images: int = 0
+    resized: int = 0
+    cache_hits: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    def add(self, image: ProcessedImage, cache_hit: bool) -> None:
+        self.images += 1
+        self.resized += image.url is not None
+        self.cache_hits += cache_hit
+        self.bytes_before += image.original_bytes
+        self.bytes_after += image.processed_bytes
+        self.tokens_before += image.original_tokens
+        self.tokens_after += image.processed_tokens
+
+    def telemetry(self) -> Dict[str, int]:
+        return {
+            "images": self.images,
+            "images_resized": self.resized,
+            "image_cache_hits": self.cache_hits,
+            "image_bytes_saved": self.bytes_before - self.bytes_after,
+            "image_tokens_saved": self.tokens_before - self.tokens_after,
+        }
+
+
+class ImagePreprocessor:
+    """Downscale and re-encode data-URL images before they are sent to the model.
+
+    Images larger than `max_dimension` on either side are resized to fit and
+    re-encoded (JPEG at `quality`, or PNG when they have transparency), which
+    cuts both request bytes and vision tokens. Results are cached by the hash
+    of the encoded image, so an attachment that stays in the history is
+    processed once, not on every turn. Remote URLs, images already within
+    the limit and all images when Pillow is not installed pass through as-is.
+    """
+
+    def __init__(
+        self,
+        max_dimension: int = 1024,
+        quality: int = 80,
+        max_entries: int = 256,
+        max_bytes: int = 32_000_000,
+    ):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.processed = 0
+        self.hits = 0
+        self.failures = 0
+        self.bytes_saved = 0
+        self.tokens_saved = 0
+        self.size_bytes = 0
+
+        self._entries: "OrderedDict[str, ProcessedImage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["ImagePreprocessor"]:
+        """`IMAGE_MAX_DIMENSION=0` turns preprocessing off."""
+        max_dimension = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))
+        if max_dimension <= 0:
+            return None
+        return cls(
+            max_dimension=max_dimension,
+            quality=int(os.getenv("IMAGE_QUALITY", "80")),
+            max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "256")),
+            max_bytes=int(os.getenv("IMAGE_CACHE_MAX_BYTES", "32000000")),
+        )
+
+    def url(self, url: str, report: Optional[ImageReport] = None) -> str:
+        """The URL to send for `url`: a smaller data URL, or `url` itself."""
+        header = DATA_URL.match(url)
+        if header is None or _load_pil() is None:
+            return url
+
+        key = hashlib.sha256(url.encode("ascii", "ignore")).hexdigest()
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        cache_hit = image is not None
+        if image is None:
+            image = self._process(url, header)
+            self._store(key, image)
+
+        if report is not None:
+            report.add(image, cache_hit)
+        return image.url or url
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "processed": self.processed,
+            "hits": self.hits,
+            "failures": self.failures,
+            "bytes_saved": self.bytes_saved,
+            "tokens_saved": self.tokens_saved,
+        }
+
+    def _process(self, url: str, header: re.Match) -> ProcessedImage:
+        Image = _load_pil()
+        try:
+            raw = base64.b64decode(url[header.end():])
+            with Image.open(io.BytesIO(raw)) as source:
+                width, height = source.size
+                original_tokens = image_tokens(width, height)
+                if max(width, height) <= self.max_dimension or getattr(source, "is_animated", False):
+                    image = ProcessedImage(None, len(url), len(url), original_tokens, original_tokens)
+                else:
+                    encoded = self._downscale(Image, source)
+                    if len(encoded[0]) >= len(url):
+                        image = ProcessedImage(None, len(url), len(url), original_tokens, original_tokens)
+                    else:
+                        processed_url, size = encoded
+                        image = ProcessedImage(processed_url, len(url), len(processed_url), original_tokens, image_tokens(*size))
+        except Exception as e:
+            # Cached like any other result, so a broken image is not retried every turn
+            self.failures += 1
+            logger.warning("Could not preprocess image attachment", extra={"error_message": str(e)})
+            return ProcessedImage(None, len(url), len(url), 0, 0)
+
+        with self._lock:
+            self.processed += 1
+            self.bytes_saved += image.original_bytes - image.processed_bytes
+            self.tokens_saved += image.original_tokens - image.processed_tokens
+        return image
+
+    def _downscale(self, Image, source):
+        # JPEG sources can be decoded at a reduced scale directly, which is much cheaper
+        source.draft("RGB", (self.max_dimension, self.max_dimension))
+        image = source.copy()
+        image.thumbnail((self.max_dimension, self.max_dimension), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+            image = image.convert("RGBA")
+        if image.mode == "RGBA" and image.getchannel("A").getextrema()[0] < 255:
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", optimize=True)
+            mime = "image/png"
+        else:
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, format="JPEG", quality=self.quality, optimize=True)
+            mime = "image/jpeg"
+        return f"data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}", image.size
+
+    def _store(self, key: str, image: ProcessedImage) -> None:
+        size = len(image.url) if image.url is not None else 0
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= len(previous.url or "")
+            self._entries[key] = image
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= len(evicted.url or "")
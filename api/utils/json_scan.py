@@ -0,0 +1,50 @@
+import re
+
+# Only these characters can change nesting depth or string state
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+
+
+class JsonCloseScanner:
+    """Detect when a JSON object or array streamed in fragments closes, without parsing it.
+
+    Fragments are scanned once, as they arrive; only brackets, quotes and
+    backslashes are looked at, so the cost is independent of how long the
+    string values are.
+    """
+
+    __slots__ = ("depth", "in_string", "escaped", "complete")
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+
+    def feed(self, fragment: str) -> bool:
+        """Consume the next fragment; True once the top-level value has closed."""
+        if self.complete:
+            return True
+        # Position of a character escaped by a backslash, possibly one that ended the previous fragment
+        escaped_at = 0 if self.escaped else -1
+        self.escaped = False
+        for match in _STRUCTURAL.finditer(fragment):
+            position = match.start()
+            if position == escaped_at:
+                continue
+            char = match.group()
+            if self.in_string:
+                if char == "\\":
+                    escaped_at = position + 1
+                    self.escaped = escaped_at == len(fragment)
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return True
+        return False
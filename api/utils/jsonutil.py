@@ -0,0 +1,22 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(value: Any) -> bytes:
+        """Compact JSON as bytes; orjson when installed, falling back to json for types it rejects."""
+        try:
+            return orjson.dumps(value, option=_ORJSON_OPTIONS)
+        except TypeError:
+            return json.dumps(value, separators=(",", ":")).encode("utf-8")
+else:
+    def dumps(value: Any) -> bytes:
+        """Compact JSON as bytes."""
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
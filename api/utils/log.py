@@ -0,0 +1,241 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+import zlib
+from typing import Dict, IO, Optional
+
+from .jsonutil import dumps
+
+# Between DEBUG and INFO: one line per /api/track payload
+ANALYTICS = 15
+logging.addLevelName(ANALYTICS, "ANALYTICS")
+
+# Everything under the `api` package logs through the handler installed here
+ROOT_LOGGER = __name__.split(".")[0]
+
+REQUEST_ID_HEADER = b"x-request-id"
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is logged as a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class ApiLogger(logging.Logger):
+    """A logger that does not look up its caller's file and line, which the JSON lines never show.
+
+    That stack walk is most of the cost of a log call (see "Optimization" in
+    the logging HOWTO). Skipping it globally with `logging._srcfile = None`
+    would change every other library's records too.
+    """
+
+    def findCaller(self, stack_info: bool = False, stacklevel: int = 1):
+        if stack_info:
+            # One more frame to skip: this override
+            return super().findCaller(stack_info, stacklevel + 1)
+        return "(unknown file)", 0, "(unknown function)", None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """`logging.getLogger` for the `api` modules: a new logger is created as an ApiLogger.
+
+    Only the manager's logger class is swapped, and only while this call
+    holds the logging lock, so loggers other libraries create stay plain.
+    A logger that already exists is returned as it is.
+    """
+    manager = logging.Logger.manager
+    with logging._lock:
+        previous = manager.loggerClass
+        manager.setLoggerClass(ApiLogger)
+        try:
+            return logging.getLogger(name)
+        finally:
+            manager.loggerClass = previous
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def parse_sample_rates(spec: str) -> Dict[int, float]:
+    """`"DEBUG=0.1,ANALYTICS=0.05"` -> {10: 0.1, 15: 0.05}; unknown levels are ignored."""
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        level = logging.getLevelName(name.strip().upper())
+        if isinstance(level, int) and rate.strip():
+            rates[level] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, `extra=` fields and exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        try:
+            return dumps(entry).decode("utf-8")
+        except (TypeError, ValueError):
+            return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Tag records with the current request id and keep a sample of high-volume levels.
+
+    A level without a rate is always kept. Within a request the decision
+    follows a hash of its id, so a sampled request keeps all of its lines
+    at that level instead of a random subset.
+    """
+
+    def __init__(self, rates: Optional[Dict[int, float]] = None):
+        super().__init__()
+        self.rates = rates or {}
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        rate = self.rates.get(record.levelno)
+        if rate is None or rate >= 1.0:
+            return True
+        if record.request_id is not None:
+            keep = zlib.crc32(f"{record.levelno}:{record.request_id}".encode()) % 10_000 < rate * 10_000
+        else:
+            keep = random.random() < rate
+        if not keep:
+            self.sampled_out += 1
+        return keep
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """Hand records to the writer thread as they are.
+
+    The stock QueueHandler formats the message (and any traceback) on the
+    calling thread; here formatting and the write both happen on the
+    listener's thread, so a log call on the event loop is a filter and a
+    queue put. Past `max_size` queued records, new ones are dropped and
+    counted. Values passed in `extra=` are serialized later and must not be
+    mutated after the call.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int = 0):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue has no bound of its own, but its put is a fraction of Queue's
+        if self.max_size and self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+        self.enqueued += 1
+
+
+_handler: Optional[QueueLogHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    sample_rates: Optional[str] = None,
+    queue_size: Optional[int] = None,
+    stream: Optional[IO[str]] = None,
+) -> logging.Logger:
+    """Route the `api` loggers through a queue to a JSON writer thread; later calls are no-ops.
+
+    Defaults come from LOG_LEVEL, LOG_SAMPLE_RATES and LOG_QUEUE_SIZE. The
+    `api` logger does not propagate, so its records are written once, as
+    JSON, and not again by a handler on the root logger; to capture them,
+    attach a handler to `api` itself.
+    """
+    global _handler, _listener
+    logger = get_logger(ROOT_LOGGER)
+    if _handler is not None:
+        return logger
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _handler = QueueLogHandler(log_queue, queue_size if queue_size is not None else int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    _handler.addFilter(SamplingFilter(parse_sample_rates(sample_rates if sample_rates is not None else os.getenv("LOG_SAMPLE_RATES", ""))))
+    _listener = logging.handlers.QueueListener(log_queue, writer)
+    _listener.start()
+    # Stopping the listener writes out whatever is still queued
+    atexit.register(_listener.stop)
+
+    logger.addHandler(_handler)
+    logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    logger.propagate = False
+    return logger
+
+
+def log_stats() -> dict:
+    if _handler is None:
+        return {}
+    return {
+        "enqueued": _handler.enqueued,
+        "dropped": _handler.dropped,
+        "sampled_out": sum(f.sampled_out for f in _handler.filters if isinstance(f, SamplingFilter)),
+        "queued": _handler.queue.qsize(),
+    }
+
+
+class RequestIdMiddleware:
+    """Give every HTTP request an id for its log lines and echo it in X-Request-ID.
+
+    A well-formed id sent by the client (or a proxy) is reused, so lines can
+    be joined with upstream logs; otherwise a new one is generated.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                value = value.decode("latin-1")
+                if 0 < len(value) <= 128 and value.isprintable():
+                    request_id = value
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex[:16]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode("latin-1"))]}
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def labels_key(labels: Optional[Mapping[str, Any]]) -> LabelSet:
+    return tuple(sorted((name, str(value)) for name, value in (labels or {}).items()))
+
+
+def format_labels(labels: LabelSet, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    return repr(round(value, 6))
+
+
+class Histogram:
+    """Count, sum and a fixed-size ring of recent samples for one series.
+
+    `observe` is an index write under a lock; sorting only happens when
+    quantiles are read, so the request path stays cheap. Quantiles describe
+    the last `window` samples, count and sum cover the process lifetime.
+    """
+
+    def __init__(self, window: int = 2048):
+        self.window = window
+        self.count = 0
+        self.total = 0.0
+        self._samples: List[float] = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += value
+            if len(self._samples) < self.window:
+                self._samples.append(value)
+            else:
+                self._samples[self._next] = value
+                self._next = (self._next + 1) % self.window
+
+    def quantiles(self, quantiles: Sequence[float] = QUANTILES) -> Dict[float, float]:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return {q: float("nan") for q in quantiles}
+        return {q: ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)] for q in quantiles}
+
+
+class MetricsRegistry:
+    """In-process latency histograms plus pluggable gauge sources, rendered as Prometheus text."""
+
+    def __init__(self, prefix: str = "portfolio", window: int = 2048):
+        self.prefix = prefix
+        self.window = window
+        self._histograms: Dict[str, Dict[LabelSet, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._gauge_sources: List[Tuple[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, labels: Optional[Mapping[str, Any]] = None) -> None:
+        key = labels_key(labels)
+        series = self._histograms.get(name)
+        histogram = series.get(key) if series is not None else None
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, {}).setdefault(key, Histogram(self.window))
+        histogram.observe(value)
+
+    def histogram(self, name: str, labels: Optional[Mapping[str, Any]] = None) -> Optional[Histogram]:
+        return self._histograms.get(name, {}).get(labels_key(labels))
+
+    def register_gauges(self, component: str, source) -> None:
+        """Expose the numeric values of `source()` (a `stats()`-style dict) as gauges."""
+        self._gauge_sources.append((component, source))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+
+        for name in sorted(histograms):
+            metric = f"{self.prefix}_{name}"
+            if name in self._help:
+                lines.append(f"# HELP {metric} {self._help[name]}")
+            lines.append(f"# TYPE {metric} summary")
+            for labels, histogram in sorted(histograms[name].items()):
+                for q, value in histogram.quantiles().items():
+                    lines.append(f"{metric}{format_labels(labels, [('quantile', str(q))])} {format_value(value)}")
+                lines.append(f"{metric}_sum{format_labels(labels)} {format_value(histogram.total)}")
+                lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+
+        for component, source in self._gauge_sources:
+            try:
+                values = source()
+            except Exception as error:
+                lines.append(f"# {component} stats unavailable: {error}")
+                continue
+            for name, value in flatten_stats(values):
+                metric = f"{self.prefix}_{component}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def flatten_stats(values: Mapping[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    """Numeric leaves of a nested stats dict, with keys joined by underscores."""
+    for key, value in values.items():
+        name = "".join(ch if ch.isalnum() else "_" for ch in f"{prefix}{key}").lower()
+        if isinstance(value, Mapping):
+            yield from flatten_stats(value, f"{name}_")
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+class RequestTimings:
+    """Stage spans, time to first token and token throughput for one streamed request."""
+
+    def __init__(self, registry: Optional["MetricsRegistry"] = None, labels: Optional[Mapping[str, Any]] = None):
+        self.registry = registry
+        self.labels = dict(labels or {})
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.upstream_started: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        # Set only by the request that opened the upstream stream; replays and shared streams leave it unset
+        self.upstream_ttft: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.chunks = 0
+        self.completion_tokens = 0
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(stage, time.perf_counter() - started)
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def upstream_start(self) -> None:
+        self.upstream_started = time.perf_counter()
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        self.chunks += 1
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.last_token_at = now
+
+    @property
+    def ttft(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - (self.upstream_started or self.started)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        # Without usage data from the provider each streamed chunk counts as one token
+        tokens = self.completion_tokens or self.chunks
+        if self.first_token_at is None or self.last_token_at is None or tokens <= 1:
+            return None
+        elapsed = self.last_token_at - self.first_token_at
+        # The first token marks the start of the window, so it is not counted
+        return (tokens - 1) / elapsed if elapsed > 0 else None
+
+    def telemetry(self) -> Dict[str, Any]:
+        """Millisecond timings for analytics events."""
+        properties: Dict[str, Any] = {f"{stage}_ms": round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        properties["ttft_ms"] = round(self.ttft * 1000, 1) if self.ttft is not None else None
+        properties["upstream_ttft_ms"] = round(self.upstream_ttft * 1000, 1) if self.upstream_ttft is not None else None
+        tps = self.tokens_per_second
+        properties["tokens_per_second"] = round(tps, 1) if tps is not None else None
+        return properties
+
+    def record(self, total_seconds: Optional[float] = None) -> None:
+        """Push the collected timings into the registry's histograms."""
+        if self.registry is None:
+            return
+        for stage, seconds in self.stages.items():
+            self.registry.observe("stage_seconds", seconds, {**self.labels, "stage": stage})
+        if self.upstream_ttft is not None:
+            self.registry.observe("ttft_seconds", self.upstream_ttft, self.labels)
+        if self.tokens_per_second is not None:
+            self.registry.observe("tokens_per_second", self.tokens_per_second, self.labels)
+        total = total_seconds if total_seconds is not None else time.perf_counter() - self.started
+        self.registry.observe("request_seconds", total, self.labels)
+
+
+metrics = MetricsRegistry()
+metrics.describe("stage_seconds", "Time spent in each request stage.")
+metrics.describe("ttft_seconds", "Time from sending the upstream request to the first streamed token.")
+metrics.describe("tokens_per_second", "Streaming throughput after the first token.")
+metrics.describe("request_seconds", "Wall time of a streamed request.")
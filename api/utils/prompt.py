@@ -6,6 +6,9 @@ from openai.types.chat.chat_completion_message_param import ChatCompletionMessag
 from pydantic import BaseModel, ConfigDict
 
 from .attachment import ClientAttachment
+from .images import ImagePreprocessor, ImageReport
+
+DEFAULT_IMAGES = ImagePreprocessor.from_env()
 
 
 class ToolInvocationState(str, Enum):
@@ -45,7 +48,27 @@ class ClientMessage(BaseModel):
     toolInvocations: Optional[List[ToolInvocation]] = None
 
 
-def convert_to_openai_messages(messages: List[ClientMessage]) -> List[ChatCompletionMessageParam]:
+def image_part(url: str, images: Optional[ImagePreprocessor], image_report: Optional[ImageReport]) -> dict:
+    if images is not None:
+        url = images.url(url, image_report)
+    return {
+        'type': 'image_url',
+        'image_url': {
+            'url': url
+        }
+    }
+
+
+def convert_to_openai_messages(
+    messages: List[ClientMessage],
+    images: Optional[ImagePreprocessor] = DEFAULT_IMAGES,
+    image_report: Optional[ImageReport] = None,
+) -> List[ChatCompletionMessageParam]:
+    """Map client messages to OpenAI chat messages.
+
+    Data-URL images are downscaled by `images` (None sends them unchanged);
+    pass an `ImageReport` to collect the bytes and tokens that saved.
+    """
     openai_messages = []
 
     for message in messages:
@@ -64,12 +87,7 @@ def convert_to_openai_messages(messages: List[ClientMessage]) -> List[ChatComple
 
                 elif part.type == 'file':
                     if part.contentType and part.contentType.startswith('image') and part.url:
-                        message_parts.append({
-                            'type': 'image_url',
-                            'image_url': {
-                                'url': part.url
-                            }
-                        })
+                        message_parts.append(image_part(part.url, images, image_report))
                     elif part.url:
                         # Fall back to including the URL as text if we cannot map the file directly.
                         message_parts.append({
@@ -122,12 +140,7 @@ def convert_to_openai_messages(messages: List[ClientMessage]) -> List[ChatComple
         if not message.parts and message.experimental_attachments:
             for attachment in message.experimental_attachments:
                 if attachment.contentType.startswith('image'):
-                    message_parts.append({
-                        'type': 'image_url',
-                        'image_url': {
-                            'url': attachment.url
-                        }
-                    })
+                    message_parts.append(image_part(attachment.url, images, image_report))
 
                 elif attachment.contentType.startswith('text'):
                     message_parts.append({
@@ -0,0 +1,178 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+SECTION_HEADER = re.compile(r"^\[([^\]\n]+)\]\s*$", re.MULTILINE)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Deliberately small: the corpus is a single CV-style document, so anything
+# more aggressive starts removing words that carry meaning ("lead", "use").
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by can did do does for from had has have he her
+    his how i if in into is it its me my of on or our she so than that the
+    their them then there these they this to was we were what when where which
+    who whom why will with you your about fran francisco chaves tell
+    """.split()
+)
+
+DEFAULT_CORE_SECTIONS = ("SYSTEM_INSTRUCTION", "PROFILE_SUMMARY", "CONTACT INFORMATION")
+
+# Words visitors use for a section that its header does not contain. Keyed on
+# the header prefix, so new `[EXPERIENCE_CASE_STUDY: ...]` entries pick them up.
+HEADER_ALIASES = {
+    "EXPERIENCE_CASE_STUDY": "experience career work worked role job company companies",
+    "EDUCATION": "education study studied degree university school certification course",
+    "TOOL_STACK": "tools stack software",
+    "OTHER SKILLS": "skills languages speak",
+    "PHILOSOPHY": "philosophy approach believe think opinion",
+    "PROJECT_CONTEXT": "portfolio website site built build architecture",
+    "FAQ": "faq",
+}
+
+
+def stem(token: str) -> str:
+    """Strip plural endings so "tools" matches "tool"; nothing fancier is needed here."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def header_terms(name: str) -> List[str]:
+    upper = name.upper()
+    for prefix, aliases in HEADER_ALIASES.items():
+        if upper.startswith(prefix):
+            # Replace the generic prefix ("EXPERIENCE_CASE_STUDY") with its aliases
+            # and keep the specific part ("TESTGORILLA").
+            return tokenize(aliases) + tokenize(name[len(prefix):].replace("_", " "))
+    return tokenize(name.replace("_", " "))
+
+
+@dataclass
+class Section:
+    name: str
+    body: str
+    position: int
+    term_counts: Counter = field(default_factory=Counter, repr=False)
+    length: int = 0
+
+    @property
+    def text(self) -> str:
+        return f"[{self.name}]\n{self.body}".rstrip()
+
+
+def split_sections(text: str) -> List[Section]:
+    """Split `data.txt` on its `[SECTION]` header lines, preserving order."""
+    sections: List[Section] = []
+    matches = list(SECTION_HEADER.finditer(text))
+
+    preamble = text[: matches[0].start()].strip() if matches else text.strip()
+    if preamble:
+        sections.append(Section(name="PREAMBLE", body=preamble, position=0))
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip("\n")
+        sections.append(Section(name=match.group(1).strip(), body=body, position=len(sections)))
+
+    return sections
+
+
+class SectionIndex:
+    """BM25 index over the sections of the portfolio document.
+
+    Sections named in `core_sections` are always returned and are not scored.
+    Header words (and their `HEADER_ALIASES`) are counted twice so that e.g.
+    "tools" lands on `[TOOL_STACK_DATABASE]` even when the body only lists
+    product names.
+    """
+
+    def __init__(
+        self,
+        sections: Sequence[Section],
+        core_sections: Iterable[str] = DEFAULT_CORE_SECTIONS,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.sections = list(sections)
+        self.core_names = {name.upper() for name in core_sections}
+        self.k1 = k1
+        self.b = b
+
+        self.core = [s for s in self.sections if s.name.upper() in self.core_names]
+        self.candidates = [s for s in self.sections if s.name.upper() not in self.core_names]
+
+        document_frequency: Counter = Counter()
+        for section in self.candidates:
+            section.term_counts = Counter(tokenize(section.body)) + Counter(header_terms(section.name) * 2)
+            section.length = sum(section.term_counts.values())
+            document_frequency.update(section.term_counts.keys())
+
+        total = len(self.candidates)
+        self.average_length = (
+            sum(s.length for s in self.candidates) / total if total else 0.0
+        )
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    @classmethod
+    def build(cls, text: str, core_sections: Iterable[str] = DEFAULT_CORE_SECTIONS) -> "SectionIndex":
+        return cls(split_sections(text), core_sections=core_sections)
+
+    def score(self, query: str) -> List[tuple]:
+        """Return `(score, section)` pairs for every candidate with a non-zero score."""
+        terms = tokenize(query)
+        if not terms or not self.candidates:
+            return []
+
+        scored = []
+        for section in self.candidates:
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * section.length / (self.average_length or 1))
+            for term in terms:
+                frequency = section.term_counts.get(term)
+                if not frequency:
+                    continue
+                score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            if score > 0:
+                scored.append((score, section))
+
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return scored
+
+    def retrieve_matches(self, query: str, top_k: int = 3) -> List[Section]:
+        """Return only the `top_k` best-matching non-core sections, in document order."""
+        matched = [section for _, section in self.score(query)[:top_k]]
+        matched.sort(key=lambda section: section.position)
+        return matched
+
+    def retrieve(self, query: str, top_k: int = 3) -> List[Section]:
+        """Return the core sections plus the `top_k` best matches, in document order."""
+        selected = self.core + self.retrieve_matches(query, top_k)
+        selected.sort(key=lambda section: section.position)
+        return selected
+
+    @staticmethod
+    def render(sections: Sequence[Section]) -> str:
+        return "\n\n".join(section.text for section in sections)
+
+
+def build_query(question: str, previous_user_message: Optional[str] = None) -> str:
+    """Use the previous user turn as well so follow-ups ("and before that?") still match."""
+    if previous_user_message:
+        return f"{previous_user_message}\n{question}"
+    return question
@@ -0,0 +1,99 @@
+import re
+from typing import AsyncIterator, Iterator, Optional
+
+from .jsonutil import dumps
+
+# Terminal punctuation (plus closing quotes/brackets) followed by whitespace,
+# or a line break. The whitespace is required, so "3.5" and "v1.2" never split;
+# a terminator at the very end of the text waits for the next delta.
+SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*\s+|\n+")
+# Clause punctuation, used to break sentences longer than `clause_chars`
+CLAUSE_END = re.compile(r"[,;:]\s+|\s[—–-]\s+")
+# A "." after one of these words (or after a single letter) is not a sentence end
+ABBREVIATIONS = frozenset({"e.g", "i.e", "etc", "vs", "mr", "mrs", "ms", "dr", "prof", "inc", "ltd", "jr", "sr", "st", "approx", "no"})
+_WORD_BEFORE = re.compile(r"([\w.]+)$")
+# Longest run of terminators and closers to rescan when a delta may complete it
+_LOOKBACK = 8
+
+
+class SentenceSegmenter:
+    """Cut streamed text into sentences as soon as each one closes.
+
+    `push` takes each delta and yields the segments it completes; `flush`
+    returns what is left when the stream ends. Segments keep their trailing
+    whitespace, so joined they are exactly the streamed text. A segment shorter
+    than `min_chars` is held and joined with the next one. A sentence that
+    grows past `clause_chars` without ending is cut at its last clause break
+    (`,` `;` `:` or a dash) so speech can start before it finishes.
+    """
+
+    def __init__(self, min_chars: int = 0, clause_chars: int = 120):
+        self.min_chars = max(1, min_chars)
+        self.clause_chars = clause_chars
+        self.segments = 0
+        self._buffer = ""
+        self._scan_from = 0
+
+    def push(self, delta: str) -> Iterator[str]:
+        self._buffer += delta
+        while True:
+            end = self._sentence_end()
+            if end is None and self.clause_chars and len(self._buffer) >= self.clause_chars:
+                end = self._clause_end()
+            if end is None:
+                self._scan_from = max(self._scan_from, len(self._buffer) - _LOOKBACK)
+                return
+            yield self._cut(end)
+
+    def flush(self) -> Optional[str]:
+        if not self._buffer.strip():
+            return None
+        return self._cut(len(self._buffer))
+
+    def _cut(self, end: int) -> str:
+        segment, self._buffer = self._buffer[:end], self._buffer[end:]
+        self._scan_from = 0
+        self.segments += 1
+        return segment
+
+    def _sentence_end(self) -> Optional[int]:
+        for match in SENTENCE_END.finditer(self._buffer, self._scan_from):
+            self._scan_from = match.end()
+            if match.group().startswith(".") and self._is_abbreviation(match.start()):
+                continue
+            if len(self._buffer[:match.end()].strip()) >= self.min_chars:
+                return match.end()
+        return None
+
+    def _clause_end(self) -> Optional[int]:
+        end = None
+        for match in CLAUSE_END.finditer(self._buffer):
+            if len(self._buffer[:match.end()].strip()) >= self.min_chars:
+                end = match.end()
+        return end
+
+    def _is_abbreviation(self, dot: int) -> bool:
+        word = _WORD_BEFORE.search(self._buffer, 0, dot)
+        if word is None:
+            return False
+        word = word.group(1).lower()
+        return len(word) == 1 and word.isalpha() or word in ABBREVIATIONS
+
+
+async def segment_stream(chunks: AsyncIterator[str], segmenter: SentenceSegmenter) -> AsyncIterator[bytes]:
+    """Re-frame a text stream as NDJSON: one `segment` line per closed sentence, then `done`.
+
+        {"type":"segment","seq":0,"text":"Fran led growth at Acme. "}
+        {"type":"done","segments":3}
+    """
+    try:
+        async for chunk in chunks:
+            for segment in segmenter.push(chunk):
+                yield dumps({"type": "segment", "seq": segmenter.segments - 1, "text": segment}) + b"\n"
+        tail = segmenter.flush()
+        if tail is not None:
+            yield dumps({"type": "segment", "seq": segmenter.segments - 1, "text": tail}) + b"\n"
+        yield dumps({"type": "done", "segments": segmenter.segments}) + b"\n"
+    finally:
+        # Close the text stream now so its cleanup (and a cancelled upstream) is not left to the GC
+        await chunks.aclose()
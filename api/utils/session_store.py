@@ -0,0 +1,215 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+Message = Dict[str, str]
+
+
+def new_version(turn: int) -> str:
+    """An opaque conversation version; the turn number keeps it readable in logs."""
+    return f"{turn}-{uuid.uuid4().hex[:12]}"
+
+
+@dataclass
+class StoredConversation:
+    """The role/content messages of a conversation as the server last saw them."""
+
+    messages: List[Message]
+    version: str
+    turn: int
+    updated_at: float
+
+
+class SessionStore(ABC):
+    """Base for conversation stores keyed by session id.
+
+    A store holds the already-normalized message list of each conversation
+    together with the version the client was last given, so a request can
+    carry only its new message. `get` returns None when the session is
+    unknown, expired or at a different version; the client then resends the
+    full history.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600, max_messages: int = 100):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def get(self, session_id: str, version: str) -> Optional[StoredConversation]:
+        conversation = self._load(session_id)
+        if conversation is None or conversation.version != version:
+            self.misses += 1
+            return None
+        if time.time() - conversation.updated_at > self.ttl_seconds:
+            self._delete(session_id)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return conversation
+
+    def put(self, session_id: str, messages: List[Message], version: str, turn: int) -> None:
+        # Older turns only feed the history summary; keep the tail so entries stay bounded
+        conversation = StoredConversation(messages[-self.max_messages:], version, turn, time.time())
+        self._save(session_id, conversation)
+        self.writes += 1
+
+    def stats(self) -> dict:
+        return {
+            "sessions": self._count(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def _load(self, session_id: str) -> Optional[StoredConversation]:
+        ...
+
+    @abstractmethod
+    def _save(self, session_id: str, conversation: StoredConversation) -> None:
+        ...
+
+    @abstractmethod
+    def _delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def _count(self) -> int:
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU + TTL store; conversations are lost on restart and not shared between workers."""
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600, max_messages: int = 100):
+        super().__init__(max_sessions, ttl_seconds, max_messages)
+        self._entries: "OrderedDict[str, StoredConversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, session_id: str) -> Optional[StoredConversation]:
+        with self._lock:
+            conversation = self._entries.get(session_id)
+            if conversation is not None:
+                self._entries.move_to_end(session_id)
+            return conversation
+
+    def _save(self, session_id: str, conversation: StoredConversation) -> None:
+        with self._lock:
+            self._entries[session_id] = conversation
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _delete(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def _count(self) -> int:
+        return len(self._entries)
+
+
+class SqliteSessionStore(SessionStore):
+    """SQLite-backed store in a local file: survives restarts and is shared by workers on one machine."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_sessions: int = 1000,
+        ttl_seconds: float = 3600,
+        max_messages: int = 100,
+    ):
+        super().__init__(max_sessions, ttl_seconds, max_messages)
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "session_id TEXT PRIMARY KEY, version TEXT NOT NULL, turn INTEGER NOT NULL, "
+            "messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _load(self, session_id: str) -> Optional[StoredConversation]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT messages, version, turn, updated_at FROM conversations WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return StoredConversation(json.loads(row[0]), row[1], row[2], row[3])
+
+    def _save(self, session_id: str, conversation: StoredConversation) -> None:
+        encoded = json.dumps(conversation.messages, separators=(",", ":"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations (session_id, version, turn, messages, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, conversation.version, conversation.turn, encoded, conversation.updated_at),
+            )
+            expired = self._db.execute(
+                "DELETE FROM conversations WHERE updated_at < ?", (conversation.updated_at - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._db.execute(
+                "DELETE FROM conversations WHERE session_id IN ("
+                "SELECT session_id FROM conversations ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            ).rowcount
+        self.evictions += expired + overflow
+
+    def _delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def conversation_with_answer(messages: List[dict], answer: str) -> List[Message]:
+    """The role/content pairs of `messages` followed by the assistant's answer, ready to store."""
+    stored = [
+        {"role": message.get("role"), "content": message.get("content", "")}
+        for message in messages
+        if isinstance(message, dict)
+    ]
+    stored.append({"role": "assistant", "content": answer})
+    return stored
+
+
+def create_session_store(
+    backend: str,
+    path: Optional[str] = None,
+    max_sessions: int = 1000,
+    ttl_seconds: float = 3600,
+    max_messages: int = 100,
+) -> Optional[SessionStore]:
+    """`memory`, `sqlite` (at `path`) or `off`."""
+    backend = backend.lower()
+    if backend == "off":
+        return None
+    if backend == "sqlite":
+        return SqliteSessionStore(path or "sessions.db", max_sessions, ttl_seconds, max_messages)
+    if backend == "memory":
+        return MemorySessionStore(max_sessions, ttl_seconds, max_messages)
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend!r}")
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .cancellation import Cancellation
+
+
+class Flight:
+    """One upstream chat stream shared by every identical request that arrives while it runs.
+
+    Content chunks and the final usage are recorded as they arrive, so a
+    subscriber that joins late first replays the prefix produced so far and
+    then follows the live stream.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[str] = []
+        self.usage: Dict[str, Any] = {}
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.upstream_started: Optional[float] = None
+        self.first_chunk_at: Optional[float] = None
+        self._usage_claimed = False
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self) -> None:
+        await self._changed.wait()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from opening the upstream stream to its first content chunk."""
+        if self.upstream_started is None or self.first_chunk_at is None:
+            return None
+        return self.first_chunk_at - self.upstream_started
+
+    def claim_usage(self) -> Optional[Dict[str, Any]]:
+        """The upstream usage, returned to exactly one subscriber so the tokens are reported once."""
+        if self._usage_claimed:
+            return None
+        self._usage_claimed = True
+        return self.usage
+
+
+class SingleFlight:
+    """Attach identical in-flight chat requests to one upstream stream and fan it out.
+
+    The first request for a key (the leader) starts the upstream in a
+    background task; requests for the same key that arrive before it finishes
+    subscribe to it instead of opening their own. Every `join()` holds the
+    flight until the matching `leave()`, whether or not that caller has
+    started reading yet; the stream keeps running while anyone holds it and is
+    cancelled when the last one leaves. Finished flights are dropped at once:
+    later requests are served by the answer cache, not from here.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+
+        self.leaders = 0
+        self.followers = 0
+        self.replayed_chunks = 0
+        self.cancelled = 0
+
+        self._flights: Dict[str, Flight] = {}
+
+    def join(self, key: str, open_stream: Callable[[], AsyncIterator[Any]]) -> Tuple[Flight, bool]:
+        """Return the flight for `key` and whether this caller started it; pair with `leave()`."""
+        flight = self._flights.get(key) if self.enabled else None
+        if flight is not None:
+            flight.subscribers += 1
+            self.followers += 1
+            return flight, False
+
+        flight = Flight(key)
+        flight.subscribers = 1
+        if self.enabled:
+            self._flights[key] = flight
+        self.leaders += 1
+        flight.task = asyncio.ensure_future(self._produce(flight, open_stream))
+        return flight, True
+
+    async def subscribe(self, flight: Flight, cancellation: Optional[Cancellation] = None) -> AsyncIterator[str]:
+        """Yield the flight's content chunks from the start; raises the upstream error, if any.
+
+        When `cancellation` fires, the subscription ends at once, even while
+        waiting for the next chunk. Ending it does not leave the flight.
+        """
+        if flight.chunks:
+            self.replayed_chunks += len(flight.chunks)
+        if cancellation is not None:
+            cancellation.on_cancel(flight.notify)
+        position = 0
+        while True:
+            while position < len(flight.chunks):
+                position += 1
+                yield flight.chunks[position - 1]
+            if flight.done or (cancellation is not None and cancellation.cancelled):
+                break
+            await flight.wait()
+        if flight.error is not None:
+            raise flight.error
+
+    def leave(self, flight: Flight) -> None:
+        """Release the hold taken by `join()`; the last one out cancels an unfinished upstream."""
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.done and flight.task is not None:
+            # Nobody is waiting for it any more: stop paying for tokens
+            self.cancelled += 1
+            flight.task.cancel()
+            self._forget(flight)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "replayed_chunks": self.replayed_chunks,
+            "cancelled": self.cancelled,
+        }
+
+    async def _produce(self, flight: Flight, open_stream: Callable[[], AsyncIterator[Any]]) -> None:
+        flight.upstream_started = time.perf_counter()
+        try:
+            async for chunk in open_stream():
+                # Usage metadata is usually on the last chunk (stream_options include_usage)
+                if getattr(chunk, "usage_metadata", None):
+                    flight.usage = chunk.usage_metadata
+                if chunk.content:
+                    if flight.first_chunk_at is None:
+                        flight.first_chunk_at = time.perf_counter()
+                    flight.chunks.append(chunk.content)
+                    flight.notify()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(flight)
+            flight.notify()
+
+    def _forget(self, flight: Flight) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
@@ -0,0 +1,66 @@
+from typing import Any, Dict
+
+from .jsonutil import dumps
+
+DONE_FRAME = b"data: [DONE]\n\n"
+
+_FRAME_START = b"data: "
+_FRAME_END = b"\n\n"
+
+
+def encode_event(payload: Dict[str, Any]) -> bytes:
+    """One `data: {...}` SSE frame."""
+    return _FRAME_START + dumps(payload) + _FRAME_END
+
+
+class TextDeltaEncoder:
+    """Encodes `text-delta` frames for one text part from a pre-built prefix.
+
+    Only the delta string is serialized per token; the frame around it is the
+    same bytes `encode_event` would produce for
+    `{"type": "text-delta", "id": text_id, "delta": delta}`.
+    """
+
+    __slots__ = ("prefix",)
+
+    def __init__(self, text_id: str):
+        self.prefix = _FRAME_START + b'{"type":"text-delta","id":' + dumps(text_id) + b',"delta":'
+
+    def encode(self, delta: str) -> bytes:
+        return self.prefix + dumps(delta) + b"}" + _FRAME_END
+
+
+class ToolInputDeltaEncoder:
+    """Same as `TextDeltaEncoder` for the `tool-input-delta` frames of one tool call."""
+
+    __slots__ = ("prefix",)
+
+    def __init__(self, tool_call_id: str):
+        self.prefix = _FRAME_START + b'{"type":"tool-input-delta","toolCallId":' + dumps(tool_call_id) + b',"inputTextDelta":'
+
+    def encode(self, delta: str) -> bytes:
+        return self.prefix + dumps(delta) + b"}" + _FRAME_END
+
+
+class SseEncoder:
+    """Per-stream encoder: delta frames reuse their part's prefix, everything else is encoded whole."""
+
+    __slots__ = ("_text", "_tool_input")
+
+    def __init__(self):
+        self._text: Dict[str, TextDeltaEncoder] = {}
+        self._tool_input: Dict[str, ToolInputDeltaEncoder] = {}
+
+    def encode(self, payload: Dict[str, Any]) -> bytes:
+        kind = payload["type"]
+        if kind == "text-delta":
+            encoder = self._text.get(payload["id"])
+            if encoder is None:
+                encoder = self._text[payload["id"]] = TextDeltaEncoder(payload["id"])
+            return encoder.encode(payload["delta"])
+        if kind == "tool-input-delta":
+            encoder = self._tool_input.get(payload["toolCallId"])
+            if encoder is None:
+                encoder = self._tool_input[payload["toolCallId"]] = ToolInputDeltaEncoder(payload["toolCallId"])
+            return encoder.encode(payload["inputTextDelta"])
+        return encode_event(payload)
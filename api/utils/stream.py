@@ -1,12 +1,296 @@
+import asyncio
 import json
-import traceback
+import os
+import socket
+import time
 import uuid
-from typing import Any, Callable, Dict, Mapping, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
 
 from fastapi.responses import StreamingResponse
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 
+from .cancellation import Cancellation
+from .coalesce import CoalesceConfig, TextDeltaCoalescer, coalesced, with_deadlines
+from .history import message_tokens
+from .json_scan import JsonCloseScanner
+from .log import get_logger
+from .metrics import RequestTimings, metrics
+from .sse import DONE_FRAME, SseEncoder
+from .tool_runner import AsyncToolDispatcher, ToolCall, ToolDispatcher, is_read_only
+
+logger = get_logger(__name__)
+
+
+# Opt-in text-delta coalescing for every stream, from SSE_COALESCE_MS
+DEFAULT_COALESCE = CoalesceConfig.from_env()
+
+# Run each tool as soon as its arguments are complete instead of after the whole completion
+EARLY_TOOL_DISPATCH = os.getenv("TOOL_EARLY_DISPATCH", "1") != "0"
+
+
+class ToolCallState:
+    """Accumulates one streamed tool call; argument fragments are joined once, at the end.
+
+    `closed` is set as soon as the arguments are known to be complete: their
+    JSON object closed, or the model moved on to the next tool call.
+    """
+
+    __slots__ = ("id", "name", "fragments", "started", "scanner", "closed", "prepared", "dispatched")
+
+    def __init__(self):
+        self.id: Optional[str] = None
+        self.name: Optional[str] = None
+        self.fragments: List[str] = []
+        self.started = False
+        self.scanner = JsonCloseScanner()
+        self.closed = False
+        self.prepared = False
+        # Handed to a dispatcher, so the client is waiting for its output
+        self.dispatched = False
+
+    @property
+    def arguments(self) -> str:
+        return "".join(self.fragments)
+
+    def start_event(self) -> Optional[dict]:
+        """The `tool-input-start` event, the first time both id and name are known."""
+        if self.started or self.id is None or self.name is None:
+            return None
+        self.started = True
+        return {"type": "tool-input-start", "toolCallId": self.id, "toolName": self.name}
+
+
+class StreamState:
+    """Turn OpenAI completion chunks into Vercel AI SDK UI-message-stream events.
+
+    The state machine is shared by `stream_text` and `stream_text_async` so
+    both produce exactly the same event sequence; only the way chunks are
+    received and tools are run differs.
+    """
+
+    def __init__(self, timings: Optional[RequestTimings] = None):
+        self.timings = timings or RequestTimings()
+        self.message_id = f"msg-{uuid.uuid4().hex}"
+        self.text_stream_id = "text-1"
+        self.text_started = False
+        self.text_finished = False
+        self.finish_reason = None
+        self.usage_data = None
+        self.tool_calls_state: Dict[int, ToolCallState] = {}
+        # Some tool call closed and has not been prepared yet
+        self.tools_ready = False
+
+    def start(self) -> dict:
+        return {"type": "start", "messageId": self.message_id}
+
+    def partial_usage(self, messages: Sequence[Any]) -> Dict[str, int]:
+        """Estimated tokens of a stream aborted before the upstream sent its usage.
+
+        OpenAI streams about one token per delta, so the deltas received so far
+        stand in for completion tokens; the prompt is estimated from `messages`.
+        """
+        return {
+            "prompt_tokens": sum(message_tokens(message) for message in messages),
+            "completion_tokens": self.timings.chunks,
+            "tool_calls": len(self.tool_calls_state),
+        }
+
+    def handle_chunk(self, chunk) -> Iterator[dict]:
+        for choice in chunk.choices:
+            if choice.finish_reason is not None:
+                self.finish_reason = choice.finish_reason
+
+            delta = choice.delta
+            if delta is None:
+                continue
+
+            if delta.content is not None:
+                self.timings.token()
+                if not self.text_started:
+                    yield {"type": "text-start", "id": self.text_stream_id}
+                    self.text_started = True
+                yield {"type": "text-delta", "id": self.text_stream_id, "delta": delta.content}
+
+            if delta.tool_calls:
+                for tool_call_delta in delta.tool_calls:
+                    state = self.tool_calls_state.get(tool_call_delta.index)
+                    if state is None:
+                        # Calls stream one after another: a new index means the earlier ones are complete
+                        for earlier in self.tool_calls_state.values():
+                            if not earlier.closed:
+                                earlier.closed = self.tools_ready = True
+                        state = self.tool_calls_state[tool_call_delta.index] = ToolCallState()
+
+                    if tool_call_delta.id is not None:
+                        state.id = tool_call_delta.id
+                    function_call = getattr(tool_call_delta, "function", None)
+                    if function_call is not None and function_call.name is not None:
+                        state.name = function_call.name
+
+                    start_event = state.start_event()
+                    if start_event is not None:
+                        yield start_event
+
+                    if function_call is not None and function_call.arguments:
+                        self.timings.token()
+                        state.fragments.append(function_call.arguments)
+                        if not state.closed and state.scanner.feed(function_call.arguments):
+                            state.closed = self.tools_ready = True
+                        if state.id is not None:
+                            yield {
+                                "type": "tool-input-delta",
+                                "toolCallId": state.id,
+                                "inputTextDelta": function_call.arguments,
+                            }
+
+        if not chunk.choices and chunk.usage is not None:
+            self.usage_data = chunk.usage
+
+    def end_of_stream(self) -> Iterator[dict]:
+        if self.finish_reason == "stop" and self.text_started and not self.text_finished:
+            yield {"type": "text-end", "id": self.text_stream_id}
+            self.text_finished = True
+
+    def ready_tool_calls(
+        self, available_tools: Mapping[str, Callable[..., Any]]
+    ) -> Iterator[Tuple[List[dict], Optional[ToolCall]]]:
+        """Like `prepare_tool_calls`, for the calls whose arguments closed while the model is still streaming.
+
+        Only read-only tools are handed out: the stream may still end without
+        `tool_calls` (cut off at the token limit, or filtered), and then a tool
+        with side effects must not have run.
+        """
+        self.tools_ready = False
+        for index in sorted(self.tool_calls_state.keys()):
+            state = self.tool_calls_state[index]
+            if state.closed and not state.prepared and is_read_only(available_tools.get(state.name)):
+                prepared = self.prepare_tool_call(state, available_tools)
+                if prepared is not None:
+                    yield prepared
+
+    def prepare_tool_calls(
+        self, available_tools: Mapping[str, Callable[..., Any]]
+    ) -> Iterator[Tuple[List[dict], Optional[ToolCall]]]:
+        """Yield, per tool call in index order, the events to emit and the call to run (if any).
+
+        Calls already handed out by `ready_tool_calls` are skipped.
+        """
+        if self.finish_reason != "tool_calls":
+            return
+
+        for index in sorted(self.tool_calls_state.keys()):
+            state = self.tool_calls_state[index]
+            if not state.prepared:
+                prepared = self.prepare_tool_call(state, available_tools)
+                if prepared is not None:
+                    yield prepared
+
+    def prepare_tool_call(
+        self, state: ToolCallState, available_tools: Mapping[str, Callable[..., Any]]
+    ) -> Optional[Tuple[List[dict], Optional[ToolCall]]]:
+        tool_call_id = state.id
+        tool_name = state.name
+
+        if tool_call_id is None or tool_name is None:
+            return None
+        state.prepared = True
+
+        events: List[dict] = []
+        start_event = state.start_event()
+        if start_event is not None:
+            events.append(start_event)
+
+        raw_arguments = state.arguments
+        try:
+            parsed_arguments = json.loads(raw_arguments) if raw_arguments else {}
+        except Exception as error:
+            events.append(
+                {
+                    "type": "tool-input-error",
+                    "toolCallId": tool_call_id,
+                    "toolName": tool_name,
+                    "input": raw_arguments,
+                    "errorText": str(error),
+                }
+            )
+            return events, None
+
+        events.append(
+            {
+                "type": "tool-input-available",
+                "toolCallId": tool_call_id,
+                "toolName": tool_name,
+                "input": parsed_arguments,
+            }
+        )
+
+        tool_function = available_tools.get(tool_name)
+        if tool_function is None:
+            events.append(
+                {
+                    "type": "tool-output-error",
+                    "toolCallId": tool_call_id,
+                    "errorText": f"Tool '{tool_name}' not found.",
+                }
+            )
+            return events, None
+
+        state.dispatched = True
+        return events, (tool_call_id, tool_name, tool_function, parsed_arguments)
+
+    def abandoned_tool_calls(self) -> Iterator[dict]:
+        """A `tool-output-error` for each call started early that the model did not commit to."""
+        for index in sorted(self.tool_calls_state.keys()):
+            state = self.tool_calls_state[index]
+            if state.dispatched:
+                yield {
+                    "type": "tool-output-error",
+                    "toolCallId": state.id,
+                    "errorText": f"Not run: the model finished with '{self.finish_reason}'.",
+                }
+
+    def finish(self) -> Iterator[dict]:
+        if self.text_started and not self.text_finished:
+            yield {"type": "text-end", "id": self.text_stream_id}
+            self.text_finished = True
+
+        finish_metadata: Dict[str, Any] = {}
+        if self.finish_reason is not None:
+            finish_metadata["finishReason"] = self.finish_reason.replace("_", "-")
+
+        self.timings.completion_tokens = getattr(self.usage_data, "completion_tokens", None) or 0
+
+        if self.usage_data is not None:
+            usage_payload = {
+                "promptTokens": self.usage_data.prompt_tokens,
+                "completionTokens": self.usage_data.completion_tokens,
+            }
+            total_tokens = getattr(self.usage_data, "total_tokens", None)
+            if total_tokens is not None:
+                usage_payload["totalTokens"] = total_tokens
+            prompt_details = getattr(self.usage_data, "prompt_tokens_details", None)
+            cached_tokens = getattr(prompt_details, "cached_tokens", None)
+            if cached_tokens is not None:
+                usage_payload["cachedTokens"] = cached_tokens
+            finish_metadata["usage"] = usage_payload
+
+        if finish_metadata:
+            yield {"type": "finish", "messageMetadata": finish_metadata}
+        else:
+            yield {"type": "finish"}
+
+
+def dispatch_tool_calls(
+    prepared: Iterable[Tuple[List[dict], Optional[ToolCall]]],
+    dispatcher: Union[ToolDispatcher, AsyncToolDispatcher],
+) -> Iterator[dict]:
+    """Yield the events of each prepared tool call and start the ones that can run."""
+    for events, call in prepared:
+        yield from events
+        if call is not None:
+            dispatcher.dispatch(call)
+
 
 def stream_text(
     client: OpenAI,
@@ -14,225 +298,218 @@ def stream_text(
     tool_definitions: Sequence[Dict[str, Any]],
     available_tools: Mapping[str, Callable[..., Any]],
     protocol: str = "data",
+    tool_timeouts: Optional[Mapping[str, float]] = None,
+    coalesce: Optional[CoalesceConfig] = DEFAULT_COALESCE,
+    early_tool_dispatch: bool = EARLY_TOOL_DISPATCH,
+    cancellation: Optional[Cancellation] = None,
 ):
-    """Yield Server-Sent Events for a streaming chat completion."""
+    """Yield Server-Sent Events for a streaming chat completion.
+
+    When the model requests several tools in one turn they run concurrently,
+    and each `tool-output-*` event is emitted as soon as its tool finishes.
+    With `early_tool_dispatch`, a read-only tool (see `read_only`) starts, and
+    its `tool-input-available` is sent, as soon as its arguments are complete,
+    while the model is still streaming the remaining calls. Outputs are only
+    sent when the model finishes with `tool_calls`.
+
+    With `coalesce` set, consecutive `text-delta`s are merged into fewer
+    frames. Here the time window is checked as each chunk arrives;
+    `stream_text_async` also flushes while waiting on the upstream.
+
+    With `cancellation` (see `Cancellation.watch`), a client disconnect closes
+    the upstream response at once, even while this generator is blocked
+    reading it in the threadpool or is no longer being iterated. The estimated
+    tokens spent so far are left in `cancellation.usage` and no further events
+    are sent.
+    """
     try:
-        def format_sse(payload: dict) -> str:
-            return f"data: {json.dumps(payload, separators=(',', ':'))}\n\n"
+        state = StreamState(RequestTimings(metrics, {"path": "stream_text"}))
+        timings = state.timings
+        coalescer = TextDeltaCoalescer(coalesce) if coalesce else None
+        encode = SseEncoder().encode
+        yield encode(state.start())
 
-        message_id = f"msg-{uuid.uuid4().hex}"
-        text_stream_id = "text-1"
-        text_started = False
-        text_finished = False
-        finish_reason = None
-        usage_data = None
-        tool_calls_state: Dict[int, Dict[str, Any]] = {}
+        timings.upstream_start()
+        stream = client.chat.completions.create(
+            messages=messages,
+            model="gpt-4o",
+            stream=True,
+            tools=tool_definitions,
+        )
 
-        yield format_sse({"type": "start", "messageId": message_id})
+        timings.add_stage("upstream", time.perf_counter() - timings.upstream_started)
+        if cancellation is not None:
+            cancellation.on_cancel(lambda: abort_stream(cancellation, state, messages, lambda: interrupt_stream(stream)))
+        dispatcher = ToolDispatcher(timeouts=tool_timeouts)
+        try:
+            with timings.span("stream"):
+                for chunk in stream:
+                    for payload in coalesced(state.handle_chunk(chunk), coalescer):
+                        yield encode(payload)
+                    if early_tool_dispatch and state.tools_ready:
+                        ready = dispatch_tool_calls(state.ready_tool_calls(available_tools), dispatcher)
+                        for payload in coalesced(ready, coalescer):
+                            yield encode(payload)
+            if cancellation is not None and cancellation.cancelled:
+                return
+
+            for payload in coalesced(state.end_of_stream(), coalescer):
+                yield encode(payload)
+
+            remaining = dispatch_tool_calls(state.prepare_tool_calls(available_tools), dispatcher)
+            for payload in coalesced(remaining, coalescer):
+                yield encode(payload)
+
+            if state.finish_reason != "tool_calls":
+                # The model never committed to the calls started early: drop their runs and
+                # close their parts, so the client is not left waiting for an output
+                dispatcher.cancel()
+                for payload in coalesced(state.abandoned_tool_calls(), coalescer):
+                    yield encode(payload)
+            if dispatcher:
+                with timings.span("tools"):
+                    for payload in dispatcher.outputs():
+                        yield encode(payload)
+        except Exception:
+            if cancellation is None or not cancellation.cancelled:
+                raise
+        finally:
+            # Tools started early must not outlive a stream that failed or was abandoned,
+            # and an abandoned generator must not leave the upstream response open
+            dispatcher.cancel()
+            stream.close()
+        if cancellation is not None:
+            if cancellation.cancelled:
+                return
+            cancellation.finish()
+
+        for payload in coalesced(state.finish(), coalescer):
+            yield encode(payload)
+        # This stream opened its own upstream, so its TTFT is an upstream sample
+        timings.upstream_ttft = timings.ttft
+        timings.record()
+
+        yield DONE_FRAME
+    except Exception:
+        logger.exception("Stream failed")
+        raise
 
-        stream = client.chat.completions.create(
+
+async def stream_text_async(
+    client: AsyncOpenAI,
+    messages: Sequence[ChatCompletionMessageParam],
+    tool_definitions: Sequence[Dict[str, Any]],
+    available_tools: Mapping[str, Callable[..., Any]],
+    protocol: str = "data",
+    tool_timeouts: Optional[Mapping[str, float]] = None,
+    coalesce: Optional[CoalesceConfig] = DEFAULT_COALESCE,
+    early_tool_dispatch: bool = EARLY_TOOL_DISPATCH,
+    cancellation: Optional[Cancellation] = None,
+):
+    """Async twin of `stream_text`: same events, but no threadpool thread is held while streaming."""
+    try:
+        state = StreamState(RequestTimings(metrics, {"path": "stream_text_async"}))
+        timings = state.timings
+        coalescer = TextDeltaCoalescer(coalesce) if coalesce else None
+        encode = SseEncoder().encode
+        yield encode(state.start())
+
+        timings.upstream_start()
+        stream = await client.chat.completions.create(
             messages=messages,
             model="gpt-4o",
             stream=True,
             tools=tool_definitions,
         )
 
-        for chunk in stream:
-            for choice in chunk.choices:
-                if choice.finish_reason is not None:
-                    finish_reason = choice.finish_reason
-
-                delta = choice.delta
-                if delta is None:
-                    continue
-
-                if delta.content is not None:
-                    if not text_started:
-                        yield format_sse({"type": "text-start", "id": text_stream_id})
-                        text_started = True
-                    yield format_sse(
-                        {"type": "text-delta", "id": text_stream_id, "delta": delta.content}
-                    )
-
-                if delta.tool_calls:
-                    for tool_call_delta in delta.tool_calls:
-                        index = tool_call_delta.index
-                        state = tool_calls_state.setdefault(
-                            index,
-                            {
-                                "id": None,
-                                "name": None,
-                                "arguments": "",
-                                "started": False,
-                            },
-                        )
-
-                        if tool_call_delta.id is not None:
-                            state["id"] = tool_call_delta.id
-                            if (
-                                state["id"] is not None
-                                and state["name"] is not None
-                                and not state["started"]
-                            ):
-                                yield format_sse(
-                                    {
-                                        "type": "tool-input-start",
-                                        "toolCallId": state["id"],
-                                        "toolName": state["name"],
-                                    }
-                                )
-                                state["started"] = True
-
-                        function_call = getattr(tool_call_delta, "function", None)
-                        if function_call is not None:
-                            if function_call.name is not None:
-                                state["name"] = function_call.name
-                                if (
-                                    state["id"] is not None
-                                    and state["name"] is not None
-                                    and not state["started"]
-                                ):
-                                    yield format_sse(
-                                        {
-                                            "type": "tool-input-start",
-                                            "toolCallId": state["id"],
-                                            "toolName": state["name"],
-                                        }
-                                    )
-                                    state["started"] = True
-
-                            if function_call.arguments:
-                                if (
-                                    state["id"] is not None
-                                    and state["name"] is not None
-                                    and not state["started"]
-                                ):
-                                    yield format_sse(
-                                        {
-                                            "type": "tool-input-start",
-                                            "toolCallId": state["id"],
-                                            "toolName": state["name"],
-                                        }
-                                    )
-                                    state["started"] = True
-
-                                state["arguments"] += function_call.arguments
-                                if state["id"] is not None:
-                                    yield format_sse(
-                                        {
-                                            "type": "tool-input-delta",
-                                            "toolCallId": state["id"],
-                                            "inputTextDelta": function_call.arguments,
-                                        }
-                                    )
-
-            if not chunk.choices and chunk.usage is not None:
-                usage_data = chunk.usage
-
-        if finish_reason == "stop" and text_started and not text_finished:
-            yield format_sse({"type": "text-end", "id": text_stream_id})
-            text_finished = True
-
-        if finish_reason == "tool_calls":
-            for index in sorted(tool_calls_state.keys()):
-                state = tool_calls_state[index]
-                tool_call_id = state.get("id")
-                tool_name = state.get("name")
-
-                if tool_call_id is None or tool_name is None:
-                    continue
-
-                if not state["started"]:
-                    yield format_sse(
-                        {
-                            "type": "tool-input-start",
-                            "toolCallId": tool_call_id,
-                            "toolName": tool_name,
-                        }
-                    )
-                    state["started"] = True
-
-                raw_arguments = state["arguments"]
-                try:
-                    parsed_arguments = json.loads(raw_arguments) if raw_arguments else {}
-                except Exception as error:
-                    yield format_sse(
-                        {
-                            "type": "tool-input-error",
-                            "toolCallId": tool_call_id,
-                            "toolName": tool_name,
-                            "input": raw_arguments,
-                            "errorText": str(error),
-                        }
-                    )
-                    continue
-
-                yield format_sse(
-                    {
-                        "type": "tool-input-available",
-                        "toolCallId": tool_call_id,
-                        "toolName": tool_name,
-                        "input": parsed_arguments,
-                    }
-                )
-
-                tool_function = available_tools.get(tool_name)
-                if tool_function is None:
-                    yield format_sse(
-                        {
-                            "type": "tool-output-error",
-                            "toolCallId": tool_call_id,
-                            "errorText": f"Tool '{tool_name}' not found.",
-                        }
-                    )
-                    continue
-
-                try:
-                    tool_result = tool_function(**parsed_arguments)
-                except Exception as error:
-                    yield format_sse(
-                        {
-                            "type": "tool-output-error",
-                            "toolCallId": tool_call_id,
-                            "errorText": str(error),
-                        }
-                    )
+        timings.add_stage("upstream", time.perf_counter() - timings.upstream_started)
+        if cancellation is not None:
+            close = lambda: asyncio.ensure_future(stream.close())
+            cancellation.on_cancel(lambda: abort_stream(cancellation, state, messages, close))
+        dispatcher = AsyncToolDispatcher(timeouts=tool_timeouts)
+        try:
+            with timings.span("stream"):
+                if coalescer is None:
+                    async for chunk in stream:
+                        for payload in state.handle_chunk(chunk):
+                            yield encode(payload)
+                        if early_tool_dispatch and state.tools_ready:
+                            for payload in dispatch_tool_calls(state.ready_tool_calls(available_tools), dispatcher):
+                                yield encode(payload)
                 else:
-                    yield format_sse(
-                        {
-                            "type": "tool-output-available",
-                            "toolCallId": tool_call_id,
-                            "output": tool_result,
-                        }
-                    )
-
-        if text_started and not text_finished:
-            yield format_sse({"type": "text-end", "id": text_stream_id})
-            text_finished = True
+                    async for chunk in with_deadlines(stream, coalescer.due_in):
+                        # None means the coalescing window ran out while waiting for the upstream
+                        payloads = coalescer.flush() if chunk is None else coalesced(state.handle_chunk(chunk), coalescer)
+                        for payload in payloads:
+                            yield encode(payload)
+                        if early_tool_dispatch and state.tools_ready:
+                            ready = dispatch_tool_calls(state.ready_tool_calls(available_tools), dispatcher)
+                            for payload in coalesced(ready, coalescer):
+                                yield encode(payload)
+            if cancellation is not None and cancellation.cancelled:
+                return
+
+            for payload in coalesced(state.end_of_stream(), coalescer):
+                yield encode(payload)
+
+            remaining = dispatch_tool_calls(state.prepare_tool_calls(available_tools), dispatcher)
+            for payload in coalesced(remaining, coalescer):
+                yield encode(payload)
+
+            if state.finish_reason != "tool_calls":
+                # The model never committed to the calls started early: drop their runs and
+                # close their parts, so the client is not left waiting for an output
+                dispatcher.cancel()
+                for payload in coalesced(state.abandoned_tool_calls(), coalescer):
+                    yield encode(payload)
+            if dispatcher:
+                with timings.span("tools"):
+                    async for payload in dispatcher.outputs():
+                        yield encode(payload)
+        except Exception:
+            if cancellation is None or not cancellation.cancelled:
+                raise
+        finally:
+            # Tools started early must not outlive a stream that failed or was abandoned
+            dispatcher.cancel()
+            await stream.close()
+        if cancellation is not None:
+            if cancellation.cancelled:
+                return
+            cancellation.finish()
+
+        for payload in coalesced(state.finish(), coalescer):
+            yield encode(payload)
+        # This stream opened its own upstream, so its TTFT is an upstream sample
+        timings.upstream_ttft = timings.ttft
+        timings.record()
+
+        yield DONE_FRAME
+    except Exception:
+        logger.exception("Stream failed")
+        raise
 
-        finish_metadata: Dict[str, Any] = {}
-        if finish_reason is not None:
-            finish_metadata["finishReason"] = finish_reason.replace("_", "-")
 
-        if usage_data is not None:
-            usage_payload = {
-                "promptTokens": usage_data.prompt_tokens,
-                "completionTokens": usage_data.completion_tokens,
-            }
-            total_tokens = getattr(usage_data, "total_tokens", None)
-            if total_tokens is not None:
-                usage_payload["totalTokens"] = total_tokens
-            finish_metadata["usage"] = usage_payload
+def abort_stream(cancellation: Cancellation, state: StreamState, messages: Sequence[Any], close: Callable[[], Any]) -> None:
+    """Record what a cancelled stream had used, then close its upstream response."""
+    cancellation.usage = state.partial_usage(messages)
+    close()
 
-        if finish_metadata:
-            yield format_sse({"type": "finish", "messageMetadata": finish_metadata})
-        else:
-            yield format_sse({"type": "finish"})
 
-        yield "data: [DONE]\n\n"
-    except Exception:
-        traceback.print_exc()
-        raise
+def interrupt_stream(stream) -> None:
+    """Close a sync OpenAI stream from another thread.
+
+    Closing the socket alone does not wake a thread blocked reading it, so the
+    connection is shut down first and the read fails at once.
+    """
+    network_stream = stream.response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    stream.close()
 
 
 def patch_response_with_headers(
@@ -0,0 +1,143 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    import requests
+
+CONNECT_TIMEOUT = float(os.getenv("TOOL_HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("TOOL_HTTP_READ_TIMEOUT", "10"))
+POOL_SIZE = int(os.getenv("TOOL_HTTP_POOL_SIZE", "16"))
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """One keep-alive session for all tools, so repeat calls skip the TCP/TLS handshake."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def http_get_json(
+    url: str,
+    params: Optional[Mapping[str, Any]] = None,
+    timeout: Optional[Tuple[float, float]] = None,
+) -> Any:
+    """GET `url` over the pooled session with strict timeouts and return the decoded JSON."""
+    response = get_session().get(url, params=params, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT))
+    response.raise_for_status()
+    return response.json()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+@dataclass
+class ToolCacheConfig:
+    """How a tool's results are cached.
+
+    `grid` maps numeric argument names to a cell size; those arguments are
+    snapped to the grid before the lookup *and* before the call, so every
+    request inside a cell shares one upstream result.
+    """
+
+    ttl_seconds: float = 600.0
+    max_entries: int = 256
+    grid: Dict[str, float] = field(default_factory=dict)
+
+
+def snap(value: Any, cell: float) -> Any:
+    if cell <= 0 or not isinstance(value, (int, float)):
+        return value
+    decimals = max(0, len(f"{cell:.10f}".rstrip("0").split(".")[1]))
+    return round(round(value / cell) * cell, decimals)
+
+
+_cached_tools: List[Callable[..., Any]] = []
+
+
+def cached_tool(config: ToolCacheConfig) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Opt a blocking tool into result caching. `None` results (failed lookups) are not cached."""
+
+    def decorator(tool_function: Callable[..., Any]) -> Callable[..., Any]:
+        cache = TTLCache(config.ttl_seconds, config.max_entries)
+        signature = inspect.signature(tool_function)
+
+        @functools.wraps(tool_function)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {name: snap(value, config.grid.get(name, 0)) for name, value in bound.arguments.items()}
+            key = tuple(sorted((name, repr(value)) for name, value in arguments.items()))
+
+            found, value = cache.get(key)
+            if found:
+                return value
+
+            value = tool_function(**arguments)
+            if value is not None:
+                cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        wrapper.cache_config = config
+        _cached_tools.append(wrapper)
+        return wrapper
+
+    return decorator
+
+
+def tool_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {tool.__name__: tool.cache.stats() for tool in _cached_tools}
@@ -0,0 +1,147 @@
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# (tool_call_id, tool_name, tool_function, parsed_arguments)
+ToolCall = Tuple[str, str, Callable[..., Any], Dict[str, Any]]
+
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "15"))
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Bounded pool shared by every stream, so a burst of tool calls cannot spawn unbounded threads."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+    return _executor
+
+
+def read_only(tool_function: Callable[..., Any]) -> Callable[..., Any]:
+    """Mark a tool as free of side effects, so it may start before the model has committed to the call."""
+    tool_function.read_only = True
+    return tool_function
+
+
+def is_read_only(tool_function: Optional[Callable[..., Any]]) -> bool:
+    return getattr(tool_function, "read_only", False)
+
+
+def tool_output(tool_call_id: str, result: Any = None, error: Optional[BaseException] = None) -> dict:
+    if error is not None:
+        return {"type": "tool-output-error", "toolCallId": tool_call_id, "errorText": str(error)}
+    return {"type": "tool-output-available", "toolCallId": tool_call_id, "output": result}
+
+
+def timeout_for(tool_name: str, timeouts: Optional[Mapping[str, float]], default: float) -> float:
+    if timeouts and tool_name in timeouts:
+        return timeouts[tool_name]
+    return default
+
+
+def timeout_error(tool_name: str, limit: float) -> TimeoutError:
+    return TimeoutError(f"Tool '{tool_name}' timed out after {limit:g}s")
+
+
+class ToolDispatcher:
+    """Start tool calls on the shared pool one by one, then yield their outputs as they finish.
+
+    Each call's timeout counts from its own dispatch, so a call started while
+    the model is still streaming gets its full budget.
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TOOL_TIMEOUT, timeouts: Optional[Mapping[str, float]] = None):
+        self.timeout = timeout
+        self.timeouts = timeouts
+        # future -> (position, tool_call_id, tool_name, limit, deadline)
+        self._pending: Dict[Future, Tuple[int, str, str, float, float]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._pending)
+
+    def dispatch(self, call: ToolCall) -> None:
+        tool_call_id, tool_name, tool_function, arguments = call
+        limit = timeout_for(tool_name, self.timeouts, self.timeout)
+        future = get_tool_executor().submit(tool_function, **arguments)
+        self._pending[future] = (len(self._pending), tool_call_id, tool_name, limit, time.monotonic() + limit)
+
+    def outputs(self) -> Iterator[dict]:
+        """Yield one output event per dispatched call, in completion order.
+
+        A call that exceeds its timeout gets a `tool-output-error`; its thread is
+        left to finish in the background since Python threads cannot be killed.
+        """
+        pending = self._pending
+        while pending:
+            next_deadline = min(meta[4] for meta in pending.values())
+            done, _ = wait(list(pending), timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in sorted(done, key=lambda f: pending[f][0]):
+                tool_call_id = pending.pop(future)[1]
+                error = future.exception()
+                yield tool_output(tool_call_id, error=error) if error else tool_output(tool_call_id, future.result())
+
+            now = time.monotonic()
+            for future in [f for f, meta in pending.items() if meta[4] <= now]:
+                _, tool_call_id, tool_name, limit, _ = pending.pop(future)
+                future.cancel()
+                yield tool_output(tool_call_id, error=timeout_error(tool_name, limit))
+
+    def cancel(self) -> None:
+        """Drop every call still pending; queued ones never start, running ones finish unobserved."""
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+
+class AsyncToolDispatcher:
+    """Async twin of `ToolDispatcher`: coroutine tools run on the loop, blocking ones on the shared pool."""
+
+    def __init__(self, timeout: float = DEFAULT_TOOL_TIMEOUT, timeouts: Optional[Mapping[str, float]] = None):
+        self.timeout = timeout
+        self.timeouts = timeouts
+        self._tasks: List[asyncio.Task] = []
+
+    def __bool__(self) -> bool:
+        return bool(self._tasks)
+
+    def dispatch(self, call: ToolCall) -> None:
+        self._tasks.append(asyncio.ensure_future(self._run_one(call)))
+
+    async def outputs(self) -> AsyncIterator[dict]:
+        try:
+            for next_done in asyncio.as_completed(self._tasks):
+                yield await next_done
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _run_one(self, call: ToolCall) -> dict:
+        tool_call_id, tool_name, tool_function, arguments = call
+        limit = timeout_for(tool_name, self.timeouts, self.timeout)
+        try:
+            if inspect.iscoroutinefunction(tool_function):
+                awaitable = tool_function(**arguments)
+            else:
+                loop = asyncio.get_running_loop()
+                awaitable = loop.run_in_executor(get_tool_executor(), functools.partial(tool_function, **arguments))
+            result = await asyncio.wait_for(awaitable, limit)
+        except asyncio.TimeoutError:
+            return tool_output(tool_call_id, error=timeout_error(tool_name, limit))
+        except Exception as error:
+            return tool_output(tool_call_id, error=error)
+        return tool_output(tool_call_id, result)
@@ -1,23 +1,45 @@
+import os
+
 import requests
 
+from .log import get_logger
+from .tool_http import ToolCacheConfig, cached_tool, http_get_json
+from .tool_runner import read_only
 
-def get_current_weather(latitude, longitude):
-    # Format the URL with proper parameter substitution
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m&hourly=temperature_2m&daily=sunrise,sunset&timezone=auto"
+logger = get_logger(__name__)
+
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Weather barely changes within ~10 km and 10 minutes, so nearby repeat
+# lookups are served from memory.
+WEATHER_CACHE = ToolCacheConfig(
+    ttl_seconds=float(os.getenv("WEATHER_CACHE_TTL", "600")),
+    grid={
+        "latitude": float(os.getenv("WEATHER_CACHE_GRID", "0.1")),
+        "longitude": float(os.getenv("WEATHER_CACHE_GRID", "0.1")),
+    },
+)
 
-    try:
-        # Make the API call
-        response = requests.get(url)
 
-        # Raise an exception for bad status codes
-        response.raise_for_status()
+@read_only
+@cached_tool(WEATHER_CACHE)
+def get_current_weather(latitude, longitude):
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "current": "temperature_2m",
+        "hourly": "temperature_2m",
+        "daily": "sunrise,sunset",
+        "timezone": "auto",
+    }
 
-        # Return the JSON response
-        return response.json()
+    try:
+        # Pooled keep-alive session with connect/read timeouts; raises on bad status codes
+        return http_get_json(OPEN_METEO_URL, params=params)
 
     except requests.RequestException as e:
         # Handle any errors that occur during the request
-        print(f"Error fetching weather data: {e}")
+        logger.warning("Error fetching weather data", extra={"error_message": str(e)})
         return None
 
 
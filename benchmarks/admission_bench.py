@@ -0,0 +1,120 @@
+"""Admission control on /api/chat: one client flooding streams vs. normal visitors.
+
+Runs `api.index` with uvicorn on a background thread against the fake OpenAI
+server. One "bot" client IP opens many parallel chat streams, while
+visitors from other IPs each ask a question or two. The bench reports how many
+bot requests were admitted, how fast the rejected ones got their 429, and the
+visitors' success rate and time to first byte. It fails if a bot gets more
+streams than the per-client concurrency cap, if a 429 is slow or lacks
+Retry-After, or if any visitor is turned away.
+
+    python -m benchmarks.admission_bench [--bot-streams 40] [--visitors 10] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from tests.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from tests.support import AppServer
+
+QUESTIONS = ["What is Fran's experience?", "What tools does Fran use?", "How can I contact Fran?"]
+
+
+async def ask(client: httpx.AsyncClient, ip: str, question: str):
+    started = time.perf_counter()
+    first = None
+    payload = {"messages": [{"role": "user", "content": question}], "session_id": f"session-{ip}"}
+    async with client.stream("POST", "/api/chat", json=payload, headers={"X-Forwarded-For": ip}) as response:
+        async for text in response.aiter_text():
+            if first is None and text:
+                first = time.perf_counter() - started
+    return {
+        "ip": ip,
+        "status": response.status_code,
+        "retry_after": response.headers.get("retry-after"),
+        "first_byte": first,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+async def run(base_url: str, bot_streams: int, visitors: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=httpx.Limits(max_connections=None)) as client:
+        bot = [ask(client, "203.0.113.66", f"{QUESTIONS[i % len(QUESTIONS)]} #{i}") for i in range(bot_streams)]
+        people = [ask(client, f"198.51.100.{i}", QUESTIONS[i % len(QUESTIONS)]) for i in range(visitors)]
+        rows = await asyncio.gather(*bot, *people)
+    return rows[:bot_streams], rows[bot_streams:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bot-streams", type=int, default=40)
+    parser.add_argument("--visitors", type=int, default=10)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(FakeOpenAIConfig(ttft=0.2, tokens_per_second=50, completion_tokens=40)) as fake:
+        os.environ.update({
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "ANSWER_CACHE_TTL": "0",
+            "POSTHOG_BATCH_SIZE": "100000",
+            "POSTHOG_FLUSH_INTERVAL": "3600",
+        })
+        os.environ.pop("VERCEL", None)
+        import api.index as backend
+
+        backend.warm_chat_path()
+        with AppServer(backend.app) as server:
+            bot, visitors = asyncio.run(run(f"http://127.0.0.1:{server.port}", args.bot_streams, args.visitors))
+        upstream_requests = fake.stats.requests
+        stats = backend.admission.stats()
+
+    admitted = [row for row in bot if row["status"] == 200]
+    rejected = [row for row in bot if row["status"] == 429]
+    result = {
+        "bot_admitted": len(admitted),
+        "bot_rejected": len(rejected),
+        "reject_ms_p50": round(statistics.median(row["seconds"] for row in rejected) * 1000, 1) if rejected else None,
+        "reject_ms_max": round(max(row["seconds"] for row in rejected) * 1000, 1) if rejected else None,
+        "visitor_success": sum(1 for row in visitors if row["status"] == 200),
+        "visitor_first_byte_ms_p50": round(statistics.median(
+            row["first_byte"] for row in visitors if row["first_byte"] is not None) * 1000, 1) if visitors else None,
+        "upstream_requests": upstream_requests,
+        "admission": stats,
+    }
+
+    print(f"bot: {result['bot_admitted']} admitted, {result['bot_rejected']} rejected with 429 "
+          f"(p50 {result['reject_ms_p50']}ms, max {result['reject_ms_max']}ms)")
+    print(f"visitors: {result['visitor_success']}/{args.visitors} answered, first byte p50 {result['visitor_first_byte_ms_p50']}ms")
+    print(f"upstream requests: {upstream_requests}; limiter: {stats}")
+
+    limit = backend.admission.limits.max_concurrent
+    failures = []
+    if limit and len(admitted) > limit:
+        failures.append(f"bot got {len(admitted)} concurrent streams, cap is {limit}")
+    if len(admitted) + len(rejected) != len(bot):
+        failures.append("bot requests failed with a status other than 200 or 429")
+    if any(not row["retry_after"] for row in rejected):
+        failures.append("429 without Retry-After")
+    if rejected and result["reject_ms_max"] > 500:
+        failures.append(f"slowest 429 took {result['reject_ms_max']}ms")
+    if result["visitor_success"] != args.visitors:
+        failures.append(f"{args.visitors - result['visitor_success']} visitors were turned away")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "result": result, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: the flood was capped with fast 429s and every visitor was served")
+
+
+if __name__ == "__main__":
+    main()
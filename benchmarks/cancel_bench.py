@@ -0,0 +1,145 @@
+"""Upstream cancellation when the client disconnects mid-stream.
+
+Runs `api.index` with uvicorn on a background thread against a slow fake
+OpenAI server. A client starts a long answer, reads a few chunks (or none,
+while the upstream is still before its first token), then drops the
+connection. The bench measures how long the fake upstream keeps its
+connection open after that, and how many tokens it streamed. This covers
+`/api/chat` with both engines, `/api/chat` behind a server that reports ASGI
+spec 2.4 (where Starlette itself no longer listens for disconnects), and
+`stream_text` / `stream_text_async` served with a `Cancellation`. It fails
+unless every upstream is released promptly, unless each `/api/chat` run
+records one `ai_inference_cancelled` event with its partial tokens, and
+unless a stream read to the end is not reported as cancelled.
+
+    python -m benchmarks.cancel_bench [--read-chunks 5] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from tests.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from tests.support import QUESTION, AppServer, disconnect_after, read_all, stream_text_app, wait_released
+
+
+def spec_2_4(app):
+    """Present the app as running on a server that implements ASGI spec 2.4."""
+    async def asgi(scope, receive, send):
+        if scope["type"] == "http":
+            scope = {**scope, "asgi": {**scope.get("asgi", {}), "spec_version": "2.4"}}
+        await app(scope, receive, send)
+    return asgi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--read-chunks", type=int, default=5)
+    parser.add_argument("--completion-tokens", type=int, default=400)
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--ttft", type=float, default=2.0)
+    parser.add_argument("--max-release-ms", type=float, default=250)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(ttft=args.ttft, tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens)
+    full_stream_seconds = args.ttft + args.completion_tokens / args.tokens_per_second
+    results = {}
+    failures = []
+    with FakeOpenAIServer(config) as fake:
+        os.environ.update({
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "ANSWER_CACHE_TTL": "0",
+            # Every request comes from 127.0.0.1; keep the per-IP admission limits out of the way
+            "CHAT_MAX_CONCURRENT": "0",
+            "CHAT_RATE_PER_MINUTE": "0",
+            "CHAT_TOKEN_BUDGET": "0",
+            "POSTHOG_BATCH_SIZE": "100000",
+            "POSTHOG_FLUSH_INTERVAL": "3600",
+        })
+        os.environ.pop("VERCEL", None)
+        import api.index as backend
+
+        cancellations = []
+        with AppServer(backend.app) as chat_server, AppServer(spec_2_4(backend.app)) as chat_server_2_4, \
+                AppServer(stream_text_app(fake.base_url, cancellations)) as stream_server:
+            chat_url = f"http://127.0.0.1:{chat_server.port}"
+            scenarios = [
+                ("chat langchain", "langchain", chat_url, args.read_chunks),
+                ("chat langchain, before first token", "langchain", chat_url, 0),
+                ("chat openai", "openai", chat_url, args.read_chunks),
+                ("chat openai, ASGI 2.4", "openai", f"http://127.0.0.1:{chat_server_2_4.port}", args.read_chunks),
+                ("chat openai, before first token", "openai", chat_url, 0),
+                ("stream_text", "sync", f"http://127.0.0.1:{stream_server.port}", args.read_chunks),
+                ("stream_text, before first token", "sync", f"http://127.0.0.1:{stream_server.port}", 0),
+                ("stream_text_async", "async", f"http://127.0.0.1:{stream_server.port}", args.read_chunks),
+            ]
+            for index, (name, engine, url, read_chunks) in enumerate(scenarios):
+                backend.posthog_events._buffer.clear()
+                tokens_before = fake.stats.tokens_sent
+                if engine in ("langchain", "openai"):
+                    backend.CHAT_ENGINE, backend.llm = engine, None
+                    payload = {"messages": [{"role": "user", "content": f"{QUESTION} ({index})"}], "session_id": f"bench-{index}"}
+                    disconnected_at = asyncio.run(disconnect_after(url, "/api/chat", read_chunks, payload))
+                else:
+                    disconnected_at = asyncio.run(disconnect_after(url, f"/stream/{engine}", read_chunks))
+                released = asyncio.run(wait_released(fake, disconnected_at, full_stream_seconds + 1))
+                time.sleep(0.05)
+
+                row = {
+                    "release_ms": round(released * 1000, 1),
+                    "upstream_tokens": fake.stats.tokens_sent - tokens_before,
+                }
+                if engine in ("langchain", "openai"):
+                    events = [e for e in backend.posthog_events._buffer if e["event"].startswith("ai_inference")]
+                    cancelled = [e["properties"] for e in events if e["event"] == "ai_inference_cancelled"]
+                    if len(events) != 1 or len(cancelled) != 1:
+                        failures.append(f"{name}: expected one ai_inference_cancelled event, got {[e['event'] for e in events]}")
+                    elif not cancelled[0]["upstream_cancelled"] or not cancelled[0]["prompt_tokens"]:
+                        failures.append(f"{name}: the cancelled event does not report the aborted upstream's tokens")
+                    else:
+                        row["reported_tokens"] = {k: cancelled[0][k] for k in ("prompt_tokens", "completion_tokens", "delivered_chunks")}
+                else:
+                    cancellation = cancellations[-1]
+                    if not cancellation.cancelled or "prompt_tokens" not in cancellation.usage:
+                        failures.append(f"{name}: the cancellation recorded no partial usage")
+                    else:
+                        row["reported_tokens"] = cancellation.usage
+                if released * 1000 > args.max_release_ms:
+                    failures.append(f"{name}: upstream held for {released * 1000:.0f}ms after the disconnect")
+                results[name] = row
+
+            # A stream read to the end must not count as cancelled
+            backend.posthog_events._buffer.clear()
+            backend.CHAT_ENGINE, backend.llm = "openai", None
+            fake.app.state.config.ttft, fake.app.state.config.completion_tokens = 0.05, 20
+            asyncio.run(read_all(chat_url, "/api/chat", {"messages": [{"role": "user", "content": QUESTION}], "session_id": "bench-complete"}))
+            asyncio.run(read_all(f"http://127.0.0.1:{stream_server.port}", "/stream/sync"))
+            time.sleep(0.05)
+            events = [e["event"] for e in backend.posthog_events._buffer if e["event"].startswith("ai_inference")]
+            if events != ["ai_inference_success"] or cancellations[-1].cancelled:
+                failures.append(f"complete streams: got {events}, stream_text cancelled={cancellations[-1].cancelled}")
+
+    print(f"full answer: {args.completion_tokens} tokens over {full_stream_seconds:.1f}s upstream")
+    for name, row in results.items():
+        reported = row.get("reported_tokens", {})
+        print(
+            f"{name:>34}: upstream released {row['release_ms']:>6.1f}ms after the disconnect, "
+            f"{row['upstream_tokens']:>3} tokens streamed; reported prompt ~{reported.get('prompt_tokens', '-')}, "
+            f"completion ~{reported.get('completion_tokens', '-')}"
+        )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: every disconnect aborted its upstream and was reported as cancelled")
+
+
+if __name__ == "__main__":
+    main()
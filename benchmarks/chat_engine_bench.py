@@ -0,0 +1,140 @@
+"""Per-chunk cost of the two /api/chat engines: LangChain vs. the direct openai client.
+
+Streams the same long completion from the fake OpenAI server (zero TTFT, no
+token pacing, in a separate process) through `ChatPromptTemplate | ChatOpenAI`
+and through `DirectChatEngine`, consuming chunks the way `chat()` does. It
+reports client-side CPU time per chunk and, in a second pass under
+tracemalloc, peak traced memory per stream. The HTTP and JSON decoding cost is
+the same for both, so the difference is what the engine itself adds.
+
+    python -m benchmarks.chat_engine_bench [--streams 20] [--tokens 1000] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from tests.support import free_port
+
+from .stream_concurrency_bench import wait_until_up
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HISTORY = [
+    {"role": "user", "content": "Hi"},
+    {"role": "assistant", "content": "Hello! Ask me anything about Fran."},
+]
+QUESTION = "What is Fran's experience?"
+
+
+def make_streams(base_url: str):
+    """One factory per engine, each returning a fresh chunk stream for the same prompt."""
+    from langchain_core.messages import convert_to_messages
+    from langchain_openai import ChatOpenAI
+    from openai import AsyncOpenAI
+
+    from api.utils.chat_engine import DirectChatEngine
+    from api.utils.chat_prompt import build_messages, langchain_prompts, render_system_prompt
+
+    context = (ROOT / "data.txt").read_text(encoding="utf-8")
+    llm = ChatOpenAI(
+        api_key="fake", base_url=base_url, model="gpt-4o-mini", streaming=True, temperature=0.7,
+        model_kwargs={"stream_options": {"include_usage": True}},
+    )
+    chain = langchain_prompts()[0].partial(context=context) | llm
+    inputs = {"history": convert_to_messages(HISTORY), "question": QUESTION}
+
+    engine = DirectChatEngine(
+        model="gpt-4o-mini", temperature=0.7, client=AsyncOpenAI(api_key="fake", base_url=base_url),
+    )
+    messages = build_messages(render_system_prompt("classic", context), HISTORY, QUESTION)
+
+    return {
+        "langchain": lambda: chain.astream(inputs),
+        "openai": lambda: engine.astream(messages),
+    }
+
+
+async def consume(stream) -> int:
+    """Read chunks exactly like chat() does; returns the number of content chunks."""
+    chunks = 0
+    async for chunk in stream:
+        if hasattr(chunk, "usage_metadata") and chunk.usage_metadata:
+            chunk.usage_metadata.get("output_tokens", 0)
+        if chunk.content:
+            chunks += 1
+    return chunks
+
+
+async def measure(factory, streams: int):
+    await consume(factory())  # warm up connections and lazy imports
+
+    cpu_per_chunk = []
+    wall = []
+    chunks = 0
+    for _ in range(streams):
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        chunks = await consume(factory())
+        cpu_per_chunk.append((time.process_time() - cpu_started) / max(chunks, 1))
+        wall.append(time.perf_counter() - wall_started)
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(max(3, streams // 5)):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await consume(factory())
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "chunks_per_stream": chunks,
+        "cpu_us_per_chunk": round(statistics.median(cpu_per_chunk) * 1e6, 2),
+        "stream_wall_ms": round(statistics.median(wall) * 1000, 1),
+        "peak_traced_kib_per_stream": round(statistics.median(peaks) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    port = free_port()
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_openai", "--port", str(port),
+        "--ttft", "0", "--tokens-per-second", "0", "--completion-tokens", str(args.tokens),
+    ], cwd=ROOT, env={**os.environ, "PYTHONPATH": str(ROOT)})
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/stats")
+        factories = make_streams(f"http://127.0.0.1:{port}/v1")
+        results = {name: asyncio.run(measure(factory, args.streams)) for name, factory in factories.items()}
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    for name, row in results.items():
+        print(
+            f"{name:>9}: {row['cpu_us_per_chunk']:>7.1f}us CPU/chunk  "
+            f"{row['stream_wall_ms']:>7.1f}ms/stream  peak {row['peak_traced_kib_per_stream']:>8.1f}KiB/stream  "
+            f"({row['chunks_per_stream']} chunks)"
+        )
+    lc, direct = results["langchain"], results["openai"]
+    cpu_saving = 1 - direct["cpu_us_per_chunk"] / lc["cpu_us_per_chunk"]
+    print(f"direct engine: {cpu_saving:.0%} less CPU per chunk, "
+          f"{lc['peak_traced_kib_per_stream'] - direct['peak_traced_kib_per_stream']:.0f}KiB less peak memory per stream")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
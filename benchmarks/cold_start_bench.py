@@ -0,0 +1,135 @@
+"""Cold-start budget for the serverless entry point `api/index.py`.
+
+Imports `api.index` in fresh interpreters with `python -X importtime`,
+reports the slowest modules, then checks the median import time against a
+budget and that none of the chat-only dependencies (LangChain, OpenAI,
+PostHog, requests) are loaded at import. It also times a first `/api/track`
+request in a fresh process, which must not pull them in either. Exits
+non-zero when any check fails, so a slow top-level import fails CI.
+
+    python -m benchmarks.cold_start_bench [--budget-ms 900] [--runs 5] [--top 15] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Top-level packages that only the chat path needs
+LAZY_MODULES = ("langchain_core", "langchain_openai", "langsmith", "openai", "posthog", "requests", "tiktoken")
+
+PROBE = """
+import json, os, sys, time
+os.environ.setdefault("OPENAI_API_KEY", "cold-start-bench")
+started = time.perf_counter()
+import api.index
+imported = time.perf_counter()
+result = {"import_ms": (imported - started) * 1000}
+if "--track" in sys.argv:
+    from fastapi.testclient import TestClient
+    before = set(sys.modules)
+    started = time.perf_counter()
+    response = TestClient(api.index.app).post("/api/track", json={"event": "page_view"})
+    result["track_ms"] = (time.perf_counter() - started) * 1000
+    result["track_status"] = response.status_code
+    result["track_new_modules"] = sorted({m.split(".")[0] for m in set(sys.modules) - before})
+result["loaded"] = sorted({m.split(".")[0] for m in sys.modules})
+print(json.dumps(result))
+"""
+
+
+def probe_env() -> Dict[str, str]:
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "PYTHONDONTWRITEBYTECODE": "1"}
+    # Point /api/track at an unroutable address so the probe never leaves the machine
+    env["ANALYTICS_FORM_URL"] = "http://127.0.0.1:9/forms"
+    env.pop("VERCEL", None)
+    return env
+
+
+def run_probe(*extra: str) -> Tuple[dict, List[Tuple[int, int, str]]]:
+    """Import api.index in a fresh interpreter; returns the probe result and (self_us, cumulative_us, module) rows."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, *extra],
+        cwd=ROOT, env=probe_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+    return json.loads(completed.stdout.strip().splitlines()[-1]), rows
+
+
+def top_level(rows: List[Tuple[int, int, str]]) -> List[Tuple[int, str]]:
+    """Cumulative time of each module imported directly by api.index (one nesting level below it)."""
+    return sorted(
+        ((cumulative, module.strip()) for _, cumulative, module in rows if len(module) - len(module.lstrip()) == 3),
+        reverse=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", "900")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    # The first run warms the OS file cache and compiles bytecode; it is not counted
+    run_probe()
+    import_ms = []
+    rows: List[Tuple[int, int, str]] = []
+    result: dict = {}
+    for _ in range(args.runs):
+        result, rows = run_probe()
+        import_ms.append(result["import_ms"])
+    track, _ = run_probe("--track")
+
+    median_ms = statistics.median(import_ms)
+    print(f"api.index import: median {median_ms:.0f}ms over {args.runs} runs (min {min(import_ms):.0f}ms, max {max(import_ms):.0f}ms)")
+    print(f"first /api/track in a fresh process: {track['track_ms']:.0f}ms (status {track['track_status']})")
+    print("\nSlowest direct imports of api.index (cumulative):")
+    for cumulative, module in top_level(rows)[: args.top]:
+        print(f"  {cumulative / 1000:>8.1f}ms  {module}")
+    print("\nSlowest modules overall (self time):")
+    for self_us, _, module in sorted(rows, reverse=True)[: args.top]:
+        print(f"  {self_us / 1000:>8.1f}ms  {module.strip()}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"import took {median_ms:.0f}ms, budget is {args.budget_ms:.0f}ms")
+    eager = [name for name in LAZY_MODULES if name in result["loaded"]]
+    if eager:
+        failures.append(f"imported at module load: {', '.join(eager)}")
+    track_eager = [name for name in LAZY_MODULES if name in track["track_new_modules"]]
+    if track_eager:
+        failures.append(f"/api/track loaded: {', '.join(track_eager)}")
+    if track["track_status"] >= 400:
+        failures.append(f"/api/track returned {track['track_status']}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({
+            "budget_ms": args.budget_ms,
+            "import_ms": import_ms,
+            "median_import_ms": median_ms,
+            "track_ms": track["track_ms"],
+            "eager_modules": eager,
+            "top_imports": [{"module": m, "cumulative_ms": c / 1000} for c, m in top_level(rows)[: args.top]],
+            "failures": failures,
+        }, indent=2))
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"\nOK: within the {args.budget_ms:.0f}ms budget and no chat-only modules loaded eagerly")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Serve the fake OpenAI API from `tests/fake_openai.py` standalone.
+
+    python -m benchmarks.fake_openai --port 8787 --ttft 0.3 --tokens-per-second 50
+"""
+import argparse
+from dataclasses import fields
+
+from tests.fake_openai import FakeOpenAIConfig, create_app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    for field in fields(FakeOpenAIConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=field.default)
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(**{f.name: getattr(args, f.name) for f in fields(FakeOpenAIConfig)})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Tail latency with and without hedged upstream requests.
+
+Streams completions through `DirectChatEngine` from the fake OpenAI server,
+where a fraction of requests has a very slow first token. The first pass runs
+without hedging and feeds its TTFTs into a histogram. The second pass runs with
+a `Hedger` whose deadline is a percentile of that histogram (or a fixed
+number of milliseconds). For each pass the bench reports TTFT and total latency
+percentiles, the hedge and hedge-win rates, and the extra upstream requests
+and tokens paid for. It fails if any answer is incomplete or if hedging
+does not lower p99 TTFT.
+
+    python -m benchmarks.hedge_bench [--requests 200] [--slow-rate 0.03] [--deadline p95] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from tests.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+
+from .stream_concurrency_bench import percentile
+
+MESSAGES = [{"role": "user", "content": "What is Fran's experience?"}]
+
+
+async def one(open_stream):
+    started = time.perf_counter()
+    first = None
+    chunks = 0
+    async for chunk in open_stream():
+        if chunk.content:
+            if first is None:
+                first = time.perf_counter() - started
+            chunks += 1
+    return first, time.perf_counter() - started, chunks
+
+
+async def run_pass(base_url, hedger, requests, concurrency):
+    from openai import AsyncOpenAI
+
+    from api.utils.chat_engine import DirectChatEngine
+
+    engine = DirectChatEngine(
+        model="gpt-4o-mini", temperature=0.7, client=AsyncOpenAI(api_key="fake", base_url=base_url, max_retries=0),
+    )
+    open_stream = lambda: engine.astream(MESSAGES)
+    if hedger is not None:
+        open_stream = hedger.wrap(open_stream)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            return await one(open_stream)
+
+    rows = await asyncio.gather(*(limited() for _ in range(requests)))
+    await engine.get_client().close()
+    return rows
+
+
+def summarize(rows):
+    ttft = [first for first, _, _ in rows]
+    total = [seconds for _, seconds, _ in rows]
+    return {
+        "ttft_ms": {f"p{q}": round(percentile(ttft, q) * 1000, 1) for q in (50, 95, 99)},
+        "total_ms": {f"p{q}": round(percentile(total, q) * 1000, 1) for q in (50, 95, 99)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-ttft", type=float, default=3.0)
+    parser.add_argument("--deadline", default="p95", help="hedge deadline: milliseconds or a TTFT percentile such as p95")
+    parser.add_argument("--completion-tokens", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    from api.utils.hedge import HedgePolicy, Hedger
+    from api.utils.metrics import Histogram
+
+    random.seed(args.seed)
+    config = FakeOpenAIConfig(
+        ttft=args.ttft, slow_rate=args.slow_rate, slow_ttft=args.slow_ttft,
+        tokens_per_second=100, completion_tokens=args.completion_tokens,
+    )
+    observed = Histogram()
+    # Never hedge inside the normal TTFT band: the floor is twice the base TTFT
+    hedger = Hedger(HedgePolicy.parse(args.deadline, histogram=lambda: observed, min_ms=args.ttft * 2000, min_samples=20))
+
+    results = {}
+    failures = []
+    with FakeOpenAIServer(config) as fake:
+        for mode in ("off", "hedged"):
+            requests_before, tokens_before = fake.stats.requests, fake.stats.tokens_sent
+            rows = asyncio.run(run_pass(fake.base_url, hedger if mode == "hedged" else None, args.requests, args.concurrency))
+            if mode == "off":
+                for first, _, _ in rows:
+                    observed.observe(first)
+            row = summarize(rows)
+            row["upstream_requests"] = fake.stats.requests - requests_before
+            row["upstream_tokens"] = fake.stats.tokens_sent - tokens_before
+            results[mode] = row
+            if any(chunks != args.completion_tokens for _, _, chunks in rows):
+                failures.append(f"{mode}: incomplete answers")
+
+    stats = hedger.stats()
+    results["hedged"]["hedger"] = stats
+    results["hedged"]["deadline_ms"] = round(hedger.policy.deadline() * 1000, 1)
+    off, hedged = results["off"], results["hedged"]
+    for mode, row in results.items():
+        print(
+            f"{mode:>6}: TTFT p50 {row['ttft_ms']['p50']:>7.1f}ms p95 {row['ttft_ms']['p95']:>7.1f}ms "
+            f"p99 {row['ttft_ms']['p99']:>7.1f}ms  total p99 {row['total_ms']['p99']:>7.1f}ms  "
+            f"{row['upstream_requests']} upstream requests, {row['upstream_tokens']} tokens streamed"
+        )
+    hedges = stats["hedges"]
+    print(
+        f"deadline {hedged['deadline_ms']}ms: hedged {hedges}/{stats['requests']} requests "
+        f"({hedges / max(stats['requests'], 1):.0%}), hedge won {stats['hedge_wins']}/{hedges} "
+        f"({stats['hedge_wins'] / max(hedges, 1):.0%}); extra: {hedged['upstream_requests'] - off['upstream_requests']} requests, "
+        f"~{stats['extra_prompt_tokens']} prompt tokens, {stats['extra_completion_chunks']} completion chunks"
+    )
+
+    if hedged["ttft_ms"]["p99"] >= off["ttft_ms"]["p99"]:
+        failures.append("hedging did not lower p99 TTFT")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: hedging cut the TTFT tail and every answer was complete")
+
+
+if __name__ == "__main__":
+    main()
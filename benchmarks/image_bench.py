@@ -0,0 +1,169 @@
+"""Image attachment preprocessing: request bytes and vision tokens per turn.
+
+Builds a conversation in which a large screenshot (PNG), a phone photo (JPEG)
+and a small icon are attached in early turns. The client resends the whole
+history each turn, as `useChat` does. Each turn goes through
+`convert_to_openai_messages` three ways: images unchanged, downscaled with
+no cache, and downscaled with the content-hash cache. The bench reports the
+request bytes and image tokens sent per turn, plus the conversion time. It
+fails if an image is processed more than once with the cache, if a
+downscaled image does not decode or is larger than `--max-dimension`, if the
+icon is changed, or if the tokens and bytes do not go down.
+
+    python -m benchmarks.image_bench [--turns 8] [--max-dimension 1024] [--json out.json]
+"""
+import argparse
+import base64
+import io
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+from PIL import Image, ImageDraw
+
+from api.utils.images import ImagePreprocessor, ImageReport
+from api.utils.prompt import ClientMessage, convert_to_openai_messages
+
+
+def data_url(image: Image.Image, format: str) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format)
+    return f"data:image/{format.lower()};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def screenshot(width: int = 2880, height: int = 1800) -> str:
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 60), fill=(40, 44, 52))
+    draw.rectangle((0, 60, 360, height), fill=(245, 245, 245))
+    for y in range(90, height, 28):
+        draw.text((400, y), f"{y:>5}  def handler(request): return respond(request.json(), status=200)  # line", fill=(30, 30, 30))
+        draw.text((20, y), f"file_{y // 28}.py", fill=(90, 90, 90))
+    return data_url(image, "PNG")
+
+
+def photo(width: int = 4032, height: int = 3024) -> str:
+    size = (width, height)
+    image = Image.merge("RGB", [
+        Image.effect_noise(size, 24),
+        Image.linear_gradient("L").resize(size),
+        Image.radial_gradient("L").resize(size),
+    ])
+    return data_url(image, "JPEG")
+
+
+def icon(size: int = 256) -> str:
+    image = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    ImageDraw.Draw(image).ellipse((16, 16, size - 16, size - 16), fill=(66, 133, 244, 255))
+    return data_url(image, "PNG")
+
+
+def conversation(turns: int, attachments) -> Iterator[list]:
+    """The history the client sends on each turn: attachments go out on turns 0, 1, 2."""
+    history = []
+    for turn in range(turns):
+        parts = [{"type": "text", "text": f"Question {turn}: what does this show?"}]
+        if turn < len(attachments):
+            parts.append({"type": "file", "contentType": attachments[turn][0], "url": attachments[turn][1]})
+        history.append(ClientMessage(role="user", parts=parts))
+        yield list(history)
+        history.append(ClientMessage(role="assistant", content=f"Answer {turn}."))
+
+
+def image_urls(openai_messages) -> list:
+    return [
+        part["image_url"]["url"]
+        for message in openai_messages
+        if isinstance(message["content"], list)
+        for part in message["content"]
+        if part["type"] == "image_url"
+    ]
+
+
+def run(turns: int, attachments, images) -> dict:
+    rows = []
+    for messages in conversation(turns, attachments):
+        report = ImageReport()
+        started = time.perf_counter()
+        converted = convert_to_openai_messages(messages, images, report)
+        elapsed = time.perf_counter() - started
+        rows.append({
+            "ms": round(elapsed * 1000, 2),
+            "request_bytes": len(json.dumps(converted)),
+            "report": report,
+            "urls": image_urls(converted),
+        })
+    return {"rows": rows, "stats": images.stats() if images else {}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--max-dimension", type=int, default=1024)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    attachments = [("image/png", screenshot()), ("image/jpeg", photo()), ("image/png", icon())]
+    modes = {
+        "off": run(args.turns, attachments, None),
+        "no cache": run(args.turns, attachments, ImagePreprocessor(args.max_dimension, args.quality, max_entries=0)),
+        "cached": run(args.turns, attachments, ImagePreprocessor(args.max_dimension, args.quality)),
+    }
+
+    failures = []
+    cached = modes["cached"]
+    if cached["stats"]["processed"] != len(attachments):
+        failures.append(f"cached: {cached['stats']['processed']} images processed for {len(attachments)} distinct attachments")
+    last = cached["rows"][-1]
+    for url in last["urls"]:
+        with Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1]))) as decoded:
+            decoded.load()
+            if max(decoded.size) > args.max_dimension:
+                failures.append(f"cached: image sent at {decoded.size}, over {args.max_dimension}px")
+    if last["urls"][2] != attachments[2][1]:
+        failures.append("cached: the icon, already within the limit, was re-encoded")
+    report = last["report"]
+    if report.tokens_after >= report.tokens_before or report.bytes_after >= report.bytes_before:
+        failures.append("cached: downscaling did not reduce tokens and bytes")
+    if modes["off"]["rows"][-1]["request_bytes"] <= last["request_bytes"]:
+        failures.append("cached: the request did not get smaller")
+
+    results = {}
+    for name, mode in modes.items():
+        rows = mode["rows"]
+        # With images unchanged nothing reports; they cost what the cached run measured before downscaling
+        image_tokens = sum(row["report"].tokens_before for row in cached["rows"]) if name == "off" else sum(row["report"].tokens_after for row in rows)
+        results[name] = {
+            "request_bytes": sum(row["request_bytes"] for row in rows),
+            "image_tokens": image_tokens,
+            "convert_ms": round(sum(row["ms"] for row in rows), 1),
+            "per_turn": [{"ms": row["ms"], "request_bytes": row["request_bytes"], **row["report"].telemetry()} for row in rows],
+            "stats": mode["stats"],
+        }
+
+    print(f"{args.turns} turns, full history resent each turn; attachments: {', '.join(f'{len(url) // 1024}KiB {kind}' for kind, url in attachments)}")
+    for name, row in results.items():
+        print(
+            f"{name:>9}: {row['request_bytes'] / 1e6:>6.2f}MB sent, {row['image_tokens']:>6} image tokens, "
+            f"{row['convert_ms']:>7.1f}ms converting"
+        )
+    off, done = results["off"], results["cached"]
+    print(
+        f"downscaled to {args.max_dimension}px: bytes {done['request_bytes'] / off['request_bytes'] - 1:+.0%}, "
+        f"image tokens {done['image_tokens'] / off['image_tokens'] - 1:+.0%}; "
+        f"cache: {done['stats']['processed']} processed, {done['stats']['hits']} hits"
+    )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: each attachment was processed once and is sent smaller on every turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Load-test the backend offline against the fake OpenAI server.
+
+Starts `benchmarks.fake_openai` and one uvicorn worker running `api.index`
+(plus the `stream_text` helpers mounted under `/bench`) in separate
+processes, then drives each scenario at each concurrency level and reports
+throughput, TTFT and latency percentiles, error count, event-loop lag inside
+the worker and resident memory per concurrent stream.
+
+    python -m benchmarks.load_test --levels 10,50 --json results.json
+    python -m benchmarks.load_test --json new.json --compare results.json --tolerance 0.2
+
+Scenarios: `chat` (/api/chat), `stream_text`, `stream_text_async` and `track`
+(/api/track, with Google Forms replaced by the fake server's sink). The answer
+cache is disabled in the worker so every chat request reaches the upstream.
+With `--compare`, rows are matched on (scenario, concurrency) and the script
+exits non-zero if throughput drops or p95 TTFT/latency rise by more than the
+tolerance.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .stream_concurrency_bench import percentile, wait_until_up
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("chat", "stream_text", "stream_text_async", "track")
+
+QUESTIONS = [
+    "What is Fran's experience?",
+    "What tools does Fran use?",
+    "Tell me about Fran's projects.",
+    "How can I contact Fran?",
+]
+
+TRACK_EVENT = {"event": "page_view", "referrer": "https://example.com", "screen": "1440x900",
+               "utms": {"utm_source": "load_test", "utm_medium": "benchmark"}}
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class LoopProbe:
+    """Sleeps `interval` in a loop inside the worker and records how late it wakes up."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.baseline_rss = rss_bytes()
+        self.peak_rss = self.baseline_rss
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def reset(self) -> None:
+        gc.collect()
+        self.lags = []
+        self.baseline_rss = rss_bytes()
+        self.peak_rss = self.baseline_rss
+
+    def snapshot(self) -> Dict[str, Any]:
+        lags = self.lags or [0.0]
+        return {
+            "loop_lag_p50_ms": round(statistics.median(lags) * 1000, 2),
+            "loop_lag_p99_ms": round(percentile(lags, 99) * 1000, 2),
+            "loop_lag_max_ms": round(max(lags) * 1000, 2),
+            "rss_baseline_bytes": self.baseline_rss,
+            "rss_peak_bytes": self.peak_rss,
+        }
+
+    async def _run(self) -> None:
+        ticks = 0
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - expected))
+            ticks += 1
+            if ticks % 5 == 0:
+                self.peak_rss = max(self.peak_rss, rss_bytes())
+
+
+def create_app():
+    """The real app plus `/bench` routes for the stream_text helpers and the worker probe."""
+    from fastapi.responses import StreamingResponse
+    from openai import AsyncOpenAI, OpenAI
+
+    from api.index import app
+    from api.utils.stream import patch_response_with_headers, stream_text, stream_text_async
+    from api.utils.tools import AVAILABLE_TOOLS, TOOL_DEFINITIONS
+
+    base_url = os.environ["FAKE_OPENAI_BASE_URL"]
+    sync_client = OpenAI(base_url=base_url, api_key="fake", max_retries=0)
+    async_client = AsyncOpenAI(base_url=base_url, api_key="fake", max_retries=0)
+    probe = LoopProbe()
+
+    @app.post("/bench/stream_text")
+    def bench_stream_text(body: dict):
+        response = StreamingResponse(stream_text(sync_client, body["messages"], TOOL_DEFINITIONS, AVAILABLE_TOOLS))
+        return patch_response_with_headers(response)
+
+    @app.post("/bench/stream_text_async")
+    async def bench_stream_text_async(body: dict):
+        response = StreamingResponse(stream_text_async(async_client, body["messages"], TOOL_DEFINITIONS, AVAILABLE_TOOLS))
+        return patch_response_with_headers(response)
+
+    @app.post("/bench/reset")
+    async def bench_reset():
+        probe.ensure_started()
+        probe.reset()
+        return probe.snapshot()
+
+    @app.get("/bench/probe")
+    async def bench_probe():
+        return probe.snapshot()
+
+    return app
+
+
+def scenario_request(scenario: str, i: int) -> Dict[str, Any]:
+    question = QUESTIONS[i % len(QUESTIONS)]
+    if scenario == "chat":
+        return {"url": "/api/chat", "json": {"messages": [{"role": "user", "content": question}], "session_id": f"load-{i}"}}
+    if scenario == "track":
+        return {"url": "/api/track", "json": TRACK_EVENT}
+    return {"url": f"/bench/{scenario}", "json": {"messages": [{"role": "user", "content": question}]}}
+
+
+async def one_request(client: httpx.AsyncClient, scenario: str, i: int) -> Dict[str, Any]:
+    spec = scenario_request(scenario, i)
+    started = time.perf_counter()
+    first_token = None
+    try:
+        async with client.stream("POST", spec["url"], json=spec["json"]) as response:
+            async for chunk in response.aiter_text():
+                if first_token is None and chunk and (scenario == "chat" or '"text-delta"' in chunk):
+                    first_token = time.perf_counter() - started
+            ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    return {"ok": ok, "ttft": first_token, "latency": time.perf_counter() - started}
+
+
+async def run_level(app_url: str, fake_url: str, scenario: str, concurrency: int, requests: int) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=app_url, timeout=120, limits=limits) as client:
+        await client.post(f"{fake_url}/stats/reset")
+        await client.post("/bench/reset")
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(i: int):
+            async with semaphore:
+                return await one_request(client, scenario, i)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+        probe = (await client.get("/bench/probe")).json()
+        upstream = (await client.get(f"{fake_url}/stats")).json()
+
+    latencies = [r["latency"] for r in results if r["ok"]] or [0.0]
+    ttfts = [r["ttft"] for r in results if r["ok"] and r["ttft"] is not None]
+    memory_growth = max(0, probe["rss_peak_bytes"] - probe["rss_baseline_bytes"])
+    row = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for r in results if not r["ok"]),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2),
+        "latency_p50_s": round(percentile(latencies, 50), 4),
+        "latency_p95_s": round(percentile(latencies, 95), 4),
+        "latency_p99_s": round(percentile(latencies, 99), 4),
+        "ttft_p50_s": round(percentile(ttfts, 50), 4) if ttfts else None,
+        "ttft_p95_s": round(percentile(ttfts, 95), 4) if ttfts else None,
+        "ttft_p99_s": round(percentile(ttfts, 99), 4) if ttfts else None,
+        "memory_per_stream_bytes": int(memory_growth / concurrency),
+        "upstream_peak_streams": upstream["peak_active"],
+        "form_posts": upstream["form_posts"],
+        **{key: probe[key] for key in ("loop_lag_p50_ms", "loop_lag_p99_ms", "loop_lag_max_ms", "rss_peak_bytes")},
+    }
+    return row
+
+
+# Metrics compared by --compare, and whether a higher value is better
+COMPARED = {"throughput_rps": True, "ttft_p95_s": False, "latency_p95_s": False}
+
+
+def compare(rows: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["rows"]}
+    regressions = []
+    for row in rows:
+        old = previous.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            new_value, old_value = row.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            print(f"  {row['scenario']:>17} x{row['concurrency']:<4} {metric:<15} {old_value:>9} -> {new_value:>9} ({change:+.0%})"
+                  f"{'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append(f"{row['scenario']} x{row['concurrency']} {metric} {change:+.0%}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--levels", default="10,50")
+    parser.add_argument("--requests-per-level", type=int, default=0, help="default: 4x the concurrency")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    parser.add_argument("--completion-tokens", type=int, default=40)
+    parser.add_argument("--tool-calls", type=int, default=0, help="tool calls per stream_text turn")
+    parser.add_argument("--fake-port", type=int, default=8797)
+    parser.add_argument("--app-port", type=int, default=8798)
+    parser.add_argument("--json", dest="json_path")
+    parser.add_argument("--compare", dest="baseline_path")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "FAKE_OPENAI_BASE_URL": f"{fake_url}/v1",
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "OPENAI_API_KEY": "fake",
+        "ANALYTICS_FORM_URL": f"{fake_url}/forms/submit",
+        "ANSWER_CACHE_TTL": "0",
+        # Every request comes from 127.0.0.1; keep the per-IP admission limits out of the way
+        "CHAT_MAX_CONCURRENT": "0",
+        "CHAT_RATE_PER_MINUTE": "0",
+        "CHAT_TOKEN_BUDGET": "0",
+        "POSTHOG_API_KEY": "",
+        "NEXT_PUBLIC_POSTHOG_KEY": "",
+    }
+    env.pop("VERCEL", None)
+
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_openai", "--port", str(args.fake_port),
+        "--ttft", str(args.ttft), "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens), "--tool-calls", str(args.tool_calls),
+    ], cwd=ROOT, env=env)
+    worker = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "benchmarks.load_test:create_app", "--factory",
+        "--port", str(args.app_port), "--workers", "1", "--log-level", "warning",
+    ], cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+
+    rows = []
+    try:
+        wait_until_up(f"{fake_url}/stats")
+        wait_until_up(f"{app_url}/bench/probe", timeout=30)
+
+        for concurrency in [int(level) for level in args.levels.split(",")]:
+            for scenario in args.scenarios.split(","):
+                requests = args.requests_per_level or concurrency * 4
+                row = asyncio.run(run_level(app_url, fake_url, scenario, concurrency, requests))
+                rows.append(row)
+                ttft = f"{row['ttft_p50_s']:.3f}/{row['ttft_p95_s']:.3f}s" if row["ttft_p50_s"] is not None else "-"
+                print(
+                    f"{scenario:>17} x{concurrency:<4} {row['throughput_rps']:>7.1f} req/s  "
+                    f"ttft p50/p95 {ttft:>13}  latency p95 {row['latency_p95_s']:.3f}s  "
+                    f"loop lag p99 {row['loop_lag_p99_ms']:.1f}ms  "
+                    f"mem/stream {row['memory_per_stream_bytes'] / 1024:.0f}KiB  errors {row['errors']}"
+                )
+    finally:
+        worker.terminate()
+        fake.terminate()
+        worker.wait()
+        fake.wait()
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": vars(args),
+        "rows": rows,
+    }
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
+
+    if args.baseline_path:
+        print(f"Compared with {args.baseline_path} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(rows, json.loads(Path(args.baseline_path).read_text()), args.tolerance)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Per-request logging overhead: print() vs. the queue-backed JSON logger.
+
+Replays the log lines one request used to print, at a fixed request rate,
+into a pipe drained by a reader thread. That is an `/api/track` payload
+(`ANALYTICS_EVENT: {json.dumps(data)}`), the chat "started" debug line and,
+every `--error-every` requests, a stream failure with its stack trace. The
+modes are the old print statements (block-buffered, as stdout to a pipe is by
+default, and unbuffered, as with PYTHONUNBUFFERED=1), `api.utils.log`
+(formatted and written by its listener thread) and `api.utils.log` with DEBUG
+and ANALYTICS sampled at `--sample-rate`. Each mode runs against a reader
+that keeps up and one that stalls `--stall-ms` every `--stall-every-ms`, the
+way a busy log collector does. The bench reports the time each request spends
+in logging calls on the calling thread.
+
+It then runs `api.index` with uvicorn against the fake OpenAI server. It
+checks that every line is JSON, that a request's lines carry the id from its
+X-Request-ID response header, and that its PostHog events carry the same id.
+It fails if any of that does not hold, if the logger drops lines against
+the reader that keeps up, or if its slowest request against the stalling
+reader is not well below print's.
+
+    python -m benchmarks.log_bench [--requests 3000] [--rate 1000] [--json out.json]
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import httpx
+
+from tests.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from tests.support import AppServer
+
+TRACK_PAYLOAD = {
+    "utm_source": "linkedin",
+    "utm_medium": "social",
+    "utm_campaign": "portfolio-launch",
+    "ref": "newsletter",
+    "referrer": "https://www.linkedin.com/feed/update/urn:li:activity:7251234567890123456/",
+    "resolution": "2560x1440",
+    "path": "/case-studies/ai-digital-twin",
+    "timestamp": "2026-10-18T12:34:56.789Z",
+}
+
+
+class PipeSink:
+    """A pipe whose reader drains it like a log collector, optionally stalling now and then."""
+
+    def __init__(self, stall_ms: float = 0, stall_every_ms: float = 0, unbuffered: bool = False):
+        self.stall = stall_ms / 1000
+        self.stall_every = stall_every_ms / 1000
+        read_fd, write_fd = os.pipe()
+        self._reader = os.fdopen(read_fd, "rb", buffering=0)
+        # Like stdout redirected to a pipe: block-buffered text, or a write per line when unbuffered
+        self.stream = os.fdopen(write_fd, "w", buffering=1 if unbuffered else -1)
+        self.lines = 0
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        next_stall = time.perf_counter() + self.stall_every
+        while True:
+            data = self._reader.read(65536)
+            if not data:
+                return
+            self.lines += data.count(b"\n")
+            if self.stall and time.perf_counter() >= next_stall:
+                time.sleep(self.stall)
+                next_stall = time.perf_counter() + self.stall_every
+
+    def close(self) -> int:
+        self.stream.close()
+        self._thread.join()
+        self._reader.close()
+        return self.lines
+
+
+def failure():
+    try:
+        raise RuntimeError("upstream stream reset")
+    except RuntimeError as e:
+        return e
+
+
+def replay(args, emit) -> list:
+    """Call `emit(index)` at `--rate` per second; return the seconds each call took."""
+    spent = []
+    interval = 1 / args.rate
+    started = time.perf_counter()
+    for index in range(args.requests):
+        delay = started + index * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        before = time.perf_counter()
+        emit(index)
+        spent.append(time.perf_counter() - before)
+    return spent
+
+
+def run_print(args, sink: PipeSink):
+    error = failure()
+
+    def emit(index):
+        print(f"ANALYTICS_EVENT: {json.dumps(TRACK_PAYLOAD)}", file=sink.stream)
+        print("--- DEBUG: Chat started ---", file=sink.stream)
+        if index % args.error_every == 0:
+            traceback.print_exception(error, file=sink.stream)
+            print(f"ERROR: {error}", file=sink.stream)
+
+    spent = replay(args, emit)
+    return spent, {}
+
+
+def run_log(args, sink: PipeSink, sample_rates: str):
+    from api.utils.log import (
+        ANALYTICS, JsonFormatter, QueueLogHandler, SamplingFilter, get_logger, parse_sample_rates, request_id_var,
+    )
+
+    # The same pieces configure_logging() installs, on a private logger and sink
+    writer = logging.StreamHandler(sink.stream)
+    writer.setFormatter(JsonFormatter())
+    handler = QueueLogHandler(queue.SimpleQueue(), args.queue_size)
+    sampling = SamplingFilter(parse_sample_rates(sample_rates))
+    handler.addFilter(sampling)
+    listener = logging.handlers.QueueListener(handler.queue, writer)
+    logger = get_logger(f"log_bench.{sample_rates or 'all'}.{id(sink)}")
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    error = failure()
+
+    def emit(index):
+        token = request_id_var.set(f"bench-{index}")
+        logger.log(ANALYTICS, "Analytics event", extra={"event": TRACK_PAYLOAD})
+        logger.debug("Chat started", extra={"session_id": "bench", "stream_format": "text"})
+        if index % args.error_every == 0:
+            logger.error("Stream failed", exc_info=(type(error), error, error.__traceback__))
+        request_id_var.reset(token)
+
+    listener.start()
+    spent = replay(args, emit)
+    listener.stop()
+    return spent, {"enqueued": handler.enqueued, "dropped": handler.dropped, "sampled_out": sampling.sampled_out}
+
+
+def summarize(spent, sink_lines, extra) -> dict:
+    ordered = sorted(spent)
+    return {
+        "mean_us": round(statistics.fmean(spent) * 1e6, 1),
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 1),
+        "p99_us": round(ordered[int(len(ordered) * 0.99)] * 1e6, 1),
+        "max_us": round(ordered[-1] * 1e6, 1),
+        "lines_written": sink_lines,
+        **extra,
+    }
+
+
+async def correlate(url: str) -> list:
+    responses = []
+    async with httpx.AsyncClient(timeout=30) as client:
+        for index in range(3):
+            responses.append(await client.post(url + "/api/track", json={**TRACK_PAYLOAD, "event": f"visit-{index}"}))
+            responses.append(await client.post(url + "/api/chat", json={"messages": [{"role": "user", "content": f"What has Fran built? ({index})"}]}))
+        responses.append(await client.post(url + "/api/track", json=TRACK_PAYLOAD, headers={"X-Request-ID": "client-supplied-id"}))
+    return responses
+
+
+def end_to_end(failures: list) -> dict:
+    from api.utils.log import configure_logging, log_stats
+
+    capture = io.StringIO()
+    configure_logging(level="DEBUG", sample_rates="", stream=capture)
+    with FakeOpenAIServer(FakeOpenAIConfig(ttft=0.05, completion_tokens=20)) as fake:
+        os.environ.update({
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "ANSWER_CACHE_TTL": "0",
+            # Every request comes from 127.0.0.1; keep the per-IP admission limits out of the way
+            "CHAT_MAX_CONCURRENT": "0",
+            "CHAT_RATE_PER_MINUTE": "0",
+            "CHAT_TOKEN_BUDGET": "0",
+            "POSTHOG_BATCH_SIZE": "100000",
+            "POSTHOG_FLUSH_INTERVAL": "3600",
+        })
+        os.environ.pop("VERCEL", None)
+        import api.index as backend
+
+        backend.warm_chat_path()
+        backend.posthog_events._buffer.clear()
+        with AppServer(backend.app) as server:
+            responses = asyncio.run(correlate(f"http://127.0.0.1:{server.port}"))
+    time.sleep(0.2)
+
+    lines = []
+    for raw in capture.getvalue().splitlines():
+        try:
+            lines.append(json.loads(raw))
+        except ValueError:
+            failures.append(f"end to end: not a JSON line: {raw[:80]!r}")
+    by_request = {}
+    for line in lines:
+        by_request.setdefault(line.get("request_id"), []).append(line["msg"])
+    events = {event["properties"].get("request_id") for event in backend.posthog_events._buffer}
+
+    for response in responses:
+        request_id = response.headers.get("x-request-id")
+        path = response.request.url.path
+        if not request_id or not by_request.get(request_id):
+            failures.append(f"end to end: no log lines for {path} request {request_id}")
+        elif path == "/api/chat" and request_id not in events:
+            failures.append(f"end to end: PostHog event for {request_id} lacks its request id")
+    if responses[-1].headers.get("x-request-id") != "client-supplied-id":
+        failures.append("end to end: a client-supplied X-Request-ID was not reused")
+    return {"lines": len(lines), "requests": len(responses), "stats": log_stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=1000, help="requests per second")
+    parser.add_argument("--error-every", type=int, default=50)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--stall-ms", type=float, default=300)
+    parser.add_argument("--stall-every-ms", type=float, default=1000)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    sinks = {"keeps up": (0, 0), "stalls": (args.stall_ms, args.stall_every_ms)}
+    modes = {
+        "print": (lambda sink: run_print(args, sink), False),
+        "print unbuffered": (lambda sink: run_print(args, sink), True),
+        "log": (lambda sink: run_log(args, sink, ""), False),
+        "log sampled": (lambda sink: run_log(args, sink, f"DEBUG={args.sample_rate},ANALYTICS={args.sample_rate}"), False),
+    }
+    results = {}
+    failures = []
+    for sink_name, (stall_ms, stall_every_ms) in sinks.items():
+        for mode, (run, unbuffered) in modes.items():
+            sink = PipeSink(stall_ms, stall_every_ms, unbuffered)
+            spent, extra = run(sink)
+            results[f"{mode}, reader {sink_name}"] = summarize(spent, sink.close(), extra)
+
+    if results["log, reader keeps up"]["dropped"]:
+        failures.append(f"log: dropped {results['log, reader keeps up']['dropped']} lines with a reader that keeps up")
+    worst_print = min(results[f"{mode}, reader stalls"]["max_us"] for mode in ("print", "print unbuffered"))
+    if results["log, reader stalls"]["max_us"] * 10 > worst_print:
+        failures.append("log: the slowest request with a stalling reader is not well below print's")
+
+    results["end to end"] = end_to_end(failures)
+
+    print(f"{args.requests} requests at {args.rate:.0f}/s; one analytics line, one debug line, a stack trace every {args.error_every}")
+    for name, row in results.items():
+        if name == "end to end":
+            continue
+        dropped = f", {row['dropped']} dropped, {row['sampled_out']} sampled out" if "dropped" in row else ""
+        print(
+            f"{name:>33}: per request mean {row['mean_us']:>7.1f}µs  p50 {row['p50_us']:>7.1f}µs  "
+            f"p99 {row['p99_us']:>8.1f}µs  max {row['max_us'] / 1000:>6.1f}ms  ({row['lines_written']} lines{dropped})"
+        )
+    e2e = results["end to end"]
+    print(f"end to end: {e2e['lines']} JSON lines for {e2e['requests']} requests; logger {e2e['stats']}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: log calls stay cheap while the reader stalls, and every line carries its request id")
+
+
+if __name__ == "__main__":
+    main()
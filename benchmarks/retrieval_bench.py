@@ -0,0 +1,118 @@
+"""Compare full-context and section-retrieval prompts for /api/chat.
+
+Runs offline against data.txt: for a fixed set of visitor questions it counts
+the context tokens each mode would send and checks whether the facts needed to
+answer each question survive retrieval ("coverage").
+
+    python -m benchmarks.retrieval_bench [--top-k 3] [--json results.json]
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from api.utils.retrieval import DEFAULT_CORE_SECTIONS, SectionIndex, build_query
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (question, facts the answer needs). Facts are matched case-insensitively
+# against the context that would be sent to the model.
+QUESTIONS = [
+    ("What is Fran's experience?", ["TestGorilla", "Emendu", "Passporter", "Despegar"]),
+    ("What tools does Fran use?", ["LangGraph", "Mixpanel", "Figma"]),
+    ("Which analytics tools has Fran worked with?", ["Mixpanel", "Amplitude", "Looker Studio"]),
+    ("Tell me about a product failure", ["CEO blocked it"]),
+    ("How did Fran handle the funding crisis?", ["97-98% retention"]),
+    ("What is operational leverage?", ["Warehouse OS"]),
+    ("How big was the budget at Despegar?", ["€10M/year"]),
+    ("Where did Fran study?", ["Universidad de Buenos Aires", "Reforge"]),
+    ("How does Fran prioritize?", ["RICE"]),
+    ("What languages does Fran speak?", ["Spanish", "English"]),
+    ("How can I contact Fran?", ["linkedin.com/in/fran-chaves"]),
+    ("How was this portfolio built?", ["Next.js", "RAG"]),
+    ("Why did Fran switch from civil engineering to tech?", ["structural thinking"]),
+    ("What is Fran's leadership style?", ["Transparent and hands-on"]),
+    ("What were the vanity metrics at Passporter?", ["Retention was <1%"]),
+    ("Does Fran know React?", ["React"]),
+]
+
+
+def get_token_counter():
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken/o200k_base"
+    except Exception:
+        return (lambda text: max(1, len(text) // 4)), "chars/4 estimate"
+
+
+def coverage(context: str, facts) -> float:
+    lowered = context.lower()
+    return sum(1 for fact in facts if fact.lower() in lowered) / len(facts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=str(ROOT / "data.txt"))
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--core", default=",".join(DEFAULT_CORE_SECTIONS))
+    parser.add_argument("--json", dest="json_path", help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    text = Path(args.data).read_text(encoding="utf-8")
+    count_tokens, tokenizer_name = get_token_counter()
+
+    started = time.perf_counter()
+    index = SectionIndex.build(text, core_sections=[c.strip() for c in args.core.split(",") if c.strip()])
+    build_ms = (time.perf_counter() - started) * 1000
+
+    full_tokens = count_tokens(text)
+    rows = []
+    for question, facts in QUESTIONS:
+        started = time.perf_counter()
+        selected = index.retrieve(build_query(question), top_k=args.top_k)
+        retrieve_ms = (time.perf_counter() - started) * 1000
+        context = SectionIndex.render(selected)
+        rows.append({
+            "question": question,
+            "sections": [s.name for s in selected],
+            "retrieval_tokens": count_tokens(context),
+            "full_tokens": full_tokens,
+            "retrieval_coverage": coverage(context, facts),
+            "full_coverage": coverage(text, facts),
+            "retrieve_ms": retrieve_ms,
+        })
+
+    summary = {
+        "tokenizer": tokenizer_name,
+        "top_k": args.top_k,
+        "sections": len(index.sections),
+        "index_build_ms": round(build_ms, 3),
+        "full_tokens": full_tokens,
+        "mean_retrieval_tokens": statistics.mean(r["retrieval_tokens"] for r in rows),
+        "token_reduction_pct": 100 * (1 - statistics.mean(r["retrieval_tokens"] for r in rows) / full_tokens),
+        "mean_full_coverage": statistics.mean(r["full_coverage"] for r in rows),
+        "mean_retrieval_coverage": statistics.mean(r["retrieval_coverage"] for r in rows),
+        "mean_retrieve_ms": statistics.mean(r["retrieve_ms"] for r in rows),
+    }
+
+    print(f"{'question':<55} {'tokens':>7} {'cover':>6}  sections")
+    for row in rows:
+        names = ", ".join(n for n in row["sections"] if n.upper() not in index.core_names)
+        print(f"{row['question'][:55]:<55} {row['retrieval_tokens']:>7} {row['retrieval_coverage']:>6.0%}  {names}")
+    print()
+    print(f"full context:      {full_tokens} tokens, coverage {summary['mean_full_coverage']:.0%}")
+    print(
+        f"retrieval (k={args.top_k}):   {summary['mean_retrieval_tokens']:.0f} tokens on average "
+        f"(-{summary['token_reduction_pct']:.0f}%), coverage {summary['mean_retrieval_coverage']:.0%}"
+    )
+    print(f"index build {build_ms:.2f} ms, retrieve {summary['mean_retrieve_ms']:.3f} ms/query ({tokenizer_name})")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"summary": summary, "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Time to the first speakable sentence: raw text stream vs. the `segments` stream format.
+
+Runs `api.index` with uvicorn on a background thread against the fake OpenAI
+server and asks the same questions with `stream_format` text and segments.
+Without segmentation, a TTS client that cannot cut sentences itself must wait
+for the whole answer. With `segments`, it can start on the first NDJSON line.
+The bench reports the median time to the first byte, to the first segment and
+to the end of the answer. It also reports the segmenter's CPU cost per
+delta. It fails if the joined segments differ from the text answer, if
+sequence numbers are not contiguous, or if the first segment does not arrive
+before the answer ends.
+
+    python -m benchmarks.segment_bench [--requests 5] [--min-chars 0] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from tests.fake_openai import WORDS, FakeOpenAIConfig, FakeOpenAIServer
+from tests.support import AppServer
+
+
+async def ask(url: str, index: int, stream_format: str, min_chars: int):
+    payload = {
+        "messages": [{"role": "user", "content": f"What has Fran built? ({stream_format} {index})"}],
+        "stream_format": stream_format,
+        "segment_min_chars": min_chars,
+    }
+    started = time.perf_counter()
+    first_byte = first_segment = None
+    body = b""
+    async with httpx.AsyncClient(timeout=60) as client:
+        async with client.stream("POST", url + "/api/chat", json=payload) as response:
+            async for chunk in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                body += chunk
+                if stream_format == "segments" and first_segment is None and b'"type":"segment"' in body:
+                    first_segment = time.perf_counter() - started
+    total = time.perf_counter() - started
+    if stream_format == "text":
+        # A client that cannot segment speaks only once the answer is complete
+        return {"first_byte": first_byte, "first_speech": total, "total": total, "text": body.decode()}
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    return {"first_byte": first_byte, "first_speech": first_segment, "total": total, "lines": lines}
+
+
+def segmenter_cost(deltas, min_chars: int, clause_chars: int, repeat: int = 200) -> float:
+    from api.utils.segment import SentenceSegmenter
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        segmenter = SentenceSegmenter(min_chars=min_chars, clause_chars=clause_chars)
+        for delta in deltas:
+            for _ in segmenter.push(delta):
+                pass
+        segmenter.flush()
+    return (time.perf_counter() - started) / (repeat * len(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--min-chars", type=int, default=0)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=30)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(ttft=args.ttft, tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens)
+    results = {}
+    failures = []
+    with FakeOpenAIServer(config) as fake:
+        os.environ.update({
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "ANSWER_CACHE_TTL": "0",
+            "CHAT_RATE_PER_MINUTE": "0",
+            "POSTHOG_BATCH_SIZE": "100000",
+            "POSTHOG_FLUSH_INTERVAL": "3600",
+        })
+        os.environ.pop("VERCEL", None)
+        import api.index as backend
+
+        backend.warm_chat_path()
+        with AppServer(backend.app) as server:
+            url = f"http://127.0.0.1:{server.port}"
+            rows = {
+                stream_format: [asyncio.run(ask(url, i, stream_format, args.min_chars)) for i in range(args.requests)]
+                for stream_format in ("text", "segments")
+            }
+
+    answers = {row["text"] for row in rows["text"]}
+    for row in rows["segments"]:
+        segments = [line for line in row["lines"] if line["type"] == "segment"]
+        if "".join(line["text"] for line in segments) not in answers:
+            failures.append("segments: joined segments differ from the text answer")
+        if [line["seq"] for line in segments] != list(range(len(segments))) or row["lines"][-1] != {"type": "done", "segments": len(segments)}:
+            failures.append("segments: sequence numbers are not contiguous or the done line is wrong")
+        if row["first_speech"] >= row["total"] * 0.9:
+            failures.append("segments: the first segment did not arrive before the answer ended")
+        row["segments"] = len(segments)
+        row["first_segment_chars"] = len(segments[0]["text"]) if segments else 0
+
+    for stream_format, format_rows in rows.items():
+        results[stream_format] = {
+            key: round(statistics.median(row[key] for row in format_rows) * 1000, 1)
+            for key in ("first_byte", "first_speech", "total")
+        }
+    results["segments"]["segments"] = rows["segments"][0]["segments"]
+    results["segments"]["first_segment_chars"] = rows["segments"][0]["first_segment_chars"]
+
+    deltas = [WORDS[i % len(WORDS)] if i == 0 else " " + WORDS[i % len(WORDS)] for i in range(args.completion_tokens)]
+    results["segmenter_us_per_delta"] = round(segmenter_cost(deltas, args.min_chars, backend.SEGMENT_CLAUSE_CHARS) * 1e6, 2)
+
+    text, segmented = results["text"], results["segments"]
+    print(f"    text: first byte {text['first_byte']:>6.0f}ms  speakable after {text['first_speech']:>6.0f}ms (whole answer)")
+    print(
+        f"segments: first byte {segmented['first_byte']:>6.0f}ms  speakable after {segmented['first_speech']:>6.0f}ms "
+        f"(first of {segmented['segments']} segments, {segmented['first_segment_chars']} chars)  done {segmented['total']:.0f}ms"
+    )
+    print(
+        f"time to first speakable text {segmented['first_speech'] / text['first_speech'] - 1:+.0%}; "
+        f"segmenter {results['segmenter_us_per_delta']}µs per delta"
+    )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(sorted(set(failures))))
+        sys.exit(1)
+    print("OK: segments carry the same text, in order, and the first arrives before the answer ends")
+
+
+if __name__ == "__main__":
+    main()
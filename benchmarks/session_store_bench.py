@@ -0,0 +1,118 @@
+"""Request size and server-side parse time: full-history requests vs. the session store.
+
+Replays a long conversation turn by turn. In full-history mode every request
+carries the whole conversation, as the client used to send it. In store mode
+a request carries only the new message and the conversation version, and the
+server rebuilds the history from the memory or SQLite store. For each mode
+the bench reports request bytes and the time to validate the body into
+`ChatRequest` and assemble the message list, summed over the conversation. It
+fails if a rebuilt conversation differs from the one the client holds.
+
+    python -m benchmarks.session_store_bench [--turns 30] [--answer-chars 900] [--json out.json]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from api.index import ChatRequest
+from api.utils.session_store import MemorySessionStore, SqliteSessionStore, conversation_with_answer, new_version
+
+SESSION_ID = "bench-session"
+
+
+def conversation(turns: int, answer_chars: int):
+    for turn in range(turns):
+        question = f"Question {turn}: what did Fran do at company number {turn}, and which tools were involved?"
+        answer = (f"At company {turn} Fran led growth and built prototypes. " * (answer_chars // 55 + 1))[:answer_chars]
+        yield (
+            {"id": f"u{turn}", "role": "user", "content": question},
+            {"id": f"a{turn}", "role": "assistant", "content": answer},
+        )
+
+
+def timed(func, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def replay_full(turns, answer_chars, repeat):
+    client_history, total_bytes, total_seconds = [], 0, 0.0
+    for question, answer in conversation(turns, answer_chars):
+        body = json.dumps({"messages": client_history + [question], "session_id": SESSION_ID})
+        messages, seconds = timed(lambda: ChatRequest.model_validate_json(body).messages, repeat)
+        total_bytes += len(body)
+        total_seconds += seconds
+        client_history += [question, answer]
+    return {"request_bytes": total_bytes, "parse_ms": total_seconds * 1000}
+
+
+def replay_store(store, turns, answer_chars, repeat, failures, name):
+    client_history, version, total_bytes, total_seconds = [], None, 0, 0.0
+    for turn, (question, answer) in enumerate(conversation(turns, answer_chars), start=1):
+        if version is None:
+            body = json.dumps({"messages": [question], "session_id": SESSION_ID})
+        else:
+            body = json.dumps({"messages": [question], "session_id": SESSION_ID, "conversation_version": version})
+
+        def assemble():
+            request = ChatRequest.model_validate_json(body)
+            stored = store.get(request.session_id, request.conversation_version) if request.conversation_version else None
+            return stored.messages + request.messages if stored is not None else request.messages
+
+        messages, seconds = timed(assemble, repeat)
+        total_bytes += len(body)
+        total_seconds += seconds
+
+        expected = [{"role": m["role"], "content": m["content"]} for m in client_history + [question]]
+        if [{"role": m["role"], "content": m["content"]} for m in messages] != expected:
+            failures.append(f"{name}: turn {turn} rebuilt a different conversation")
+        version = new_version(turn)
+        store.put(SESSION_ID, conversation_with_answer(messages, answer["content"]), version, turn)
+        client_history += [question, answer]
+    return {"request_bytes": total_bytes, "parse_ms": total_seconds * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--answer-chars", type=int, default=900)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    failures = []
+    results = {"full history": replay_full(args.turns, args.answer_chars, args.repeat)}
+    results["memory store"] = replay_store(
+        MemorySessionStore(max_messages=10_000), args.turns, args.answer_chars, args.repeat, failures, "memory",
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        store = SqliteSessionStore(Path(directory) / "sessions.db", max_messages=10_000)
+        results["sqlite store"] = replay_store(store, args.turns, args.answer_chars, args.repeat, failures, "sqlite")
+        store.close()
+
+    full = results["full history"]
+    for name, row in results.items():
+        print(
+            f"{name:>12}: {row['request_bytes'] / 1024:>8.1f}KiB sent over {args.turns} turns  "
+            f"{row['parse_ms']:>7.2f}ms parse + assemble"
+            + ("" if row is full else f"  ({row['request_bytes'] / full['request_bytes'] - 1:+.0%} bytes, "
+                                      f"{row['parse_ms'] / full['parse_ms'] - 1:+.0%} parse time)")
+        )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: the stores rebuild every turn's conversation exactly")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Single-flight deduplication of identical concurrent /api/chat requests.
+
+Runs `api.index` with uvicorn on a background thread against the fake OpenAI
+server and fires the same question from N sessions, each starting a little
+after the previous one, so later sessions join a stream that is already
+producing tokens. This happens once with single-flight off and once with it
+on. Each pass reports upstream requests, billed completion tokens and time to
+the first byte. The run fails unless every session gets the same answer
+and exactly one success event, and unless single-flight reaches the
+upstream once and bills the tokens to one session only.
+
+    python -m benchmarks.single_flight_bench [--sessions 20] [--stagger-ms 20] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from tests.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from tests.support import AppServer
+
+QUESTION = "What is Fran's experience?"
+
+
+async def ask(client: httpx.AsyncClient, session_id: str, delay: float):
+    await asyncio.sleep(delay)
+    started = time.perf_counter()
+    first = None
+    body = []
+    payload = {"messages": [{"role": "user", "content": QUESTION}], "session_id": session_id}
+    async with client.stream("POST", "/api/chat", json=payload) as response:
+        role = response.headers.get("x-single-flight")
+        async for text in response.aiter_text():
+            if first is None and text:
+                first = time.perf_counter() - started
+            body.append(text)
+    return {"session_id": session_id, "role": role, "body": "".join(body), "first_byte": first}
+
+
+async def run_pass(base_url: str, sessions: int, stagger: float):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        return await asyncio.gather(*(ask(client, f"bench-{i}", i * stagger) for i in range(sessions)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--stagger-ms", type=float, default=20)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    # A one-second stream, so every staggered session arrives while it is running
+    config = FakeOpenAIConfig(ttft=0.2, tokens_per_second=50, completion_tokens=40)
+    with FakeOpenAIServer(config) as fake:
+        os.environ.update({
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "ANSWER_CACHE_TTL": "0",
+            # Every request comes from 127.0.0.1; keep the per-IP admission limits out of the way
+            "CHAT_MAX_CONCURRENT": "0",
+            "CHAT_RATE_PER_MINUTE": "0",
+            "CHAT_TOKEN_BUDGET": "0",
+            "POSTHOG_BATCH_SIZE": "100000",
+            "POSTHOG_FLUSH_INTERVAL": "3600",
+        })
+        os.environ.pop("VERCEL", None)
+        import api.index as backend
+
+        backend.warm_chat_path()
+
+        results = {}
+        failures = []
+        with AppServer(backend.app) as server:
+            for mode in ("off", "on"):
+                backend.single_flight.enabled = mode == "on"
+                backend.posthog_events._buffer.clear()
+                requests_before, tokens_before = fake.stats.requests, fake.stats.tokens_sent
+
+                rows = asyncio.run(run_pass(f"http://127.0.0.1:{server.port}", args.sessions, args.stagger_ms / 1000))
+
+                events = [e for e in backend.posthog_events._buffer if e["event"].startswith("ai_inference")]
+                successes = [e["properties"] for e in events if e["event"] == "ai_inference_success"]
+                upstream = fake.stats.requests - requests_before
+                results[mode] = {
+                    "upstream_requests": upstream,
+                    "upstream_tokens": fake.stats.tokens_sent - tokens_before,
+                    "billed_completion_tokens": sum(p["completion_tokens"] for p in successes),
+                    "followers": sum(1 for row in rows if row["role"] == "follower"),
+                    "first_byte_ms_p50": round(statistics.median(row["first_byte"] for row in rows) * 1000, 1),
+                    "first_byte_ms_max": round(max(row["first_byte"] for row in rows) * 1000, 1),
+                }
+
+                if len({row["body"] for row in rows}) != 1 or not rows[0]["body"]:
+                    failures.append(f"{mode}: sessions received different answers")
+                per_session = sorted(p["session_id"] for p in successes)
+                if per_session != sorted(row["session_id"] for row in rows) or len(events) != len(successes):
+                    failures.append(f"{mode}: expected one ai_inference_success per session, got {len(successes)} of {len(events)} events")
+                if mode == "on":
+                    if upstream != 1:
+                        failures.append(f"on: {upstream} upstream requests, expected 1")
+                    if sum(1 for p in successes if p["completion_tokens"]) != 1:
+                        failures.append("on: completion tokens reported by more than one session")
+                    if results[mode]["followers"] != args.sessions - 1:
+                        failures.append(f"on: {results[mode]['followers']} followers, expected {args.sessions - 1}")
+
+    for mode, row in results.items():
+        print(
+            f"single-flight {mode:>3}: {row['upstream_requests']:>3} upstream requests  "
+            f"{row['billed_completion_tokens']:>5} billed completion tokens  {row['followers']:>3} followers  "
+            f"first byte p50 {row['first_byte_ms_p50']:.0f}ms max {row['first_byte_ms_max']:.0f}ms"
+        )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: one upstream stream, same answer and one success event per session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""SSE frames, bytes and CPU per response with text-delta coalescing on and off.
+
+Streams the same completion from the fake OpenAI server (separate process)
+through `stream_text` and `stream_text_async` with coalescing off and at each
+window, then reports frames and bytes per response, client CPU per stream
+and time to the first text delta. Every run is checked against the
+uncoalesced output: the concatenated text and the sequence of non-delta
+events must match, and every frame must be a valid UI-message-stream event.
+
+    python -m benchmarks.sse_coalesce_bench [--windows 20,50] [--tokens-per-second 80] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from tests.support import free_port
+
+from .stream_concurrency_bench import wait_until_up
+
+ROOT = Path(__file__).resolve().parent.parent
+MESSAGES = [{"role": "user", "content": "What is Fran's experience?"}]
+
+
+def parse(frames):
+    """(text, non-delta event types) of one response; raises if a frame is malformed."""
+    text, events = [], []
+    for frame in frames:
+        frame = frame.decode("utf-8")
+        assert frame.startswith("data: ") and frame.endswith("\n\n"), frame
+        body = frame[len("data: "):-2]
+        if body == "[DONE]":
+            events.append("[DONE]")
+            continue
+        payload = json.loads(body)
+        if payload["type"] == "text-delta":
+            assert isinstance(payload["delta"], str) and payload["id"], payload
+            text.append(payload["delta"])
+        else:
+            events.append(payload["type"])
+    return "".join(text), events
+
+
+def run_sync(client, coalesce):
+    from api.utils.stream import stream_text
+
+    started = time.perf_counter()
+    first = None
+    frames = []
+    for frame in stream_text(client, MESSAGES, [], {}, coalesce=coalesce):
+        if first is None and b'"text-delta"' in frame:
+            first = time.perf_counter() - started
+        frames.append(frame)
+    return frames, first
+
+
+async def run_async(client, coalesce):
+    from api.utils.stream import stream_text_async
+
+    started = time.perf_counter()
+    first = None
+    frames = []
+    async for frame in stream_text_async(client, MESSAGES, [], {}, coalesce=coalesce):
+        if first is None and b'"text-delta"' in frame:
+            first = time.perf_counter() - started
+        frames.append(frame)
+    return frames, first
+
+
+def measure_sync(client, coalesce, streams):
+    rows = []
+    for _ in range(streams):
+        cpu_started = time.process_time()
+        frames, first = run_sync(client, coalesce)
+        rows.append((frames, first, time.process_time() - cpu_started))
+    return rows
+
+
+async def measure_async(client, coalesce, streams):
+    # One event loop for all runs: the async client's connections are bound to it
+    rows = []
+    for _ in range(streams):
+        cpu_started = time.process_time()
+        frames, first = await run_async(client, coalesce)
+        rows.append((frames, first, time.process_time() - cpu_started))
+    await client.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", default="20,50", help="coalescing windows in ms")
+    parser.add_argument("--max-bytes", type=int, default=256)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--streams", type=int, default=5)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    from openai import AsyncOpenAI, OpenAI
+
+    from api.utils.coalesce import CoalesceConfig
+
+    port = free_port()
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_openai", "--port", str(port), "--ttft", "0.05",
+        "--tokens-per-second", str(args.tokens_per_second), "--completion-tokens", str(args.completion_tokens),
+    ], cwd=ROOT, env={**os.environ, "PYTHONPATH": str(ROOT)})
+
+    modes = [("off", None)] + [
+        (f"{window}ms", CoalesceConfig(window_ms=float(window), max_bytes=args.max_bytes))
+        for window in args.windows.split(",")
+    ]
+    results = []
+    failures = []
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/stats")
+        base_url = f"http://127.0.0.1:{port}/v1"
+        for variant in ("sync", "async"):
+            reference = None
+            for name, coalesce in modes:
+                if variant == "sync":
+                    rows = measure_sync(OpenAI(base_url=base_url, api_key="fake", max_retries=0), coalesce, args.streams)
+                else:
+                    client = AsyncOpenAI(base_url=base_url, api_key="fake", max_retries=0)
+                    rows = asyncio.run(measure_async(client, coalesce, args.streams))
+                parsed = [parse(frames) for frames, _, _ in rows]
+                if reference is None:
+                    reference = parsed[0]
+                if any(p != reference for p in parsed):
+                    failures.append(f"{variant} {name}: text or event order differs from uncoalesced output")
+                results.append({
+                    "variant": variant,
+                    "coalesce": name,
+                    "frames_per_response": statistics.median(len(frames) for frames, _, _ in rows),
+                    "bytes_per_response": statistics.median(sum(len(f) for f in frames) for frames, _, _ in rows),
+                    "cpu_ms_per_stream": round(statistics.median(cpu for _, _, cpu in rows) * 1000, 2),
+                    "first_delta_ms": round(statistics.median(first for _, first, _ in rows) * 1000, 1),
+                })
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    for row in results:
+        print(
+            f"{row['variant']:>5} coalesce {row['coalesce']:>5}: {row['frames_per_response']:>5} frames  "
+            f"{row['bytes_per_response']:>7} bytes  {row['cpu_ms_per_stream']:>7.2f}ms CPU/stream  "
+            f"first delta {row['first_delta_ms']:.1f}ms"
+        )
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: coalesced streams carry the same text and events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Per-event cost of SSE frame encoding and tool-call accumulation, before vs. after `api/utils/sse.py`.
+
+"before" is the old `format_sse` (a `json.dumps` f-string, later encoded to
+bytes by the ASGI server) and the old dict-based tool-call state that grew
+its arguments by string concatenation; "after" is `SseEncoder` with
+pre-encoded delta prefixes and the slotted `ToolCallState`. Every encoded
+frame is also checked to decode to the same payload as the old one.
+
+    python -m benchmarks.sse_encoder_bench [--events 20000] [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from api.utils import jsonutil
+from api.utils.sse import SseEncoder
+from api.utils.stream import ToolCallState
+
+DELTAS = ["Fran", " is", " a", " software", " engineer", " in", " Berlin", ".", " ¿Qué", " tal?", "\n"]
+ARGUMENT_FRAGMENTS = ['{"', 'latitude', '":', ' 52', '.52', ',', ' "', 'longitude', '":', ' 13', '.41', '}']
+
+
+def format_sse(payload: dict) -> bytes:
+    return f"data: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+def payloads(events: int):
+    text = [{"type": "text-delta", "id": "text-1", "delta": DELTAS[i % len(DELTAS)]} for i in range(events)]
+    tool = [
+        {"type": "tool-input-delta", "toolCallId": "call_1", "inputTextDelta": ARGUMENT_FRAGMENTS[i % len(ARGUMENT_FRAGMENTS)]}
+        for i in range(events)
+    ]
+    other = [
+        {"type": "tool-output-available", "toolCallId": "call_1", "output": {"temperature": 12.5 + i, "unit": "celsius"}}
+        for i in range(events // 10)
+    ]
+    return {"text-delta": text, "tool-input-delta": tool, "other": other}
+
+
+def old_tool_state(fragments):
+    state = {"id": None, "name": None, "arguments": "", "started": False}
+    events = 0
+    for i, fragment in enumerate(fragments):
+        if i == 0:
+            state["id"], state["name"] = "call_1", "get_current_weather"
+        if not state["started"] and state["id"] is not None and state["name"] is not None:
+            state["started"] = True
+            events += 1
+        state["arguments"] += fragment
+        events += 1
+    return state["arguments"]
+
+
+def new_tool_state(fragments):
+    state = ToolCallState()
+    events = 0
+    for i, fragment in enumerate(fragments):
+        if i == 0:
+            state.id, state.name = "call_1", "get_current_weather"
+        if state.start_event() is not None:
+            events += 1
+        state.fragments.append(fragment)
+        events += 1
+    return state.arguments
+
+
+def per_event_ns(func, count: int, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat)) / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    failures = []
+    results = {}
+    for kind, items in payloads(args.events).items():
+        encoder = SseEncoder()
+        for payload in items[:200]:
+            old, new = format_sse(payload), encoder.encode(payload)
+            if json.loads(old[6:-2]) != json.loads(new[6:-2]) or not new.endswith(b"\n\n"):
+                failures.append(f"{kind}: {new!r} != {old!r}")
+                break
+
+        before = per_event_ns(lambda: [format_sse(p) for p in items], len(items), args.repeat)
+        after = per_event_ns(lambda: [encoder.encode(p) for p in items], len(items), args.repeat)
+        results[kind] = {"before_ns": round(before, 1), "after_ns": round(after, 1)}
+
+    fragments = [ARGUMENT_FRAGMENTS[i % len(ARGUMENT_FRAGMENTS)] for i in range(args.events)]
+    if old_tool_state(fragments) != new_tool_state(fragments):
+        failures.append("tool-call state: joined arguments differ")
+    results["tool-call state"] = {
+        "before_ns": round(per_event_ns(lambda: old_tool_state(fragments), len(fragments), args.repeat), 1),
+        "after_ns": round(per_event_ns(lambda: new_tool_state(fragments), len(fragments), args.repeat), 1),
+    }
+
+    print(f"JSON backend: {'orjson' if jsonutil.orjson is not None else 'json'}")
+    for kind, row in results.items():
+        print(f"{kind:>16}: {row['before_ns']:>7.0f}ns -> {row['after_ns']:>7.0f}ns per event "
+              f"({1 - row['after_ns'] / row['before_ns']:.0%} less)")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: encoded frames decode to the same events")
+
+
+if __name__ == "__main__":
+    main()
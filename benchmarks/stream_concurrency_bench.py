@@ -0,0 +1,152 @@
+"""How many simultaneous streams one worker holds: stream_text vs stream_text_async.
+
+Starts the fake OpenAI server and a single uvicorn worker serving both
+variants in separate processes, then opens N concurrent streams against each
+variant and reports wall time, time to first text delta and the peak number
+of upstream streams the worker actually kept open at once.
+
+    python -m benchmarks.stream_concurrency_bench --levels 20,40,80,160 [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def create_app():
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+    from openai import AsyncOpenAI, OpenAI
+
+    from api.utils.stream import patch_response_with_headers, stream_text, stream_text_async
+    from api.utils.tools import AVAILABLE_TOOLS, TOOL_DEFINITIONS
+
+    base_url = os.environ["FAKE_OPENAI_BASE_URL"]
+    sync_client = OpenAI(base_url=base_url, api_key="fake", max_retries=0)
+    async_client = AsyncOpenAI(base_url=base_url, api_key="fake", max_retries=0)
+    messages = [{"role": "user", "content": "What is Fran's experience?"}]
+
+    app = FastAPI()
+
+    @app.post("/sync")
+    def sync_stream():
+        response = StreamingResponse(stream_text(sync_client, messages, TOOL_DEFINITIONS, AVAILABLE_TOOLS))
+        return patch_response_with_headers(response)
+
+    @app.post("/async")
+    async def async_stream():
+        response = StreamingResponse(stream_text_async(async_client, messages, TOOL_DEFINITIONS, AVAILABLE_TOOLS))
+        return patch_response_with_headers(response)
+
+    return app
+
+
+def wait_until_up(url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=0.5)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def one_stream(client: httpx.AsyncClient, url: str):
+    started = time.perf_counter()
+    first_delta = None
+    async with client.stream("POST", url) as response:
+        async for line in response.aiter_lines():
+            if first_delta is None and '"text-delta"' in line:
+                first_delta = time.perf_counter() - started
+    return first_delta or 0.0, time.perf_counter() - started
+
+
+async def run_level(app_url: str, fake_url: str, mode: str, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await client.post(f"{fake_url}/stats/reset")
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one_stream(client, f"{app_url}/{mode}") for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        upstream = (await client.get(f"{fake_url}/stats")).json()
+
+    first_deltas = [r[0] for r in results]
+    durations = [r[1] for r in results]
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "streams_per_s": round(concurrency / wall, 2),
+        "ttft_p50_s": round(statistics.median(first_deltas), 3),
+        "ttft_p95_s": round(percentile(first_deltas, 95), 3),
+        "duration_p95_s": round(percentile(durations, 95), 3),
+        "peak_upstream_streams": upstream["peak_active"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="20,40,80,160")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--completion-tokens", type=int, default=40)
+    parser.add_argument("--fake-port", type=int, default=8787)
+    parser.add_argument("--app-port", type=int, default=8788)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    env = {**os.environ, "FAKE_OPENAI_BASE_URL": f"{fake_url}/v1", "PYTHONPATH": str(ROOT)}
+
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_openai", "--port", str(args.fake_port),
+        "--ttft", str(args.ttft), "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens),
+    ], cwd=ROOT, env=env)
+    worker = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "benchmarks.stream_concurrency_bench:create_app", "--factory",
+        "--port", str(args.app_port), "--workers", "1", "--log-level", "warning",
+    ], cwd=ROOT, env=env)
+
+    try:
+        wait_until_up(f"{fake_url}/stats")
+        wait_until_up(f"{app_url}/docs")
+
+        rows = []
+        for concurrency in [int(level) for level in args.levels.split(",")]:
+            for mode in ("sync", "async"):
+                row = asyncio.run(run_level(app_url, fake_url, mode, concurrency))
+                rows.append(row)
+                print(
+                    f"{mode:>5} x{concurrency:<4} wall {row['wall_s']:>6.2f}s  "
+                    f"ttft p50 {row['ttft_p50_s']:>5.2f}s p95 {row['ttft_p95_s']:>5.2f}s  "
+                    f"peak upstream streams {row['peak_upstream_streams']}"
+                )
+    finally:
+        worker.terminate()
+        fake.terminate()
+        worker.wait()
+        fake.wait()
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Tool-turn latency with early tool dispatch on and off.
+
+Streams a turn in which the model asks for several tools, from the fake
+OpenAI server with paced argument fragments, through `stream_text` and
+`stream_text_async`. The tools sleep for the given latencies, assigned in
+the order they are started. The bench reports the wall time to `[DONE]`.
+Each mode must produce the same tool inputs and outputs.
+
+Early dispatch overlaps a tool with the streaming of the calls after it, so
+the turn gets shorter when an earlier call is the slow one; the last call
+can only start once its own arguments are complete.
+
+    python -m benchmarks.tool_dispatch_bench [--tool-calls 3] [--tool-latency-ms 600,150,150] [--json out.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+from api.utils.tool_runner import read_only
+from tests.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "Weather in Berlin, Paris and Madrid?"}]
+
+
+def make_tools(latencies):
+    order = itertools.count()
+    lock = threading.Lock()
+
+    # Like the real weather tool, a read-only lookup that may start before the model commits
+    @read_only
+    def get_current_weather(latitude, longitude):
+        with lock:
+            position = next(order)
+        time.sleep(latencies[position % len(latencies)])
+        return {"latitude": latitude, "longitude": longitude, "temperature": 21}
+
+    return {"get_current_weather": get_current_weather}
+
+
+def summarize(frames):
+    """Tool inputs and outputs of one response, without call ids."""
+    tool_events = []
+    for frame in frames:
+        body = frame.decode("utf-8")[len("data: "):-2]
+        if body == "[DONE]":
+            continue
+        payload = json.loads(body)
+        if payload["type"] in ("tool-input-available", "tool-output-available", "tool-output-error", "tool-input-error"):
+            tool_events.append(json.dumps({k: v for k, v in payload.items() if k != "toolCallId"}, sort_keys=True))
+    return sorted(tool_events)
+
+
+def run_sync(base_url, latencies, early):
+    from openai import OpenAI
+
+    from api.utils.stream import stream_text
+    from api.utils.tools import TOOL_DEFINITIONS
+
+    client = OpenAI(base_url=base_url, api_key="fake", max_retries=0)
+    started = time.perf_counter()
+    frames = list(stream_text(client, MESSAGES, TOOL_DEFINITIONS, make_tools(latencies), early_tool_dispatch=early))
+    return frames, time.perf_counter() - started
+
+
+async def run_async(base_url, latencies, early, streams):
+    from openai import AsyncOpenAI
+
+    from api.utils.stream import stream_text_async
+    from api.utils.tools import TOOL_DEFINITIONS
+
+    # One client and one event loop for all runs: its connections are bound to the loop
+    client = AsyncOpenAI(base_url=base_url, api_key="fake", max_retries=0)
+    rows = []
+    for _ in range(streams):
+        started = time.perf_counter()
+        frames = [frame async for frame in stream_text_async(
+            client, MESSAGES, TOOL_DEFINITIONS, make_tools(latencies), early_tool_dispatch=early,
+        )]
+        rows.append((frames, time.perf_counter() - started))
+    await client.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tool-calls", type=int, default=3)
+    parser.add_argument("--tool-latency-ms", default="600,150,150", help="latency of the 1st, 2nd, ... tool started")
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--argument-fragments", type=int, default=8)
+    parser.add_argument("--streams", type=int, default=3)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    latencies = [float(ms) / 1000 for ms in args.tool_latency_ms.split(",")]
+    config = FakeOpenAIConfig(
+        ttft=0.05, tokens_per_second=args.tokens_per_second, tool_calls=args.tool_calls,
+        argument_fragments=args.argument_fragments,
+    )
+
+    results = []
+    failures = []
+    with FakeOpenAIServer(config) as fake:
+        for variant in ("sync", "async"):
+            reference = None
+            for early in (False, True):
+                if variant == "sync":
+                    rows = [run_sync(fake.base_url, latencies, early) for _ in range(args.streams)]
+                else:
+                    rows = asyncio.run(run_async(fake.base_url, latencies, early, args.streams))
+                tool_events = [summarize(frames) for frames, _ in rows]
+                if reference is None:
+                    reference = tool_events[0]
+                if any(events != reference for events in tool_events) or not reference:
+                    failures.append(f"{variant} early={early}: tool inputs or outputs differ")
+                results.append({
+                    "variant": variant,
+                    "early_dispatch": early,
+                    "turn_ms": round(statistics.median(seconds for _, seconds in rows) * 1000, 1),
+                })
+
+    for row in results:
+        print(f"{row['variant']:>5} early dispatch {'on ' if row['early_dispatch'] else 'off'}: {row['turn_ms']:>7.1f}ms per tool turn")
+    for variant in ("sync", "async"):
+        off, on = (row["turn_ms"] for row in results if row["variant"] == variant)
+        print(f"{variant:>5}: {off - on:.0f}ms ({1 - on / off:.0%}) shorter with early dispatch")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"config": vars(args), "results": results, "failures": failures}, indent=2))
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: same tool inputs and outputs with early dispatch")
+
+
+if __name__ == "__main__":
+    main()
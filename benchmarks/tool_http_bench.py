@@ -0,0 +1,109 @@
+"""Check and time the pooled, cached tool HTTP layer against a local stub server.
+
+The stub speaks HTTP/1.1 keep-alive, charges `--handshake-ms` for every new
+connection (standing in for TCP + TLS setup to open-meteo) and `--latency-ms`
+per request. Each scenario reports wall time, upstream requests and new
+connections, and the script exits non-zero if pooling, caching or the
+timeouts stop working.
+
+    python -m benchmarks.tool_http_bench [--calls 30] [--json out.json]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+from api.utils import tool_http, tools
+from tests.support import StubStats, make_stub
+
+
+def scenario(name, stats, fn):
+    requests_before, connections_before = stats.requests, stats.connections
+    started = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - started
+    row = {
+        "scenario": name,
+        "wall_ms": round(wall * 1000, 1),
+        "upstream_requests": stats.requests - requests_before,
+        "new_connections": stats.connections - connections_before,
+    }
+    print(f"{name:<32} {row['wall_ms']:>8.1f} ms  requests {row['upstream_requests']:>3}  connections {row['new_connections']:>3}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=30)
+    parser.add_argument("--handshake-ms", type=float, default=40)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    stats = StubStats()
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        make_stub(stats, args.handshake_ms / 1000, args.latency_ms / 1000, slow_s=2.0),
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    tools.OPEN_METEO_URL = f"{base}/v1/forecast"
+
+    # Distinct cells 1 degree apart so only the pooled connection can help
+    coordinates = [(40.0 + i, -3.0 - i) for i in range(args.calls)]
+    # Jitter well inside one 0.1-degree cell: every call should map to the same entry
+    nearby = [(52.52 + (i % 5) * 0.004, 13.41 - (i % 5) * 0.004) for i in range(args.calls)]
+
+    def fresh_requests():
+        for lat, lon in coordinates:
+            requests.get(f"{base}/v1/forecast", params={"latitude": lat, "longitude": lon}).json()
+
+    def pooled():
+        for lat, lon in coordinates:
+            tool_http.http_get_json(f"{base}/v1/forecast", params={"latitude": lat, "longitude": lon})
+
+    def cached():
+        for lat, lon in nearby:
+            tools.get_current_weather(latitude=lat, longitude=lon)
+
+    def timed_out():
+        started = time.perf_counter()
+        try:
+            tool_http.http_get_json(f"{base}/slow", timeout=(1.0, 0.3))
+        except requests.Timeout:
+            pass
+        else:
+            raise AssertionError("slow request did not time out")
+        assert time.perf_counter() - started < 1.0, "read timeout not enforced"
+
+    rows = [
+        scenario("requests.get per call (before)", stats, fresh_requests),
+        scenario("pooled session", stats, pooled),
+        scenario("pooled + grid cache", stats, cached),
+        scenario("read timeout (0.3 s)", stats, timed_out),
+    ]
+    server.shutdown()
+
+    failures = []
+    if rows[1]["new_connections"] > 1:
+        failures.append(f"pooled session opened {rows[1]['new_connections']} connections")
+    if rows[2]["upstream_requests"] != 1:
+        failures.append(f"grid cache made {rows[2]['upstream_requests']} upstream requests for one cell")
+    if tools.get_current_weather.cache.stats()["hits"] != args.calls - 1:
+        failures.append(f"unexpected cache stats {tools.get_current_weather.cache.stats()}")
+
+    print(f"cache: {tool_http.tool_cache_stats()}")
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"rows": rows, "failures": failures}, indent=2))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
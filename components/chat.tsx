@@ -57,6 +57,14 @@ export function Chat() {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [isExpanded, setIsExpanded] = useState(false);
+  // The server keeps the conversation per session; after the first answer we
+  // only send the new message plus the version it gave us.
+  const sessionIdRef = useRef<string>(
+    typeof crypto !== "undefined" && "randomUUID" in crypto
+      ? crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  );
+  const conversationVersionRef = useRef<string | null>(null);
 
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
@@ -82,6 +90,8 @@ export function Chat() {
         content: message.message,
       };
       setMessages((prev) => [...prev, newMessage]);
+      // Voice turns never reach /api/chat, so the next text turn resends the full history
+      conversationVersionRef.current = null;
     },
     onError: (error: string) => {
       console.error("Error:", error);
@@ -162,15 +172,32 @@ export function Chat() {
     setIsExpanded(true);
 
     try {
-      const response = await fetch("/api/chat", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          messages: [...messages, userMessage],
-        }),
-      });
+      const postChat = (body: object) =>
+        fetch("/api/chat", {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+          },
+          body: JSON.stringify({ session_id: sessionIdRef.current, ...body }),
+        });
+
+      let response = conversationVersionRef.current
+        ? await postChat({
+            messages: [userMessage],
+            conversation_version: conversationVersionRef.current,
+          })
+        : await postChat({ messages: [...messages, userMessage] });
+
+      if (response.status === 409) {
+        // The server no longer has this conversation: send the full history
+        response = await postChat({ messages: [...messages, userMessage] });
+      }
+      conversationVersionRef.current = response.headers.get("X-Conversation-Version");
+
+      if (response.status === 429) {
+        setError("You're sending messages too quickly. Please wait a moment and try again.");
+        return;
+      }
 
       if (!response.ok) {
         throw new Error("Failed to fetch response");
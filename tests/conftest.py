@@ -0,0 +1,16 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# api.index reads its configuration at import time
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("ANSWER_CACHE_TTL", "0")
+os.environ.setdefault("POSTHOG_BATCH_SIZE", "100000")
+os.environ.setdefault("POSTHOG_FLUSH_INTERVAL", "3600")
+os.environ.pop("VERCEL", None)
+# Every test request comes from the same client; admission tests install their own limits
+os.environ.setdefault("CHAT_MAX_CONCURRENT", "0")
+os.environ.setdefault("CHAT_RATE_PER_MINUTE", "0")
+os.environ.setdefault("CHAT_TOKEN_BUDGET", "0")
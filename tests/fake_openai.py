@@ -0,0 +1,217 @@
+"""A local stand-in for the OpenAI chat completions streaming API.
+
+Serves `POST /v1/chat/completions` with `stream=True` semantics: a configurable
+time to first token (with an optional slow tail), a steady token rate, an
+optional usage chunk and, when the request carries `tools` and no tool results
+yet, a tool-call turn instead of text. `GET /stats` reports request counts and peak concurrent streams, and
+`POST /forms/submit` is a sink that stands in for Google Forms. Shared by the
+tests and the benchmarks; `python -m benchmarks.fake_openai` serves it standalone.
+
+Any value can be overridden per request with `x-fake-<option>` headers, e.g.
+`x-fake-ttft: 2.5`.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from .support import AppServer
+
+WORDS = (
+    "Fran has built growth engines across product, operations and engineering, "
+    "pairing strategy with hands-on prototypes in Python and React. "
+).split(" ")
+
+
+@dataclass
+class FakeOpenAIConfig:
+    ttft: float = 0.2
+    tokens_per_second: float = 100.0
+    completion_tokens: int = 40
+    prompt_tokens: int = 1500
+    cached_tokens: int = 0
+    tool_calls: int = 0
+    tool_name: str = "get_current_weather"
+    tool_arguments: str = '{"latitude": 52.52, "longitude": 13.41}'
+    argument_fragments: int = 4
+    fail_rate: float = 0.0
+    # A fraction of requests whose first token takes slow_ttft instead of ttft
+    slow_rate: float = 0.0
+    slow_ttft: float = 5.0
+
+    def override(self, headers) -> "FakeOpenAIConfig":
+        values = asdict(self)
+        for field in fields(self):
+            header = headers.get(f"x-fake-{field.name.replace('_', '-')}")
+            if header is not None:
+                values[field.name] = type(getattr(self, field.name))(header)
+        return FakeOpenAIConfig(**values)
+
+
+class FakeOpenAIStats:
+    def __init__(self):
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.tokens_sent = 0
+        self.form_posts = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+def _chunk(model: str, completion_id: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _usage_chunk(model: str, completion_id: str, config: FakeOpenAIConfig, completion_tokens: int) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [],
+        "usage": {
+            "prompt_tokens": config.prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": config.prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": config.cached_tokens},
+        },
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _split(text: str, parts: int) -> List[str]:
+    size = max(1, -(-len(text) // max(1, parts)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def create_app(config: Optional[FakeOpenAIConfig] = None) -> Starlette:
+    base_config = config or FakeOpenAIConfig()
+    stats = FakeOpenAIStats()
+
+    async def completions(request: Request):
+        cfg = base_config.override(request.headers)
+        stats.requests += 1
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # A hedged or cancelled request can be dropped before its body is read
+            stats.cancelled += 1
+            return Response(status_code=499)
+
+        model = body.get("model", "gpt-4o-mini")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        has_tool_results = any(m.get("role") == "tool" for m in body.get("messages", []))
+        wants_tools = cfg.tool_calls > 0 and body.get("tools") and not has_tool_results
+
+        if cfg.fail_rate and random.random() < cfg.fail_rate:
+            return JSONResponse({"error": {"message": "fake upstream failure"}}, status_code=500)
+
+        async def generate():
+            stats.active += 1
+            stats.peak_active = max(stats.peak_active, stats.active)
+            interval = 1.0 / cfg.tokens_per_second if cfg.tokens_per_second > 0 else 0.0
+            sent = 0
+            try:
+                slow = cfg.slow_rate and random.random() < cfg.slow_rate
+                await asyncio.sleep(cfg.slow_ttft if slow else cfg.ttft)
+                yield _chunk(model, completion_id, {"role": "assistant", "content": ""})
+
+                if wants_tools:
+                    for index in range(cfg.tool_calls):
+                        yield _chunk(model, completion_id, {"tool_calls": [{
+                            "index": index,
+                            "id": f"call_{uuid.uuid4().hex[:8]}",
+                            "type": "function",
+                            "function": {"name": cfg.tool_name, "arguments": ""},
+                        }]})
+                        for fragment in _split(cfg.tool_arguments, cfg.argument_fragments):
+                            await asyncio.sleep(interval)
+                            sent += 1
+                            yield _chunk(model, completion_id, {"tool_calls": [{
+                                "index": index,
+                                "function": {"arguments": fragment},
+                            }]})
+                    yield _chunk(model, completion_id, {}, "tool_calls")
+                else:
+                    for i in range(cfg.completion_tokens):
+                        if i:
+                            await asyncio.sleep(interval)
+                        word = WORDS[i % len(WORDS)]
+                        sent += 1
+                        yield _chunk(model, completion_id, {"content": word if i == 0 else f" {word}"})
+                    yield _chunk(model, completion_id, {}, "stop")
+
+                if include_usage:
+                    yield _usage_chunk(model, completion_id, cfg, sent)
+                yield "data: [DONE]\n\n"
+                stats.completed += 1
+            except (asyncio.CancelledError, GeneratorExit):
+                stats.cancelled += 1
+                raise
+            finally:
+                stats.tokens_sent += sent
+                stats.active -= 1
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    async def form_sink(request: Request):
+        # Stands in for Google Forms so /api/track can be load-tested offline
+        await request.body()
+        stats.form_posts += 1
+        return JSONResponse({"ok": True})
+
+    async def get_stats(request: Request):
+        return JSONResponse(stats.as_dict())
+
+    async def reset_stats(request: Request):
+        stats.__init__()
+        return JSONResponse(stats.as_dict())
+
+    app = Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/forms/submit", form_sink, methods=["POST"]),
+        Route("/stats", get_stats, methods=["GET"]),
+        Route("/stats/reset", reset_stats, methods=["POST"]),
+    ])
+    app.state.stats = stats
+    app.state.config = base_config
+    return app
+
+
+class FakeOpenAIServer(AppServer):
+    """Run the fake API with uvicorn on a background thread.
+
+        with FakeOpenAIServer(FakeOpenAIConfig(ttft=0.1)) as server:
+            client = OpenAI(base_url=server.base_url, api_key="fake")
+    """
+
+    def __init__(self, config: Optional[FakeOpenAIConfig] = None, port: Optional[int] = None):
+        super().__init__(create_app(config), port)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def stats(self) -> FakeOpenAIStats:
+        return self.app.state.stats
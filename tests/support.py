@@ -0,0 +1,140 @@
+"""Local servers and clients shared by the tests and the benchmarks."""
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+QUESTION = "Tell me everything about Fran's experience."
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class AppServer:
+    """Serve an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app, port: Optional[int] = None):
+        import uvicorn
+
+        self.app = app
+        self.port = port or free_port()
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "AppServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def stream_text_app(base_url: str, cancellations: list):
+    """`stream_text` and `stream_text_async` behind `/stream/{sync,async}`, each served with a `Cancellation`."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+    from openai import AsyncOpenAI, OpenAI
+
+    from api.utils.cancellation import Cancellation
+    from api.utils.stream import stream_text, stream_text_async
+
+    app = FastAPI()
+    sync_client = OpenAI(api_key="fake", base_url=base_url, max_retries=0)
+    async_client = AsyncOpenAI(api_key="fake", base_url=base_url, max_retries=0)
+
+    @app.post("/stream/{mode}")
+    async def stream(mode: str, request: Request):
+        messages = [{"role": "user", "content": QUESTION}]
+        cancellation = Cancellation()
+        cancellations.append(cancellation)
+        cancellation.watch(request)
+        if mode == "sync":
+            body = stream_text(sync_client, messages, [], {}, cancellation=cancellation)
+        else:
+            body = stream_text_async(async_client, messages, [], {}, cancellation=cancellation)
+        return StreamingResponse(body, media_type="text/event-stream")
+
+    return app
+
+
+async def disconnect_after(url: str, path: str, read_chunks: int, payload=None) -> float:
+    """Read `read_chunks` body chunks (0: wait for the headers only), then drop the connection."""
+    async with httpx.AsyncClient(timeout=30) as client:
+        async with client.stream("POST", url + path, json=payload or {}) as response:
+            received = 0
+            if read_chunks:
+                async for _ in response.aiter_raw():
+                    received += 1
+                    if received >= read_chunks:
+                        break
+            else:
+                await asyncio.sleep(0.1)
+    return time.perf_counter()
+
+
+async def read_all(url: str, path: str, payload=None) -> str:
+    async with httpx.AsyncClient(timeout=60) as client:
+        response = await client.post(url + path, json=payload or {})
+        return response.text
+
+
+async def wait_released(fake, disconnected_at: float, limit: float) -> float:
+    """Seconds until the fake upstream has no open stream left, capped at `limit`."""
+    while fake.stats.active and time.perf_counter() - disconnected_at < limit:
+        await asyncio.sleep(0.005)
+    return time.perf_counter() - disconnected_at
+
+
+class StubStats:
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+def make_stub(stats: StubStats, handshake_s: float, latency_s: float, slow_s: float):
+    """A keep-alive stand-in for open-meteo; `/slow` answers after `slow_s`."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with stats.lock:
+                stats.connections += 1
+            time.sleep(handshake_s)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            with stats.lock:
+                stats.requests += 1
+            time.sleep(slow_s if url.path == "/slow" else latency_s)
+            body = json.dumps({
+                "latitude": float(query.get("latitude", ["0"])[0]),
+                "longitude": float(query.get("longitude", ["0"])[0]),
+                "current": {"temperature_2m": 21.5},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,49 @@
+from api.utils.admission import AdmissionController, AdmissionLimits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def one_shot(controller, key, tokens=500):
+    ticket = controller.admit([key])
+    ticket.record_tokens(tokens)
+    ticket.release()
+
+
+def test_one_shot_clients_stay_bounded():
+    clock = FakeClock()
+    controller = AdmissionController(AdmissionLimits(max_clients=10), clock=clock)
+    for i in range(100):
+        one_shot(controller, f"session:{i}")
+        clock.now += 1
+        assert len(controller._clients) <= 10
+
+
+def test_expired_usage_makes_clients_idle():
+    clock = FakeClock()
+    limits = AdmissionLimits(max_clients=10, budget_window_seconds=60)
+    controller = AdmissionController(limits, clock=clock)
+    for i in range(10):
+        one_shot(controller, f"session:{i}")
+    clock.now += 61
+    # A returning client keeps its slot; the expired one-shots go first
+    controller.admit(["session:new"]).release()
+
+    assert len(controller._clients) <= 10
+    assert "session:new" in controller._clients
+
+
+def test_in_flight_clients_are_never_evicted():
+    controller = AdmissionController(AdmissionLimits(max_clients=2, max_concurrent=0, requests_per_minute=0))
+    held = [controller.admit([f"session:{i}"]) for i in range(3)]
+
+    assert len(controller._clients) == 3
+    for ticket in held:
+        ticket.release()
+    controller.admit(["session:next"]).release()
+    assert len(controller._clients) <= 2
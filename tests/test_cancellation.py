@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+
+import api.index as backend
+from api.utils.cancellation import Cancellation
+from api.utils.single_flight import SingleFlight
+from tests.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from tests.support import QUESTION, AppServer, disconnect_after, read_all, stream_text_app, wait_released
+
+COMPLETION_TOKENS = 100
+# Well under the two seconds the full answer takes upstream
+MAX_RELEASE_SECONDS = 0.25
+
+
+@pytest.fixture(scope="module")
+def fake():
+    with FakeOpenAIServer(FakeOpenAIConfig(ttft=0.3, tokens_per_second=50, completion_tokens=COMPLETION_TOKENS)) as server:
+        yield server
+
+
+@pytest.fixture
+def chat_url(fake, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", fake.base_url)
+    monkeypatch.setattr(backend, "CHAT_ENGINE", "openai")
+    monkeypatch.setattr(backend, "llm", None)
+    monkeypatch.setattr(backend, "single_flight", SingleFlight())
+    backend.context_cache.invalidate()
+    backend.posthog_events._buffer.clear()
+    with AppServer(backend.app) as server:
+        yield f"http://127.0.0.1:{server.port}"
+    backend.context_cache.invalidate()
+
+
+@pytest.fixture
+def stream_url(fake):
+    cancellations = []
+    with AppServer(stream_text_app(fake.base_url, cancellations)) as server:
+        yield f"http://127.0.0.1:{server.port}", cancellations
+
+
+def inference_events():
+    return [e for e in backend.posthog_events._buffer if e["event"].startswith("ai_inference")]
+
+
+def test_cancel_runs_callbacks_once():
+    cancellation, calls = Cancellation(), []
+    cancellation.on_cancel(lambda: calls.append("first"))
+
+    assert cancellation.cancel()
+    assert not cancellation.cancel()
+    # Registered after the fact: runs at once
+    cancellation.on_cancel(lambda: calls.append("late"))
+    assert calls == ["first", "late"]
+
+
+def test_finished_stream_ignores_a_late_cancel():
+    cancellation, calls = Cancellation(), []
+    cancellation.on_cancel(lambda: calls.append("cancelled"))
+    cancellation.finish()
+
+    assert not cancellation.cancel()
+    assert not cancellation.cancelled
+    assert calls == []
+
+
+@pytest.mark.parametrize("read_chunks", [3, 0], ids=["mid-stream", "before first token"])
+def test_chat_disconnect_aborts_upstream(fake, chat_url, read_chunks):
+    tokens_before = fake.stats.tokens_sent
+    payload = {"messages": [{"role": "user", "content": f"{QUESTION} ({read_chunks})"}], "session_id": f"cancel-{read_chunks}"}
+    disconnected_at = asyncio.run(disconnect_after(chat_url, "/api/chat", read_chunks, payload))
+    released = asyncio.run(wait_released(fake, disconnected_at, 5))
+    time.sleep(0.05)
+
+    assert released < MAX_RELEASE_SECONDS
+    assert fake.stats.tokens_sent - tokens_before < COMPLETION_TOKENS
+    events = inference_events()
+    assert [e["event"] for e in events] == ["ai_inference_cancelled"]
+    assert events[0]["properties"]["upstream_cancelled"]
+    assert events[0]["properties"]["prompt_tokens"] > 0
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_stream_text_disconnect_aborts_upstream(fake, stream_url, mode):
+    url, cancellations = stream_url
+    tokens_before = fake.stats.tokens_sent
+    disconnected_at = asyncio.run(disconnect_after(url, f"/stream/{mode}", 3))
+    released = asyncio.run(wait_released(fake, disconnected_at, 5))
+
+    assert released < MAX_RELEASE_SECONDS
+    assert fake.stats.tokens_sent - tokens_before < COMPLETION_TOKENS
+    assert cancellations[-1].cancelled
+    assert cancellations[-1].usage["prompt_tokens"] > 0
+
+
+def test_completed_streams_are_not_cancelled(fake, chat_url, stream_url, monkeypatch):
+    monkeypatch.setattr(fake.app.state.config, "ttft", 0.05)
+    monkeypatch.setattr(fake.app.state.config, "completion_tokens", 10)
+    url, cancellations = stream_url
+
+    answer = asyncio.run(read_all(chat_url, "/api/chat", {"messages": [{"role": "user", "content": QUESTION}], "session_id": "complete"}))
+    frames = asyncio.run(read_all(url, "/stream/sync"))
+    time.sleep(0.05)
+
+    assert answer
+    assert frames.rstrip().endswith("data: [DONE]")
+    assert [e["event"] for e in inference_events()] == ["ai_inference_success"]
+    assert cancellations[-1].finished and not cancellations[-1].cancelled
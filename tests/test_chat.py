@@ -0,0 +1,181 @@
+import asyncio
+
+import httpx
+import pytest
+
+import api.index as backend
+from api.utils.admission import AdmissionController, AdmissionLimits
+from api.utils.answer_cache import AnswerCache
+from api.utils.chat_engine import DirectChunk
+from api.utils.metrics import metrics
+from api.utils.session_store import MemorySessionStore
+from api.utils.single_flight import SingleFlight
+
+MISS_LABELS = {"path": "/api/chat", "answer_cache": "miss"}
+
+
+class FakeEngine:
+    """Stands in for DirectChatEngine: a fixed answer after `ttft` seconds."""
+
+    model_name = "fake-model"
+
+    def __init__(self, chunks=("Fran ", "builds ", "things."), ttft=0.05):
+        self.chunks = chunks
+        self.ttft = ttft
+        self.calls = []
+
+    async def astream(self, messages):
+        self.calls.append(list(messages))
+        await asyncio.sleep(self.ttft)
+        for content in self.chunks:
+            yield DirectChunk(content)
+            await asyncio.sleep(0)
+        yield DirectChunk("", {"input_tokens": 10, "output_tokens": len(self.chunks), "total_tokens": 10 + len(self.chunks)})
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(backend, "CHAT_ENGINE", "openai")
+    monkeypatch.setattr(backend, "llm", engine)
+    monkeypatch.setattr(backend, "single_flight", SingleFlight())
+    # The cached prompt is built for the engine it was loaded with
+    backend.context_cache.invalidate()
+    metrics.reset()
+    yield engine
+    backend.context_cache.invalidate()
+
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=backend.app), base_url="http://test")
+
+
+def ask(question, **body):
+    return {"messages": [{"role": "user", "content": question}], **body}
+
+
+def test_followers_do_not_record_ttft(engine):
+    async def run():
+        async with client() as http:
+            return await asyncio.gather(*(http.post("/api/chat", json=ask("What has Fran built?")) for _ in range(3)))
+
+    responses = asyncio.run(run())
+
+    assert [r.text for r in responses] == ["Fran builds things."] * 3
+    assert sorted(r.headers["x-single-flight"] for r in responses) == ["follower", "follower", "leader"]
+    assert len(engine.calls) == 1
+    ttft = metrics.histogram("ttft_seconds", MISS_LABELS)
+    assert ttft.count == 1
+    assert ttft.total >= engine.ttft
+
+
+def test_answer_cache_replays_do_not_record_ttft(engine, monkeypatch):
+    monkeypatch.setattr(backend, "answer_cache", AnswerCache(ttl_seconds=60))
+
+    async def run():
+        async with client() as http:
+            first = await http.post("/api/chat", json=ask("What has Fran built?"))
+            second = await http.post("/api/chat", json=ask("What has Fran built?"))
+            return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first.text == second.text == "Fran builds things."
+    assert len(engine.calls) == 1
+    assert metrics.histogram("ttft_seconds", MISS_LABELS).count == 1
+    assert metrics.histogram("ttft_seconds", {"path": "/api/chat", "answer_cache": "hit"}) is None
+
+
+@pytest.fixture
+def one_stream(monkeypatch):
+    """Admission that lets a client hold a single stream at a time."""
+    admission = AdmissionController(AdmissionLimits(max_concurrent=1, requests_per_minute=0, token_budget=0))
+    monkeypatch.setattr(backend, "admission", admission)
+    return admission
+
+
+def test_failed_setup_releases_the_admission_slot(engine, one_stream, monkeypatch):
+    def broken_llm():
+        raise RuntimeError("no API key")
+
+    monkeypatch.setattr(backend, "get_llm", broken_llm)
+
+    async def run():
+        async with client() as http:
+            return [await http.post("/api/chat", json=ask("What has Fran built?")) for _ in range(2)]
+
+    responses = asyncio.run(run())
+
+    # Both fail on their own error instead of the second being shed as over the limit
+    assert [r.status_code for r in responses] == [500, 500]
+    assert one_stream.in_flight == 0
+
+
+def test_unsent_response_releases_its_holds(engine, one_stream):
+    body = b'{"messages": [{"role": "user", "content": "What has Fran built?"}]}'
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat",
+        "raw_path": b"/api/chat",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+
+    async def run():
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # Nothing more from the client; the server waits here for a disconnect
+            await asyncio.Event().wait()
+
+        async def send(message):
+            # The connection is gone before the response can start, so the body is never iterated
+            raise OSError("connection reset")
+
+        with pytest.raises(Exception):
+            await backend.app(scope, receive, send)
+        await asyncio.sleep(0.01)
+        return backend.single_flight
+
+    single_flight = asyncio.run(run())
+
+    assert one_stream.in_flight == 0
+    assert single_flight.in_flight() == 0
+    assert single_flight.stats()["cancelled"] == 1
+
+
+def test_openai_engine_stores_only_the_conversation(engine, monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(backend, "session_store", store)
+
+    async def run():
+        async with client() as http:
+            first = await http.post("/api/chat", json=ask("What has Fran built?", session_id="s1"))
+            version = first.headers["x-conversation-version"]
+            second = await http.post("/api/chat", json=ask("And where?", session_id="s1", conversation_version=version))
+            return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first.status_code == second.status_code == 200
+    stored = store.get("s1", second.headers["x-conversation-version"])
+    assert stored.messages == [
+        {"role": "user", "content": "What has Fran built?"},
+        {"role": "assistant", "content": "Fran builds things."},
+        {"role": "user", "content": "And where?"},
+        {"role": "assistant", "content": "Fran builds things."},
+    ]
+    # The provider still gets the system prompt, once, ahead of the rebuilt history
+    sent = engine.calls[1]
+    assert [m["role"] for m in sent].count("system") == 1
+    assert sent[0]["role"] == "system"
+    assert [m for m in sent if m["role"] != "system"] == stored.messages[:3]
@@ -0,0 +1,48 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from api.utils.forwarder import FormForwarder
+
+
+def recording_transport(rows):
+    def handler(request):
+        rows.append(request.content.decode())
+        return httpx.Response(200)
+    return httpx.MockTransport(handler)
+
+
+def test_forwarder_follows_the_running_loop():
+    rows = []
+    forwarder = FormForwarder("http://forms.test/submit", transport=recording_transport(rows))
+
+    async def track(event):
+        assert forwarder.enqueue({"event": event})
+        await forwarder.drain(timeout=5)
+
+    # Each asyncio.run is a new loop, as with serverless invocations
+    asyncio.run(track("first"))
+    asyncio.run(track("second"))
+
+    assert rows == ["event=first", "event=second"]
+    assert forwarder.counters["sent"] == 2
+    assert forwarder.counters["failed"] == 0
+    assert forwarder.counters["loop_rebinds"] == 1
+
+
+def test_serverless_track_on_separate_loops(monkeypatch):
+    import api.index as backend
+
+    rows = []
+    monkeypatch.setattr(backend, "SERVERLESS", True)
+    monkeypatch.setattr(backend, "analytics_forwarder", FormForwarder("http://forms.test/submit", transport=recording_transport(rows)))
+    # Without the context manager, every request runs on its own event loop
+    client = TestClient(backend.app)
+
+    for event in ("page_view", "chat_open"):
+        response = client.post("/api/track", json={"event": event, "utm_source": "test"})
+        assert response.json() == {"status": "ok"}
+
+    assert len(rows) == 2
+    assert backend.analytics_forwarder.counters["sent"] == 2
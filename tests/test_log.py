@@ -0,0 +1,51 @@
+import logging
+
+import api.index  # noqa: F401 - configures logging for the `api` tree
+from api.utils.log import ApiLogger, QueueLogHandler, configure_logging, get_logger
+
+
+def capture(logger):
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger, records
+
+
+def test_logging_globals_are_left_alone():
+    assert logging._srcfile is not None
+    assert logging.logThreads and logging.logProcesses
+    assert logging.getLoggerClass() is logging.Logger
+    assert logging.Logger.manager.loggerClass is None
+    # A second call neither stacks anything nor changes the setup
+    configure_logging()
+    assert logging.getLogRecordFactory() is logging.LogRecord
+    assert sum(isinstance(h, QueueLogHandler) for h in logging.getLogger("api").handlers) == 1
+
+
+def test_only_api_records_skip_the_caller_lookup():
+    # Created after configure_logging(), like a module imported on first use
+    api_logger, api_records = capture(get_logger("api.utils.late_import"))
+    other_logger, other_records = capture(logging.getLogger("some_library"))
+
+    api_logger.info("from the api tree")
+    other_logger.warning("from a library")
+
+    assert isinstance(api_logger, ApiLogger)
+    assert api_records[0].lineno == 0
+    assert type(other_logger) is logging.Logger
+    assert other_records[0].funcName == "test_only_api_records_skip_the_caller_lookup"
+    assert other_records[0].lineno > 0
+
+
+def test_api_modules_log_through_api_loggers():
+    assert isinstance(logging.getLogger("api.index"), ApiLogger)
+    assert isinstance(logging.getLogger("api.utils.stream"), ApiLogger)
+
+
+def test_api_logger_stack_info_still_points_at_the_caller():
+    api_logger, records = capture(get_logger("api.utils.stack_probe"))
+    api_logger.info("with stack", stack_info=True)
+
+    assert records[0].funcName == "test_api_logger_stack_info_still_points_at_the_caller"
@@ -0,0 +1,66 @@
+import asyncio
+
+from api.utils.chat_engine import DirectChunk
+from api.utils.single_flight import SingleFlight
+
+CHUNKS = ["one ", "two ", "three"]
+
+
+def upstream(started):
+    async def open_stream():
+        started.append(True)
+        for content in CHUNKS:
+            await asyncio.sleep(0.01)
+            yield DirectChunk(content)
+    return open_stream
+
+
+async def read(single_flight, flight, limit=None):
+    received = []
+    subscription = single_flight.subscribe(flight)
+    try:
+        async for content in subscription:
+            received.append(content)
+            if len(received) == limit:
+                break
+    finally:
+        await subscription.aclose()
+        single_flight.leave(flight)
+    return received
+
+
+def test_joined_follower_survives_the_leader_leaving():
+    async def run():
+        single_flight, started = SingleFlight(), []
+        flight, leader = single_flight.join("key", upstream(started))
+        same, follower_leader = single_flight.join("key", upstream(started))
+        assert flight is same and leader and not follower_leader
+
+        # The leader's client goes away before the follower has read anything
+        assert await read(single_flight, flight, limit=1) == ["one "]
+        await asyncio.sleep(0.05)
+        return await read(single_flight, same), single_flight, started
+
+    received, single_flight, started = asyncio.run(run())
+
+    assert received == CHUNKS
+    assert single_flight.stats()["cancelled"] == 0
+    assert len(started) == 1
+
+
+def test_last_one_out_cancels_the_upstream():
+    async def run():
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join("key", upstream([]))
+        single_flight.join("key", upstream([]))
+        await read(single_flight, flight, limit=1)
+        # The second caller never subscribed, e.g. its response was never sent
+        single_flight.leave(flight)
+        await asyncio.sleep(0)
+        return single_flight, flight
+
+    single_flight, flight = asyncio.run(run())
+
+    assert single_flight.stats()["cancelled"] == 1
+    assert single_flight.in_flight() == 0
+    assert flight.task.cancelled()
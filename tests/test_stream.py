@@ -0,0 +1,196 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from api.utils.cancellation import Cancellation
+from api.utils.metrics import metrics
+from api.utils.stream import stream_text, stream_text_async
+from api.utils.tool_runner import read_only
+
+
+def text_chunk(content, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None)
+
+
+def tool_chunk(index, arguments, call_id=None, name=None, finish_reason=None):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    tool_call = SimpleNamespace(index=index, id=call_id, function=function)
+    delta = SimpleNamespace(content=None, tool_calls=[tool_call])
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None)
+
+
+def finish_chunk(finish_reason):
+    delta = SimpleNamespace(content=None, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None)
+
+
+class FakeStream:
+    """A sync or async OpenAI stream over fixed chunks that records whether it was closed."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncFakeStream(FakeStream):
+    async def close(self):
+        self.closed = True
+
+
+def fake_client(stream, is_async=False):
+    if is_async:
+        async def create(**kwargs):
+            return stream
+    else:
+        def create(**kwargs):
+            return stream
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def events(frames):
+    return [json.loads(frame[len(b"data: "):]) for frame in frames if frame.startswith(b"data: {")]
+
+
+async def collect(agen):
+    return [frame async for frame in agen]
+
+
+def test_abandoned_sync_stream_closes_upstream():
+    stream = FakeStream([text_chunk("Hello"), text_chunk(" there"), finish_chunk("stop")])
+    body = stream_text(fake_client(stream), [], [], {}, coalesce=None)
+    next(body)
+    next(body)
+    # The client went away: the server closes the generator
+    body.close()
+    assert stream.closed
+
+
+def test_abandoned_async_stream_closes_upstream():
+    stream = AsyncFakeStream([text_chunk("Hello"), text_chunk(" there"), finish_chunk("stop")])
+
+    async def run():
+        body = stream_text_async(fake_client(stream, is_async=True), [], [], {}, coalesce=None)
+        await body.__anext__()
+        await body.__anext__()
+        await body.aclose()
+
+    asyncio.run(run())
+    assert stream.closed
+
+
+def test_completed_sync_stream_closes_upstream():
+    stream = FakeStream([text_chunk("Hello"), finish_chunk("stop")])
+    sent = events(list(stream_text(fake_client(stream), [], [], {}, coalesce=None)))
+    assert [event["type"] for event in sent] == ["start", "text-start", "text-delta", "text-end", "finish"]
+    assert stream.closed
+
+
+WEATHER_ARGUMENTS = '{"latitude": 52.52, "longitude": 13.41}'
+ABANDONED = {"type": "tool-output-error", "toolCallId": "call_1", "errorText": "Not run: the model finished with 'length'."}
+
+
+def weather_tools(calls):
+    def get_current_weather(latitude, longitude):
+        calls.append((latitude, longitude))
+        return {"temperature": 21}
+    return get_current_weather
+
+
+def tool_turn(finish_reason):
+    return [
+        tool_chunk(0, WEATHER_ARGUMENTS, call_id="call_1", name="get_current_weather"),
+        text_chunk("Let me check"),
+        finish_chunk(finish_reason),
+    ]
+
+
+def test_read_only_tool_output_is_sent_for_tool_calls():
+    calls = []
+    tools = {"get_current_weather": read_only(weather_tools(calls))}
+    sent = events(stream_text(fake_client(FakeStream(tool_turn("tool_calls"))), [], [], tools, coalesce=None))
+
+    outputs = [event for event in sent if event["type"] == "tool-output-available"]
+    assert outputs == [{"type": "tool-output-available", "toolCallId": "call_1", "output": {"temperature": 21}}]
+    assert calls == [(52.52, 13.41)]
+
+
+def test_truncated_stream_closes_early_tool_calls():
+    calls = []
+    tools = {"get_current_weather": read_only(weather_tools(calls))}
+    sent = events(stream_text(fake_client(FakeStream(tool_turn("length"))), [], [], tools, coalesce=None))
+
+    types = [event["type"] for event in sent]
+    # The input was announced while streaming, but the model never committed to the call
+    assert "tool-input-available" in types
+    assert [event for event in sent if event["type"].startswith("tool-output")] == [ABANDONED]
+    assert sent[-1] == {"type": "finish", "messageMetadata": {"finishReason": "length"}}
+
+
+def test_truncated_async_stream_closes_early_tool_calls():
+    calls = []
+    tools = {"get_current_weather": read_only(weather_tools(calls))}
+    stream = AsyncFakeStream(tool_turn("length"))
+    sent = events(asyncio.run(collect(stream_text_async(fake_client(stream, is_async=True), [], [], tools, coalesce=None))))
+
+    assert [event for event in sent if event["type"].startswith("tool-output")] == [ABANDONED]
+    assert sent[-1] == {"type": "finish", "messageMetadata": {"finishReason": "length"}}
+    assert stream.closed
+
+
+def test_tool_with_side_effects_waits_for_tool_calls():
+    calls = []
+    tools = {"get_current_weather": weather_tools(calls)}
+    sent = events(stream_text(fake_client(FakeStream(tool_turn("length"))), [], [], tools, coalesce=None))
+
+    assert not any(event["type"] in ("tool-input-available", "tool-output-available") for event in sent)
+    assert calls == []
+
+
+class CancelledAsyncStream(AsyncFakeStream):
+    """Cancels the request after its first chunk, yet still runs to the end like an unclosable upstream."""
+
+    def __init__(self, chunks, cancellation):
+        super().__init__(chunks)
+        self.cancellation = cancellation
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self.chunks):
+            if i == 1:
+                self.cancellation.cancel()
+            yield chunk
+
+
+def test_cancelled_async_stream_sends_and_runs_nothing_more():
+    calls, cancellation = [], Cancellation()
+    tools = {"get_current_weather": weather_tools(calls)}
+    stream = CancelledAsyncStream(tool_turn("tool_calls"), cancellation)
+    body = stream_text_async(fake_client(stream, is_async=True), [], [], tools, coalesce=None, cancellation=cancellation)
+    sent = events(asyncio.run(collect(body)))
+
+    types = [event["type"] for event in sent]
+    # The call streamed before the cancel, but it is never completed, run or finished
+    assert "tool-input-start" in types
+    assert not any(t == "tool-input-available" or t.startswith("tool-output") or t == "finish" for t in types)
+    assert calls == []
+    assert not cancellation.finished
+
+
+def test_streams_record_upstream_ttft():
+    metrics.reset()
+    list(stream_text(fake_client(FakeStream([text_chunk("Hi"), finish_chunk("stop")])), [], [], {}, coalesce=None))
+    stream = AsyncFakeStream([text_chunk("Hi"), finish_chunk("stop")])
+    asyncio.run(collect(stream_text_async(fake_client(stream, is_async=True), [], [], {}, coalesce=None)))
+
+    assert metrics.histogram("ttft_seconds", {"path": "stream_text"}).count == 1
+    assert metrics.histogram("ttft_seconds", {"path": "stream_text_async"}).count == 1
@@ -0,0 +1,73 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from api.utils import tool_http, tools
+from tests.support import StubStats, make_stub
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """A keep-alive stub of open-meteo; `/slow` answers after two seconds."""
+    stats = StubStats()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_stub(stats, handshake_s=0, latency_s=0, slow_s=2.0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(tools, "OPEN_METEO_URL", f"{base}/v1/forecast")
+    # A session of our own, so connections opened by other tests don't count
+    monkeypatch.setattr(tool_http, "_session", None)
+    yield base, stats
+    tool_http.get_session().close()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def weather_cache():
+    cache = tools.get_current_weather.cache
+    cache.clear()
+    cache.hits = cache.misses = 0
+    yield cache
+    cache.clear()
+
+
+def test_pooled_session_reuses_one_connection(stub):
+    base, stats = stub
+    for i in range(10):
+        body = tool_http.http_get_json(f"{base}/v1/forecast", params={"latitude": 40.0 + i, "longitude": -3.0})
+        assert body["latitude"] == 40.0 + i
+
+    assert stats.requests == 10
+    assert stats.connections == 1
+
+
+def test_nearby_lookups_hit_one_grid_cell(stub, weather_cache):
+    base, stats = stub
+    # Jitter well inside one 0.1-degree cell
+    results = [tools.get_current_weather(latitude=52.52 + (i % 5) * 0.004, longitude=13.41 - (i % 5) * 0.004) for i in range(10)]
+
+    assert stats.requests == 1
+    assert weather_cache.stats() == {"entries": 1, "hits": 9, "misses": 1}
+    # The upstream sees the snapped coordinates, so every caller gets the same answer
+    assert results[0]["latitude"] == 52.5
+    assert all(result == results[0] for result in results)
+
+
+def test_distinct_cells_are_not_shared(stub, weather_cache):
+    base, stats = stub
+    tools.get_current_weather(latitude=52.52, longitude=13.41)
+    tools.get_current_weather(latitude=48.85, longitude=2.35)
+
+    assert stats.requests == 2
+    assert weather_cache.stats()["hits"] == 0
+
+
+def test_read_timeout_is_enforced(stub):
+    base, _ = stub
+    started = time.perf_counter()
+    with pytest.raises(requests.Timeout):
+        tool_http.http_get_json(f"{base}/slow", timeout=(1.0, 0.3))
+    assert time.perf_counter() - started < 1.0